@@ -0,0 +1,126 @@
+"""Локальний HTTP-сервер із синтетичними медіа для бенчмарків (без доступу до YouTube)
+
+Маршрути:
+    /media/<назва>-<байти>.mp4  - псевдовипадкові байти заданого розміру (з підтримкою Range)
+    /page/<назва>.html          - сторінка з og:video і og:image, яку розбирає generic-екстрактор yt_dlp
+    /thumb.jpg                  - зображення превью, передане при створенні сервера
+
+Різні назви дають різні ID відео, тож архів yt_dlp і кеші не пропускають
+повторні завдання.
+"""
+import os
+import re
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+MEDIA_RE = re.compile(r'^/media/([\w.-]+)-(\d+)\.mp4$')
+PAGE_RE = re.compile(r'^/page/([\w.-]+)\.html$')
+RANGE_RE = re.compile(r'bytes=(\d+)-(\d*)$')
+# Один блок даних повторюється до потрібного розміру - генерувати гігабайти не потрібно
+BLOCK_SIZE = 1024 * 1024
+PAGE_TEMPLATE = """<html><head><title>{name}</title>
+<meta property="og:title" content="{name}">
+<meta property="og:image" content="{base}/thumb.jpg">
+<meta property="og:video" content="{base}/media/{name}-{size}.mp4">
+<meta property="og:video:type" content="video/mp4">
+</head><body></body></html>
+"""
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        media = MEDIA_RE.match(path)
+        if media:
+            return self.send_media(int(media.group(2)))
+        page = PAGE_RE.match(path)
+        if page:
+            body = PAGE_TEMPLATE.format(
+                name=page.group(1), base=self.server.base_url, size=self.server.page_media_size
+            ).encode('utf-8')
+            return self.send_body(body, 'text/html; charset=utf-8')
+        if path == '/thumb.jpg' and self.server.thumbnail:
+            return self.send_body(self.server.thumbnail, 'image/jpeg')
+        self.send_error(404)
+
+    def send_body(self, body, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_media(self, size):
+        start, end = 0, size - 1
+        match = RANGE_RE.match(self.headers.get('Range', ''))
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+            if start >= size:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+
+        block = self.server.block
+        position = start
+        try:
+            while position <= end:
+                offset = position % BLOCK_SIZE
+                chunk = block[offset:offset + min(BLOCK_SIZE - offset, end - position + 1)]
+                self.wfile.write(chunk)
+                position += len(chunk)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MediaServer:
+    """Сервер у фоновому потоці на вільному порту 127.0.0.1"""
+
+    def __init__(self, thumbnail=None, page_media_size=1024 * 1024):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), MediaHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.block = os.urandom(BLOCK_SIZE)
+        self.httpd.thumbnail = thumbnail
+        self.httpd.page_media_size = page_media_size
+        self.httpd.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}'
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return self.httpd.base_url
+
+    def media_url(self, name, size):
+        return f'{self.base_url}/media/{name}-{size}.mp4'
+
+    def page_url(self, name):
+        return f'{self.base_url}/page/{name}.html'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='bench-media-server', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
@@ -0,0 +1,395 @@
+"""Бенчмарки продуктивності на локальному сервері з синтетичними медіа
+
+Приклад:
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --only download concurrent --size 64M --jobs 8
+    python benchmarks/run.py --output results.json --baseline baseline.json --tolerance 0.2
+
+Доступ до YouTube не потрібен: медіа і сторінки віддає benchmarks/media_server.py,
+а всі кеші, історія та налаштування пишуться в тимчасовий HOME.
+
+Результати пишуться в JSON: список вимірів {'name', 'value', 'unit', 'better',
+'samples'}, де value - медіана, а better - 'lower' або 'higher'. З --baseline
+кожен вимір порівнюється з попереднім запуском; якщо він гірший більше ніж на
+tolerance, програма завершується з кодом 1 (перевірка регресій перед релізом),
+а якщо якийсь бенчмарк не вдалося виконати - з кодом 2.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+
+from media_server import MediaServer
+
+# Пресет без постобробки: синтетичні медіа не є справжнім відео, а вимірюється мережа
+DEFAULT_FORMAT = 'Оригінал (без перекодування)'
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_FAILED = 2
+# Скільки чекати завершення постобробки завдань після мережевого етапу (с)
+DOWNLOAD_TIMEOUT = 300
+
+
+def result(name, samples, unit, better='lower'):
+    """Вимір з медіаною вибірки"""
+    return {
+        'name': name,
+        'value': round(statistics.median(samples), 3),
+        'unit': unit,
+        'better': better,
+        'samples': [round(sample, 3) for sample in samples]
+    }
+
+
+class Context:
+    """Спільні ресурси бенчмарків: тимчасовий HOME, сервер, QApplication"""
+
+    def __init__(self, args, workdir):
+        self.args = args
+        self.workdir = workdir
+        self.server = None
+        self.app = None
+
+    def path(self, *parts):
+        path = os.path.join(self.workdir, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def qt_app(self):
+        if self.app is None:
+            from PyQt6.QtWidgets import QApplication
+            self.app = QApplication.instance() or QApplication([])
+        return self.app
+
+    def unique_name(self, prefix):
+        return f'{prefix}-{uuid.uuid4().hex[:8]}'
+
+
+def run_process(args, home, timeout=120):
+    """(мс до завершення, stderr) для запуску main.py в окремому процесі"""
+    env = dict(os.environ, HOME=home, USERPROFILE=home)
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, 'main.py')] + args,
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, timeout=timeout
+    )
+    elapsed = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"main.py {' '.join(args)} завершився з кодом {completed.returncode}: {completed.stderr[-500:]}")
+    return elapsed, completed.stderr
+
+
+def bench_cold_start(ctx):
+    """Запуск main.py: пакетний режим без Qt і показ вікна з Qt"""
+    urls_file = ctx.path('cold', 'empty.txt')
+    open(urls_file, 'w').close()
+    batch, gui, window_shown = [], [], []
+    for i in range(ctx.args.repeat):
+        home = ctx.path('cold', f'home-{i}', '')
+        elapsed, _ = run_process(['--batch', urls_file, '--out', ctx.path('cold', 'out', '')], home)
+        batch.append(elapsed)
+
+        elapsed, stderr = run_process(['--startup-time', '--quit-after-show'], home)
+        gui.append(elapsed)
+        for line in stderr.splitlines():
+            if line.startswith('{') and '"startup"' in line:
+                marks = json.loads(line).get('marks_ms', {})
+                if 'window_shown' in marks:
+                    window_shown.append(marks['window_shown'])
+    results = [
+        result('cold_start_batch', batch, 'ms'),
+        result('cold_start_gui', gui, 'ms')
+    ]
+    if window_shown:
+        results.append(result('cold_start_gui_window_shown', window_shown, 'ms'))
+    return results
+
+
+def bench_preview(ctx):
+    """Превью через PreviewThread: з мережі (метадані + зображення) і з кешу"""
+    import main
+    app = ctx.qt_app()
+
+    def fetch(url):
+        thread = main.PreviewThread(url)
+        outcome = {}
+        thread.preview_ready.connect(lambda image, title, key: outcome.setdefault('image', image))
+        thread.error.connect(lambda message: outcome.setdefault('error', message))
+        started = time.perf_counter()
+        thread.start()
+        thread.wait()
+        app.processEvents()
+        elapsed = (time.perf_counter() - started) * 1000
+        if 'image' not in outcome:
+            raise RuntimeError(f"Превью не отримано: {outcome.get('error')}")
+        return elapsed
+
+    cold, cached = [], []
+    for _ in range(ctx.args.repeat):
+        url = ctx.server.page_url(ctx.unique_name('preview'))
+        cold.append(fetch(url))
+        cached.append(fetch(url))
+    return [
+        result('preview_latency', cold, 'ms'),
+        result('preview_cached_latency', cached, 'ms')
+    ]
+
+
+def run_downloads(ctx, urls):
+    """Одночасний запуск DownloadThread для всіх URL; повертає час у секундах"""
+    import main
+    import progress
+    from PyQt6.QtCore import QEventLoop
+    app = ctx.qt_app()
+    tracker = progress.ProgressAggregator()
+    out_dir = ctx.path('downloads', '')
+    threads = []
+    messages = []
+    for i, url in enumerate(urls):
+        thread = main.DownloadThread(url, out_dir, ctx.args.format, f'bench-{i}', progress_tracker=tracker)
+        thread.download_finished.connect(lambda job_id, message: messages.append(message))
+        threads.append(thread)
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.wait()
+    # download_finished надходить з пулу постобробки вже після завершення потоків
+    deadline = time.monotonic() + DOWNLOAD_TIMEOUT
+    while len(messages) < len(urls) and time.monotonic() < deadline:
+        app.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 50)
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started
+    failed = [message for message in messages if message.startswith("Помилка")]
+    if failed or len(messages) != len(urls):
+        raise RuntimeError(f"Завантаження не вдалося: {failed[:1] or messages}")
+    shutil.rmtree(out_dir, ignore_errors=True)
+    return elapsed
+
+
+def bench_download(ctx):
+    """Пропускна здатність одного завдання DownloadThread"""
+    size = ctx.args.size
+    samples = []
+    for _ in range(ctx.args.repeat):
+        elapsed = run_downloads(ctx, [ctx.server.media_url(ctx.unique_name('single'), size)])
+        samples.append(size / elapsed / 1024 / 1024)
+    return [result('download_throughput', samples, 'MB/s', better='higher')]
+
+
+def bench_concurrent(ctx):
+    """Сумарна пропускна здатність N одночасних завдань"""
+    size, jobs = ctx.args.size, ctx.args.jobs
+    samples = []
+    for _ in range(ctx.args.repeat):
+        urls = [ctx.server.media_url(ctx.unique_name(f'concurrent{i}'), size) for i in range(jobs)]
+        elapsed = run_downloads(ctx, urls)
+        samples.append(size * jobs / elapsed / 1024 / 1024)
+    return [result(f'concurrent_throughput_{jobs}', samples, 'MB/s', better='higher')]
+
+
+def bench_progress_hook(ctx):
+    """Вартість одного виклику хуків прогресу (черга GUI і спільний обмежувач швидкості)"""
+    import download_engine
+    import main
+    import progress
+    calls = ctx.args.hook_calls
+    events = [
+        {
+            'status': 'downloading', 'downloaded_bytes': i * 1024, 'total_bytes': calls * 1024,
+            'tmpfilename': 'bench.mp4.part', 'filename': 'bench.mp4', 'info_dict': {'format_id': '18'},
+            'fragment_index': i // 64, 'fragment_count': calls // 64 + 1
+        }
+        for i in range(1, calls + 1)
+    ]
+
+    tracker = progress.ProgressAggregator()
+    thread = main.DownloadThread('http://127.0.0.1/bench', ctx.workdir, ctx.args.format, 'bench', progress_tracker=tracker)
+    limiter = download_engine.get_limiter()
+    limiter.set_rate(0)
+
+    def gui_hook():
+        tracker.start('bench')
+        return thread.progress_hook
+
+    results = []
+    # Для кожного повтору новий хук, щоб стан попереднього не впливав на вимір
+    for name, make_hook in (('progress_hook_overhead', gui_hook), ('limiter_hook_overhead', limiter.progress_hook)):
+        samples = []
+        for _ in range(ctx.args.repeat):
+            hook = make_hook()
+            started = time.perf_counter()
+            for event in events:
+                hook(event)
+            samples.append((time.perf_counter() - started) * 1e9 / calls)
+        results.append(result(name, samples, 'ns/call'))
+    return results
+
+
+def bench_thumbnail_cache(ctx):
+    """Читання превью з дискового кешу при влучанні"""
+    import thumbnail_cache
+    cache = thumbnail_cache.ThumbnailCache(ctx.path('thumbnails', ''))
+    keys = [f'bench {i}' for i in range(64)]
+    for key in keys:
+        cache.put(key, os.urandom(16 * 1024))
+    samples = []
+    for _ in range(ctx.args.repeat):
+        started = time.perf_counter()
+        for _ in range(ctx.args.cache_reads // len(keys)):
+            for key in keys:
+                if cache.get(key) is None:
+                    raise RuntimeError("Промах кешу превью")
+        samples.append((time.perf_counter() - started) * 1e6 / (ctx.args.cache_reads // len(keys) * len(keys)))
+    return [result('thumbnail_cache_hit', samples, 'us')]
+
+
+BENCHMARKS = {
+    'cold_start': bench_cold_start,
+    'preview': bench_preview,
+    'download': bench_download,
+    'concurrent': bench_concurrent,
+    'progress_hook': bench_progress_hook,
+    'thumbnail_cache': bench_thumbnail_cache
+}
+
+
+def compare(results, baseline, tolerance):
+    """Виміри, які гірші за базові більше ніж на tolerance"""
+    base_values = {entry['name']: entry for entry in baseline.get('results', [])}
+    regressions = []
+    for entry in results:
+        base = base_values.get(entry['name'])
+        if not base or not base['value']:
+            continue
+        change = (entry['value'] - base['value']) / base['value']
+        if entry['better'] == 'higher':
+            change = -change
+        if change > tolerance:
+            regressions.append({
+                'name': entry['name'], 'value': entry['value'], 'baseline': base['value'],
+                'unit': entry['unit'], 'change': round(change, 3)
+            })
+    return regressions
+
+
+def make_thumbnail(width=1280, height=720):
+    """JPEG превью розміру maxres, щоб вимірювання включало масштабування"""
+    from PyQt6.QtCore import QBuffer, QByteArray, QIODevice
+    from PyQt6.QtGui import QColor, QImage, QPainter
+    image = QImage(width, height, QImage.Format.Format_RGB32)
+    image.fill(QColor(40, 90, 160))
+    painter = QPainter(image)
+    for x in range(0, width, 40):
+        painter.fillRect(x, 0, 20, height, QColor(x % 256, 120, 200))
+    painter.end()
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, 'JPG', 90)
+    buffer.close()
+    return bytes(data)
+
+
+def read_version():
+    try:
+        with open(os.path.join(REPO_ROOT, 'version.txt'), encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def parse_size(text):
+    import download_engine
+    return int(download_engine.parse_rate(text))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Бенчмарки YouTube Downloader на локальних синтетичних медіа")
+    parser.add_argument('--output', default='bench-results.json', help="файл для результатів у JSON")
+    parser.add_argument('--baseline', help="результати попереднього запуску для перевірки регресій")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="допустиме погіршення відносно --baseline (0.2 = 20%%)")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), help="запустити лише ці бенчмарки")
+    parser.add_argument('--repeat', type=int, default=3, help="кількість повторів кожного виміру")
+    parser.add_argument('--size', type=parse_size, default=32 * 1024 * 1024, metavar='SIZE',
+                        help="розмір синтетичного файлу, наприклад 32M")
+    parser.add_argument('--jobs', type=int, default=4, help="кількість одночасних завдань")
+    parser.add_argument('--format', default=DEFAULT_FORMAT, help="пресет для завантажень")
+    parser.add_argument('--hook-calls', type=int, default=100000, help="кількість викликів хуків прогресу")
+    parser.add_argument('--cache-reads', type=int, default=2048, help="кількість читань з кешу превью")
+    parser.add_argument('--keep-workdir', action='store_true', help="не видаляти тимчасовий HOME")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    workdir = tempfile.mkdtemp(prefix='ytd-bench-')
+    # Кеші, історія і журнал черги не змішуються з даними користувача
+    os.environ['HOME'] = os.environ['USERPROFILE'] = os.path.join(workdir, 'home')
+    os.makedirs(os.environ['HOME'])
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+    ctx = Context(args, workdir)
+    results = []
+    errors = {}
+    try:
+        thumbnail = None
+        if not args.only or 'preview' in args.only:
+            ctx.qt_app()
+            thumbnail = make_thumbnail()
+        with MediaServer(thumbnail=thumbnail) as server:
+            ctx.server = server
+            for name, bench in BENCHMARKS.items():
+                if args.only and name not in args.only:
+                    continue
+                print(f"{name}...", file=sys.stderr, flush=True)
+                try:
+                    for entry in bench(ctx):
+                        results.append(entry)
+                        print(f"  {entry['name']}: {entry['value']} {entry['unit']}", file=sys.stderr, flush=True)
+                except Exception as e:
+                    errors[name] = str(e)
+                    print(f"  помилка: {e}", file=sys.stderr, flush=True)
+    finally:
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        'timestamp': time.time(),
+        'version': read_version(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'repeat': args.repeat, 'size': args.size, 'jobs': args.jobs, 'format': args.format},
+        'results': results,
+        'errors': errors
+    }
+
+    exit_code = EXIT_OK
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            report['regressions'] = compare(results, json.load(f), args.tolerance)
+        for regression in report['regressions']:
+            print(f"Регресія {regression['name']}: {regression['value']} {regression['unit']} "
+                  f"(база {regression['baseline']}, гірше на {regression['change']:.0%})", file=sys.stderr)
+        if report['regressions']:
+            exit_code = EXIT_REGRESSION
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return EXIT_FAILED if errors else exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+"""Пакетний режим без графічного інтерфейсу
+
+Приклад:
+    python main.py --batch urls.txt --format "MP4 (1080p)" --out DIR --jobs 8
+    python main.py --batch urls.txt --fragments 8 --limit-rate 20M --external-downloader aria2c
+    python main.py --batch urls.txt --sections "1:02:00-1:05:30, Вступ"
+    python main.py --batch urls.txt --shard uploader --output-template "%(upload_date)s %(title).150B [%(id)s]"
+
+Прогрес виводиться в stdout у форматі JSON lines; події finished і error містять
+поле telemetry (етапи, швидкість потоків, постобробка - див. telemetry.py), а
+--telemetry FILE записує телеметрію всіх завдань у JSON або CSV.
+Для аудіопресетів з native_audio подія finished містить шлях обробки (копіювання
+чи перекодування з бітрейтом джерела), а summary.audio - заощаджений час процесора.
+Завантаження (--jobs потоків) і постобробка (--postprocess-jobs потоків, за
+замовчуванням - кількість ядер) є окремими етапами: після завантаження байтів
+виводиться подія downloaded з глибиною черги постобробки, а потік
+завантаження береться за наступний URL.
+Перед завантаженням перевіряється місце на диску за оцінкою розміру форматів:
+якщо його не вистачає, завдання завершується помилкою, не почавши завантаження.
+Коди завершення: 0 - усе завантажено, 1 - частина завдань з помилками,
+2 - невірні аргументи або файл зі списком, 130 - перервано користувачем.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import download_engine
+import downloader
+import history
+import metadata_cache
+import output_paths
+import postprocessing
+import presets
+import progress
+import sections
+import telemetry
+import ydl_pool
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+
+class JsonReporter:
+    """Потокобезпечний вивід подій у форматі JSON lines"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        record = {'event': event, 'time': round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False)
+        with self.lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+class BatchJob:
+    """Одне завдання пакетного режиму"""
+
+    def __init__(self, url, save_path, selected_format, reporter, cancel_event, engine=None):
+        self.url = url
+        self.save_path = save_path
+        self.selected_format = selected_format
+        self.engine = engine
+        self.reporter = reporter
+        self.cancel_event = cancel_event
+        self.progress = progress.ProgressAggregator()
+        self.telemetry = telemetry.JobTelemetry()
+        self.record = None
+        self.last_progress = -1
+
+    def progress_hook(self, d):
+        if self.cancel_event.is_set():
+            raise Exception("Завантаження скасовано")
+        self.progress.update(self.url, d)
+        if d['status'] != 'downloading':
+            return
+        stats = self.progress.stats(self.url)
+        # Подія лише при зміні відсотка, а не на кожен блок даних
+        if stats['percent'] > self.last_progress:
+            self.last_progress = stats['percent']
+            self.reporter.emit(
+                'progress', url=self.url, percent=stats['percent'],
+                speed=int(stats['speed']) if stats['speed'] else None, eta=stats['eta'],
+                phase=stats['phase'], fragment_index=stats['fragment_index'],
+                fragment_count=stats['fragment_count']
+            )
+
+    def run(self, postprocess_pool):
+        """Етап завантаження; постобробка ставиться в postprocess_pool
+
+        Повертає False при помилці або Future постобробки (з результатом True/False).
+        """
+        self.reporter.emit('start', url=self.url, format=self.selected_format)
+        started = time.monotonic()
+        started_at = time.time()
+        try:
+            staged = downloader.download(
+                self.url,
+                self.save_path,
+                self.selected_format,
+                progress_hooks=[self.progress_hook],
+                engine=self.engine,
+                telemetry=self.telemetry,
+                defer_postprocess=True
+            )
+        except Exception as e:
+            self.failed(e, started_at)
+            return False
+        depth = postprocess_pool.depth()
+        self.reporter.emit('downloaded', url=self.url, elapsed=round(time.monotonic() - started, 3),
+                           postprocess_queued=depth['queued'] + 1, postprocess_running=depth['running'])
+        return postprocess_pool.submit(self.postprocess, staged, started, started_at)
+
+    def postprocess(self, staged, started, started_at):
+        """Етап постобробки (у пулі postprocessing.PostprocessPool)"""
+        if self.cancel_event.is_set():
+            staged.discard()
+            self.failed(Exception("Завантаження скасовано"), started_at)
+            return False
+        try:
+            info = staged.postprocess()
+        except Exception as e:
+            self.failed(e, started_at)
+            return False
+        self.save_history('done', "", info, started_at)
+        postprocess = {}
+        for download in (info or {}).get('requested_downloads') or []:
+            postprocess = download.get('ytd_postprocess') or postprocess
+        self.reporter.emit('finished', url=self.url, elapsed=round(time.monotonic() - started, 3),
+                           telemetry=self.telemetry.summary(), **postprocess)
+        return True
+
+    def failed(self, error, started_at):
+        status = 'cancelled' if self.cancel_event.is_set() else 'error'
+        self.save_history(status, str(error), None, started_at)
+        self.reporter.emit('error', url=self.url, message=str(error), telemetry=self.telemetry.summary())
+
+    def save_history(self, status, message, info, started_at):
+        self.record = history.build_record(
+            self.url, downloader.canonical_video_id(self.url),
+            downloader.job_preset(self.selected_format, self.engine),
+            status, message, info, started_at, telemetry=self.telemetry.summary()
+        )
+        try:
+            history.get_store().add(self.record)
+        except Exception as e:
+            print(f"Помилка запису в історію: {e}", file=sys.stderr)
+
+
+def read_urls(path):
+    """Читання списку URL: один на рядок, '#' - коментар, '-' - stdin"""
+    if path == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+
+def expand_urls(urls, save_path, selected_format, reporter):
+    """Заміна URL плейлистів і каналів на окремі відео, яких ще немає в архіві
+
+    Повертає (urls, failed) - список URL для завантаження і кількість помилок.
+    """
+    archive = downloader.read_archive(downloader.archive_path(save_path, selected_format))
+    expanded = []
+    failed = 0
+    for url in urls:
+        if not downloader.is_playlist_url(url):
+            expanded.append(url)
+            continue
+        try:
+            entries, skipped = downloader.expand_url(url, archive)
+        except Exception as e:
+            reporter.emit('error', url=url, message=str(e))
+            failed += 1
+            continue
+        reporter.emit('expanded', url=url, entries=len(entries), skipped=skipped)
+        expanded.extend(entry['url'] for entry in entries)
+    return expanded, failed
+
+
+def skip_downloaded(urls, save_path, selected_format, reporter, redownload=False, engine=None):
+    """Відсіювання повторів у списку та відео, які вже завантажено (папка, архів, історія)
+
+    Перевірка не звертається до мережі. Повертає (urls, skipped).
+    """
+    remaining = []
+    seen = {}
+    for url in urls:
+        video_id = downloader.canonical_video_id(url)
+        if video_id in seen:
+            # Те саме відео під іншим URL - приєднується до першого завдання
+            reporter.emit('coalesced', url=url, into=seen[video_id])
+            continue
+        seen[video_id] = url
+        existing = None if redownload else downloader.find_existing(url, save_path, selected_format, engine)
+        if existing:
+            reporter.emit('skipped', url=url, reason=existing['reason'], output_path=existing['path'])
+        else:
+            remaining.append(url)
+    return remaining, len(urls) - len(remaining)
+
+
+def export_telemetry(jobs, path, reporter):
+    """Експорт телеметрії завершених завдань (той самий формат, що й експорт з історії в GUI)"""
+    try:
+        count = telemetry.export([job.record for job in jobs if job.record], path)
+        reporter.emit('telemetry_exported', path=path, jobs=count)
+    except OSError as e:
+        reporter.emit('error', message=f"Не вдалося записати телеметрію: {e}")
+
+
+def wait_result(future):
+    """Результат Future з очікуванням частинами, щоб Ctrl+C оброблявся і в Windows"""
+    while True:
+        try:
+            return future.result(timeout=0.5)
+        except FutureTimeoutError:
+            continue
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='main.py', description="YouTube Downloader: пакетний режим")
+    parser.add_argument('--batch', required=True, metavar='FILE', help="файл зі списком URL ('-' для stdin)")
+    parser.add_argument('--format', default=None, metavar='PRESET', help="пресет формату (назва з реєстру пресетів)")
+    parser.add_argument('--presets', default=presets.USER_PRESETS_FILE, metavar='FILE', help="JSON-файл з пресетами користувача")
+    parser.add_argument('--out', default='.', metavar='DIR', help="папка для збереження")
+    parser.add_argument('--jobs', type=int, default=4, metavar='N', help="кількість одночасних завантажень")
+    parser.add_argument('--postprocess-jobs', type=int, default=None, metavar='N',
+                        help="кількість потоків постобробки (за замовчуванням - кількість ядер процесора)")
+    parser.add_argument('--fragments', type=int, default=None, metavar='N',
+                        help="кількість фрагментів DASH/HLS, які завантажуються одночасно (за замовчуванням - як у пресеті)")
+    parser.add_argument('--parallel-streams', action=argparse.BooleanOptionalAction, default=None,
+                        help="завантажувати відео й аудіо одночасно (за замовчуванням - як у пресеті)")
+    parser.add_argument('--external-downloader', default=None, metavar='NAME',
+                        help="зовнішній завантажувач (aria2c, axel, curl, wget) або 'native'")
+    parser.add_argument('--sections', type=sections.parse, default=None, metavar='SPEC',
+                        help="завантажити лише проміжки або розділи, наприклад \"10:00-12:30, Вступ\" "
+                             "(різання по ключових кадрах без перекодування)")
+    parser.add_argument('--output-template', type=output_paths.parse_template, default=None, metavar='TEMPLATE',
+                        help="шаблон імені файлу yt_dlp відносно --out, наприклад \"%%(title).150B [%%(id)s].%%(ext)s\"")
+    parser.add_argument('--shard', choices=tuple(output_paths.SHARDING), default=None,
+                        help="підпапки для великих бібліотек: за автором, датою (рік/місяць) або хешем ID")
+    parser.add_argument('--ascii-filenames', action='store_true', default=None,
+                        help="лише ASCII в іменах файлів")
+    parser.add_argument('--redownload', action='store_true',
+                        help="завантажувати і ті відео, які вже є в папці, архіві чи історії завантажень")
+    parser.add_argument('--limit-rate', type=download_engine.parse_rate, default=0, metavar='RATE',
+                        help="спільний ліміт швидкості всіх завдань, наприклад 500K або 20M")
+    parser.add_argument('--telemetry', metavar='FILE',
+                        help="записати телеметрію завдань цього запуску у FILE (.json або .csv)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    reporter = JsonReporter()
+
+    registry = presets.get_registry(args.presets)
+    if args.format is None:
+        args.format = registry.names()[0]
+    elif args.format not in registry.names():
+        reporter.emit('fatal', message=f"Невідомий пресет: {args.format}", presets=registry.names())
+        return EXIT_USAGE
+
+    try:
+        urls = read_urls(args.batch)
+    except OSError as e:
+        reporter.emit('fatal', message=f"Не вдалося прочитати список URL: {e}")
+        return EXIT_USAGE
+
+    if args.jobs < 1:
+        reporter.emit('fatal', message="--jobs має бути більше 0")
+        return EXIT_USAGE
+
+    if args.postprocess_jobs is not None and args.postprocess_jobs < 1:
+        reporter.emit('fatal', message="--postprocess-jobs має бути більше 0")
+        return EXIT_USAGE
+
+    if args.fragments is not None and args.fragments < 1:
+        reporter.emit('fatal', message="--fragments має бути більше 0")
+        return EXIT_USAGE
+
+    os.makedirs(args.out, exist_ok=True)
+    download_engine.get_limiter().set_rate(args.limit_rate)
+    engine = {
+        'concurrent_fragments': args.fragments,
+        'parallel_streams': args.parallel_streams,
+        'external_downloader': args.external_downloader,
+        'sections': args.sections,
+        'output_template': args.output_template,
+        'sharding': args.shard,
+        'ascii_filenames': args.ascii_filenames
+    }
+
+    urls, expand_failed = expand_urls(urls, args.out, args.format, reporter)
+    urls, skipped = skip_downloaded(urls, args.out, args.format, reporter, args.redownload, engine)
+
+    cancel_event = threading.Event()
+    jobs = [BatchJob(url, args.out, args.format, reporter, cancel_event, engine) for url in urls]
+    started = time.monotonic()
+    results = [False] * expand_failed
+
+    postprocess_pool = postprocessing.get_pool(args.postprocess_jobs)
+    executor = ThreadPoolExecutor(max_workers=args.jobs)
+    try:
+        futures = [executor.submit(job.run, postprocess_pool) for job in jobs]
+        for future in futures:
+            result = wait_result(future)
+            if isinstance(result, Future):
+                result = wait_result(result)
+            results.append(result)
+    except KeyboardInterrupt:
+        cancel_event.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+        # Завдання, які ще чекають на постобробку, записуються як скасовані
+        postprocess_pool.shutdown(wait=True)
+        reporter.emit('summary', total=len(jobs) + expand_failed, ok=results.count(True),
+                      failed=results.count(False), skipped=skipped,
+                      interrupted=True, elapsed=round(time.monotonic() - started, 3))
+        if args.telemetry:
+            export_telemetry(jobs, args.telemetry, reporter)
+        return EXIT_INTERRUPTED
+    executor.shutdown(wait=True)
+
+    failed = results.count(False)
+    reporter.emit('summary', total=len(jobs) + expand_failed, ok=results.count(True), failed=failed,
+                  skipped=skipped, elapsed=round(time.monotonic() - started, 3),
+                  metadata_cache=metadata_cache.get_cache().stats(),
+                  ydl_pool=ydl_pool.get_pool().stats(),
+                  stages={'download_workers': args.jobs, 'postprocess': postprocess_pool.depth()},
+                  audio=postprocessing.get_savings().stats())
+    postprocess_pool.shutdown()
+    ydl_pool.get_pool().close()
+    if args.telemetry:
+        export_telemetry(jobs, args.telemetry, reporter)
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""Пошук вже завантажених відео до отримання метаданих: індекс папки, архів yt_dlp та історія"""
+import json
+import os
+import re
+import threading
+import time
+
+import history
+
+INDEX_FILE = '.ytdownloader_index.json'
+# Файли, збережені іншими програмами з шаблоном yt_dlp за замовчуванням "%(title)s [%(id)s].%(ext)s"
+ID_IN_NAME_RE = re.compile(r'\[([0-9A-Za-z_-]{11})\]\.[^.]+$')
+TEMP_SUFFIXES = ('.part', '.ytdl', '.temp', '.tmp')
+# Глибина підпапок, які переглядаються (розкладання по датах - два рівні плюс шаблон)
+SCAN_DEPTH = 4
+# Як часто пошук переглядає папку без сигналу про зміни (с)
+RESCAN_INTERVAL = 30
+
+
+class FolderIndex:
+    """Індекс 'ID відео -> файли' для папки збереження
+
+    Записи про власні завантаження зберігаються в INDEX_FILE у самій папці,
+    шляхи в ньому відносні (з підпапками розкладання, див. output_paths.py).
+    Папка переглядається інкрементально разом з підпапками до SCAN_DEPTH:
+    вміст підпапки перечитується лише після зміни її часу модифікації, а
+    зникнення файлу видаляє його з індексу. Пошук переглядає папку не частіше
+    ніж раз на RESCAN_INTERVAL с (у пакетному режимі і сервері API так
+    помічаються файли, додані іншими програмами), а mark_dirty() (наприклад,
+    з QFileSystemWatcher) планує перегляд на наступний пошук одразу.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_file = os.path.join(folder, INDEX_FILE)
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.by_id = {}
+        self.listings = {}
+        self.archives = {}
+        self.dirty = True
+        self.scanned_at = 0.0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.index_file, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        try:
+            tmp_file = self.index_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except OSError as e:
+            print(f"Помилка збереження індексу папки: {e}")
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def list_dir(self, rel_dir):
+        """(mtime, файли, підпапки) для підпапки; з кешу, якщо вона не змінилася"""
+        path = os.path.join(self.folder, rel_dir)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        cached = self.listings.get(rel_dir)
+        # Корінь перечитується завжди: він змінюється найчастіше і вже відстежується
+        if rel_dir and cached and cached[0] == mtime:
+            return cached
+        files = []
+        subdirs = []
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            entries = []
+        for entry in entries:
+            if entry.name.startswith('.') or entry.name.endswith(TEMP_SUFFIXES):
+                continue
+            rel_path = os.path.join(rel_dir, entry.name) if rel_dir else entry.name
+            try:
+                if entry.is_dir():
+                    subdirs.append(rel_path)
+                elif entry.is_file():
+                    files.append(rel_path)
+            except OSError:
+                continue
+        return mtime, files, subdirs
+
+    def refresh(self):
+        """Інкрементальний перегляд папки і підпапок (після mark_dirty() або RESCAN_INTERVAL)"""
+        with self.lock:
+            now = time.monotonic()
+            if not self.dirty and now - self.scanned_at < RESCAN_INTERVAL:
+                return
+            self.dirty = False
+            self.scanned_at = now
+            seen = set()
+            listings = {}
+            pending = [('', 0)]
+            while pending:
+                rel_dir, depth = pending.pop()
+                listing = self.list_dir(rel_dir)
+                if listing is None:
+                    continue
+                listings[rel_dir] = listing
+                seen.update(listing[1])
+                if depth < SCAN_DEPTH:
+                    pending.extend((subdir, depth + 1) for subdir in listing[2])
+            for name in seen:
+                if name not in self.entries:
+                    match = ID_IN_NAME_RE.search(name)
+                    if match:
+                        self.entries[name] = {'id': f"youtube {match.group(1)}", 'preset': None}
+            removed = [name for name in self.entries if name not in seen]
+            for name in removed:
+                del self.entries[name]
+            self.listings = listings
+            self.rebuild()
+            if removed:
+                self.save()
+
+    def rebuild(self):
+        self.by_id = {}
+        for name, entry in self.entries.items():
+            self.by_id.setdefault(entry['id'], set()).add(name)
+
+    def add(self, path, video_id, preset):
+        """Запис про щойно завантажений файл (у папці або її підпапках)"""
+        if not path:
+            return
+        name = os.path.relpath(os.path.abspath(path), os.path.abspath(self.folder))
+        if name.startswith(os.pardir) or os.path.isabs(name):
+            return
+        with self.lock:
+            self.entries[name] = {'id': video_id, 'preset': preset}
+            self.by_id.setdefault(video_id, set()).add(name)
+            self.save()
+
+    def find(self, video_id, preset, output_ext=None):
+        """Шлях до файлу цього відео в пресеті (або з розширенням output_ext для чужих файлів) чи None"""
+        self.refresh()
+        with self.lock:
+            for name in self.by_id.get(video_id, ()):
+                entry = self.entries[name]
+                if entry['preset'] == preset or (
+                    entry['preset'] is None and output_ext and name.endswith(f'.{output_ext}')
+                ):
+                    path = os.path.join(self.folder, name)
+                    # Зміни в підпапках помічаються не одразу - файл міг зникнути
+                    if os.path.exists(path):
+                        return path
+        return None
+
+    def in_archive(self, video_id, archive_file):
+        """Чи є ID в архіві yt_dlp (файл перечитується лише після зміни)"""
+        try:
+            mtime = os.stat(archive_file).st_mtime_ns
+        except OSError:
+            return False
+        with self.lock:
+            cached = self.archives.get(archive_file)
+            if cached is None or cached[0] != mtime:
+                try:
+                    with open(archive_file, encoding='utf-8') as f:
+                        ids = {line.strip() for line in f if line.strip()}
+                except OSError:
+                    return False
+                cached = self.archives[archive_file] = (mtime, ids)
+            return video_id in cached[1]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(folder):
+    """Спільний індекс для папки"""
+    folder = os.path.abspath(folder)
+    with _indexes_lock:
+        if folder not in _indexes:
+            _indexes[folder] = FolderIndex(folder)
+        return _indexes[folder]
+
+
+def find_existing(video_id, save_path, preset, archive_file=None, output_ext=None):
+    """Причина не завантажувати відео повторно або None
+
+    Повертає словник {'reason': 'file' | 'archive' | 'history', 'path': ...}.
+    """
+    index = get_index(save_path)
+    path = index.find(video_id, preset, output_ext)
+    if path:
+        return {'reason': 'file', 'path': path}
+    if archive_file and index.in_archive(video_id, archive_file):
+        return {'reason': 'archive', 'path': archive_file}
+    downloaded = history.get_store().find_downloaded(video_id, preset)
+    if downloaded:
+        return {'reason': 'history', 'path': downloaded['output_path']}
+    return None
@@ -0,0 +1,271 @@
+"""Параметри рушія завантаження: паралельні фрагменти і потоки, зовнішній завантажувач, спільний ліміт швидкості"""
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lazy_imports
+import output_paths
+import sections
+
+# Значення для пресетів, які не задають параметри рушія
+DEFAULT_ENGINE = {
+    'concurrent_fragments': 4,
+    'parallel_streams': True,
+    'external_downloader': None,
+    # Фрагменти відео (див. sections.py); None - усе відео
+    'sections': None,
+    # Шлях файлу в папці збереження (див. output_paths.py); None - назва відео
+    'output_template': None,
+    'sharding': output_paths.DEFAULT_SHARDING,
+    # Лише ASCII в іменах файлів (restrictfilenames)
+    'ascii_filenames': False
+}
+ENGINE_KEYS = tuple(DEFAULT_ENGINE)
+# Завантажувачі, які yt_dlp вміє викликати (див. yt_dlp.downloader.external)
+EXTERNAL_DOWNLOADERS = ('aria2c', 'axel', 'curl', 'wget')
+RATE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmg]?)i?b?\s*$', re.IGNORECASE)
+
+
+def available_external_downloaders():
+    """Зовнішні завантажувачі, знайдені в PATH"""
+    return [name for name in EXTERNAL_DOWNLOADERS if shutil.which(name)]
+
+
+def parse_rate(text):
+    """Швидкість у байтах/с з рядка на кшталт '500K' або '5M' (0 - без обмеження)"""
+    match = RATE_RE.match(str(text))
+    if not match:
+        raise ValueError(f"Невірний формат швидкості: {text}")
+    multiplier = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}[match.group(2).lower()]
+    return int(float(match.group(1)) * multiplier)
+
+
+def merge_engine(preset_engine, overrides=None):
+    """Параметри рушія пресету з урахуванням значень з інтерфейсу або CLI (None - як у пресеті)"""
+    engine = {key: preset_engine.get(key, DEFAULT_ENGINE[key]) for key in ENGINE_KEYS}
+    for key, value in (overrides or {}).items():
+        if key in engine and value is not None:
+            engine[key] = value
+    if engine['external_downloader'] in ('', 'native'):
+        engine['external_downloader'] = None
+    engine['sections'] = sections.parse(engine['sections'])
+    engine['output_template'] = output_paths.parse_template(engine['output_template'])
+    engine['sharding'] = output_paths.parse_sharding(engine['sharding']) or output_paths.DEFAULT_SHARDING
+    return engine
+
+
+class BandwidthLimiter:
+    """Спільний для всіх завдань ліміт швидкості (маркерне відро з боргом)
+
+    Кожен потік, який отримав дані, списує їх з відра і, якщо відро в
+    мінусі, чекає пропорційно своєму боргу. Сумарна швидкість усіх
+    завдань не перевищує rate, а завдання отримують приблизно рівні частки.
+    """
+
+    def __init__(self, rate=0):
+        self.lock = threading.Lock()
+        self.rate = 0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.active_jobs = 0
+        self.set_rate(rate)
+
+    def set_rate(self, rate):
+        """Новий ліміт у байтах/с (0 - без обмеження)"""
+        with self.lock:
+            self.rate = max(0, int(rate or 0))
+            self.tokens = float(self.rate)
+            self.updated = time.monotonic()
+
+    def consume(self, size):
+        """Списання size байтів; блокує потік, якщо ліміт перевищено"""
+        with self.lock:
+            if not self.rate or size <= 0:
+                return
+            now = time.monotonic()
+            # Запас не більше ніж на одну секунду, щоб після паузи не було сплеску
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= size
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0
+        if delay:
+            time.sleep(delay)
+
+    def job_share(self):
+        """Частка ліміту на одне завдання (для зовнішніх завантажувачів, які не викликають хуки на кожен блок)"""
+        with self.lock:
+            if not self.rate:
+                return None
+            return max(1, self.rate // max(1, self.active_jobs))
+
+    def job_started(self):
+        with self.lock:
+            self.active_jobs += 1
+
+    def job_finished(self):
+        with self.lock:
+            self.active_jobs = max(0, self.active_jobs - 1)
+
+    def progress_hook(self):
+        """Хук прогресу yt_dlp, який списує нові байти кожного файлу з відра"""
+        seen = {}
+        seen_lock = threading.Lock()
+
+        def hook(d):
+            if d.get('status') != 'downloading':
+                return
+            name = d.get('tmpfilename') or d.get('filename')
+            downloaded = d.get('downloaded_bytes') or 0
+            with seen_lock:
+                previous = seen.get(name, 0)
+                if downloaded <= previous:
+                    return
+                seen[name] = downloaded
+            self.consume(downloaded - previous)
+
+        return hook
+
+
+_limiter = BandwidthLimiter()
+
+
+def get_limiter():
+    """Спільний обмежувач швидкості процесу"""
+    return _limiter
+
+
+def ydl_engine_opts(engine):
+    """Параметри yt_dlp для рушія завантаження"""
+    opts = {'concurrent_fragment_downloads': max(1, int(engine['concurrent_fragments']))}
+    if engine['external_downloader']:
+        opts['external_downloader'] = {'default': engine['external_downloader']}
+        rate = _limiter.job_share()
+        if rate:
+            opts['ratelimit'] = rate
+    if engine.get('sections'):
+        opts['download_ranges'] = sections.download_ranges(engine['sections'])
+        # Різання по ключових кадрах з копіюванням потоків, без перекодування
+        opts['force_keyframes_at_cuts'] = False
+    return opts
+
+
+_ydl_classes = None
+
+
+def youtube_dl_class(engine):
+    """Клас YoutubeDL для рушія: з відкладеною постобробкою і, за потреби, паралельними потоками"""
+    global _ydl_classes
+    yt_dlp = lazy_imports.yt_dlp()
+    if _ydl_classes is None:
+        _ydl_classes = _make_classes(yt_dlp)
+    staged_class, parallel_class = _ydl_classes
+    return parallel_class if engine['parallel_streams'] else staged_class
+
+
+def _make_classes(yt_dlp):
+
+    class StagedYDL(yt_dlp.YoutubeDL):
+        """YoutubeDL, у якого постобробку можна відкласти на окремий етап
+
+        Після defer_postprocess() злиття, конвертація і запис в архів не
+        виконуються в process_info, а запам'ятовуються; run_deferred() виконує
+        їх пізніше (наприклад, у пулі постобробки), поки потік завантаження
+        вже береться за наступне завдання.
+        """
+        deferred = None
+
+        def defer_postprocess(self):
+            self.deferred = {'postprocess': [], 'archive': []}
+
+        def post_process(self, filename, info, files_to_move=None):
+            if self.deferred is None:
+                return super().post_process(filename, info, files_to_move)
+            # yt_dlp потім прибирає з info спільні з відео поля - постпроцесорам потрібна повна копія
+            self.deferred['postprocess'].append((filename, dict(info), info, files_to_move))
+            info['filepath'] = filename
+            return info
+
+        def record_download_archive(self, info_dict):
+            if self.deferred is None:
+                return super().record_download_archive(info_dict)
+            # В архів потрапляє лише те, що пройшло постобробку
+            self.deferred['archive'].append(info_dict)
+
+        def run_deferred(self):
+            """Виконання відкладеної постобробки в поточному потоці"""
+            deferred, self.deferred = self.deferred, None
+            if not deferred:
+                return
+            for filename, info, target, files_to_move in deferred['postprocess']:
+                target.update(yt_dlp.YoutubeDL.post_process(self, filename, info, files_to_move))
+            for info in deferred['archive']:
+                yt_dlp.YoutubeDL.record_download_archive(self, info)
+
+    class ParallelStreamsYDL(StagedYDL):
+        """YoutubeDL, який завантажує потоки bestvideo+bestaudio одночасно
+
+        yt_dlp викликає dl() для кожного потоку по черзі; тут для кожного потоку
+        в потоці завдання створюється окремий завантажувач (зі своєю копією
+        параметрів і info), а в пул ставиться лише його download(), тож стан
+        самого YoutubeDL з кількох потоків не змінюється. Перед злиттям
+        (post_process) результати очікуються.
+        """
+        stream_executor = None
+        stream_futures = None
+
+        def process_info(self, info_dict):
+            if len(info_dict.get('requested_formats') or []) > 1:
+                self.stream_executor = ThreadPoolExecutor(
+                    max_workers=len(info_dict['requested_formats']), thread_name_prefix='stream'
+                )
+                self.stream_futures = []
+            try:
+                result = super().process_info(info_dict)
+            except BaseException:
+                # Потоки все одно треба дочекатися, але їхня помилка не має сховати початкову
+                try:
+                    self.wait_streams()
+                except Exception:
+                    pass
+                raise
+            # Якщо до злиття не дійшло, помилка потоку лишається помилкою завдання
+            self.wait_streams()
+            return result
+
+        def dl(self, name, info, subtitle=False, test=False):
+            if (self.stream_futures is None or subtitle or test or name == '-'
+                    or info.get('requested_formats') or not info.get('url')):
+                return super().dl(name, info, subtitle, test)
+            params = dict(self.params)
+            fd = yt_dlp.downloader.get_suitable_downloader(info, params)(self, params)
+            for hook in self._progress_hooks:
+                fd.add_progress_hook(hook)
+            stream_info = self._copy_infodict(info)
+            if stream_info.get('http_headers') is None:
+                stream_info['http_headers'] = self._calc_headers(stream_info)
+            self.stream_futures.append(self.stream_executor.submit(fd.download, name, stream_info))
+            return True, True
+
+        def post_process(self, filename, info, files_to_move=None):
+            self.wait_streams()
+            return super().post_process(filename, info, files_to_move)
+
+        def wait_streams(self):
+            futures, executor = self.stream_futures or [], self.stream_executor
+            self.stream_futures = self.stream_executor = None
+            error = None
+            for future in futures:
+                try:
+                    success, _ = future.result()
+                    if not success and error is None:
+                        error = yt_dlp.utils.DownloadError("Не вдалося завантажити один з потоків")
+                except Exception as e:
+                    error = error or e
+            if executor:
+                executor.shutdown(wait=False)
+            if error:
+                raise error
+
+    return StagedYDL, ParallelStreamsYDL
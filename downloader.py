@@ -0,0 +1,345 @@
+"""Логіка завантаження без залежності від Qt (спільна для GUI та пакетного режиму)"""
+import copy
+import os
+import re
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs
+import dedup
+import download_engine
+import history
+import lazy_imports
+import metadata_cache
+import output_paths
+import postprocessing
+import presets
+import sections
+import ydl_pool
+
+YOUTUBE_HOSTS = ('youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com')
+YOUTUBE_LIST_PATHS = ('/playlist', '/channel/', '/c/', '/user/', '/@')
+YOUTUBE_ID_PATHS = ('/shorts/', '/embed/', '/live/', '/v/')
+YOUTUBE_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+MAX_EXPAND_DEPTH = 3
+
+
+def archive_path(save_path, selected_format):
+    """Шлях до архіву завантажень (окремий для кожної папки і формату)"""
+    slug = re.sub(r'[^a-z0-9]+', '-', selected_format.lower()).strip('-')
+    return os.path.join(save_path, f'.ytdownloader_archive_{slug}.txt')
+
+
+def read_archive(path):
+    """Множина ідентифікаторів з архіву yt_dlp ('extractor id')"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return {line.strip() for line in f if line.strip()}
+    except OSError:
+        return set()
+
+
+def is_playlist_url(url):
+    """Чи схожий URL на плейлист або канал YouTube"""
+    parsed = urlparse(url)
+    if parsed.netloc.lower() not in YOUTUBE_HOSTS:
+        return False
+    if 'list' in parse_qs(parsed.query):
+        return True
+    return parsed.path.startswith(YOUTUBE_LIST_PATHS)
+
+
+@lru_cache(maxsize=4096)
+def canonical_video_id(url):
+    """Канонічний ID відео у форматі архіву yt_dlp ('extractor id')
+
+    Різні варіанти URL одного відео (youtu.be, shorts, параметри) дають один ID.
+    """
+    parsed = urlparse(url.strip())
+    host = parsed.netloc.lower()
+
+    video_id = None
+    if host in YOUTUBE_HOSTS:
+        video_id = (parse_qs(parsed.query).get('v') or [None])[0]
+        if not video_id:
+            for prefix in YOUTUBE_ID_PATHS:
+                if parsed.path.startswith(prefix):
+                    video_id = parsed.path[len(prefix):].split('/')[0]
+                    break
+    elif host in ('youtu.be', 'www.youtu.be'):
+        video_id = parsed.path.lstrip('/').split('/')[0]
+    if video_id and YOUTUBE_ID_RE.match(video_id):
+        return f"youtube {video_id}"
+
+    # Інші сайти: той самий тимчасовий ID, який yt_dlp використовує для архіву
+    yt_dlp = lazy_imports.yt_dlp()
+    for ie in yt_dlp.extractor.gen_extractor_classes():
+        if ie.ie_key() == 'Generic' or not ie.suitable(url):
+            continue
+        temp_id = ie.get_temp_id(url)
+        if temp_id:
+            return f"{ie.ie_key().lower()} {temp_id}"
+        break
+
+    return f"url {parsed._replace(fragment='').geturl()}"
+
+
+def extract_info(url, ydl=None):
+    """Метадані відео з кешу або з yt_dlp (з подальшим збереженням у кеш)"""
+    cache = metadata_cache.get_cache()
+    key = canonical_video_id(url)
+    info = cache.get(key)
+    if info is not None:
+        return info
+
+    if ydl is None:
+        yt_dlp = lazy_imports.yt_dlp()
+        with ydl_pool.get_pool().use(yt_dlp.YoutubeDL, {'quiet': True}) as ydl:
+            info = ydl.sanitize_info(ydl.extract_info(url, download=False), remove_private_keys=True)
+    else:
+        info = ydl.sanitize_info(ydl.extract_info(url, download=False), remove_private_keys=True)
+    cache.put(key, info)
+    return info
+
+
+def thumbnail_urls(info, width, height, extensions=None):
+    """URL превью для показу в розмірі width x height, від найкращого до запасних
+
+    Найкращий - найменший варіант зі списку thumbnails, який при вписуванні в
+    width x height не доведеться збільшувати (maxres на кілька МБ для маленького
+    превью не потрібен). Варіанти з розширенням поза extensions (формати, які
+    вміє декодувати GUI) пропускаються; останнім запасним є info['thumbnail'].
+    """
+    covering = []
+    smaller = []
+    for thumbnail in info.get('thumbnails') or []:
+        url = thumbnail.get('url')
+        thumb_width, thumb_height = thumbnail.get('width'), thumbnail.get('height')
+        if not url or not thumb_width or not thumb_height:
+            continue
+        ext = os.path.splitext(urlparse(url).path)[1][1:].lower()
+        if ext and extensions and ext not in extensions:
+            continue
+        entry = (thumb_width * thumb_height, -(thumbnail.get('preference') or 0), url)
+        if thumb_width >= width or thumb_height >= height:
+            covering.append(entry)
+        else:
+            smaller.append(entry)
+
+    urls = [url for _, _, url in sorted(covering)]
+    # Якщо жоден варіант не покриває розмір - беремо найбільший з менших
+    urls += [url for _, _, url in sorted(smaller, key=lambda entry: (-entry[0], entry[1]))]
+    if info.get('thumbnail') and info['thumbnail'] not in urls:
+        urls.append(info['thumbnail'])
+    return urls
+
+
+def job_preset(selected_format, engine=None):
+    """Назва пресету завдання для історії та індексу папки (з урахуванням фрагментів)"""
+    return sections.preset_key(selected_format, presets.get_registry().engine(selected_format, engine)['sections'])
+
+
+def find_existing(url, save_path, selected_format, engine=None):
+    """Чи завантажено відео раніше (файл у папці, архів, історія) - без звернення до мережі"""
+    clip_sections = presets.get_registry().engine(selected_format, engine)['sections']
+    return dedup.find_existing(
+        canonical_video_id(url),
+        save_path,
+        sections.preset_key(selected_format, clip_sections),
+        # Архів yt_dlp знає лише про повні відео
+        archive_file=None if clip_sections else archive_path(save_path, selected_format),
+        output_ext=None if clip_sections else presets.get_registry().output_ext(selected_format)
+    )
+
+
+def expand_url(url, archive=None):
+    """Розгортання плейлиста/каналу у список відео одним пласким запитом
+
+    Повертає (entries, skipped), де entries - список словників з 'url' та 'title',
+    а skipped - кількість відео, які вже є в архіві.
+    """
+    yt_dlp = lazy_imports.yt_dlp()
+    archive = archive or set()
+    entries = []
+    skipped = 0
+
+    with ydl_pool.get_pool().use(yt_dlp.YoutubeDL, {'quiet': True, 'extract_flat': 'in_playlist'}) as ydl:
+        pending = [(url, 0)]
+        while pending:
+            current_url, depth = pending.pop(0)
+            info = ydl.extract_info(current_url, download=False)
+            if not info:
+                continue
+
+            if info.get('_type') not in ('playlist', 'multi_video'):
+                entries.append({'url': current_url, 'title': info.get('title')})
+                continue
+
+            for entry in info.get('entries') or []:
+                if not entry:
+                    continue
+                entry_url = entry.get('url') or entry.get('webpage_url')
+                if not entry_url:
+                    continue
+                # Вкладки каналу (Videos, Shorts, ...) є вкладеними плейлистами
+                if entry.get('ie_key') == 'YoutubeTab' or is_playlist_url(entry_url):
+                    if depth + 1 < MAX_EXPAND_DEPTH:
+                        pending.append((entry_url, depth + 1))
+                    continue
+                if entry.get('ie_key') and entry.get('id'):
+                    if f"{entry['ie_key'].lower()} {entry['id']}" in archive:
+                        skipped += 1
+                        continue
+                entries.append({'url': entry_url, 'title': entry.get('title')})
+
+    return entries, skipped
+
+
+def build_ydl_opts(selected_format, save_path, progress_hooks=None, engine=None, postprocessor_hooks=None):
+    """Параметри yt_dlp: пресет з реєстру плюс параметри конкретного завдання і рушія"""
+    limiter = download_engine.get_limiter()
+    engine = engine or presets.get_registry().engine(selected_format)
+    # Фрагменти зберігаються окремо від повного відео і не потрапляють в архів
+    suffix = sections.OUTTMPL_SUFFIX if engine['sections'] else ''
+    return presets.get_registry().build_ydl_opts(
+        selected_format,
+        outtmpl=os.path.join(save_path, output_paths.outtmpl(engine, suffix)),
+        windowsfilenames=True,
+        restrictfilenames=bool(engine['ascii_filenames']),
+        progress_hooks=[limiter.progress_hook()] + list(progress_hooks or []),
+        postprocessor_hooks=list(postprocessor_hooks or []),
+        download_archive=None if engine['sections'] else archive_path(save_path, selected_format),
+        quiet=True,
+        noprogress=True,
+        # Продовження з .part-файлів, які залишилися після перезапуску (див. journal.py)
+        continuedl=True,
+        **download_engine.ydl_engine_opts(engine)
+    )
+
+
+class StagedDownload:
+    """Завантажене завдання, постобробка якого ще попереду (download(..., defer_postprocess=True))
+
+    Екземпляр YoutubeDL лишається за завданням до кінця постобробки і
+    повертається в пул у postprocess() або discard().
+    """
+
+    def __init__(self, pool, pool_key, ydl, result, save_path, video_id, preset, telemetry=None):
+        self.pool = pool
+        self.pool_key = pool_key
+        self.ydl = ydl
+        self.result = result
+        self.save_path = save_path
+        self.video_id = video_id
+        self.preset = preset
+        self.telemetry = telemetry
+
+    def postprocess(self):
+        """Злиття, конвертація і запис в архів у поточному потоці; повертає результат yt_dlp"""
+        try:
+            self.ydl.run_deferred()
+        except BaseException:
+            self.discard()
+            raise
+        self.pool.release(self.pool_key, self.ydl)
+        output_paths.get_reservations().release(self.ydl)
+        if self.telemetry:
+            self.telemetry.finish(self.result)
+        dedup.get_index(self.save_path).add(history.output_path(self.result), self.video_id, self.preset)
+        return self.result
+
+    def discard(self):
+        """Відмова від постобробки (скасування або помилка); завантажені файли лишаються"""
+        self.pool.release(self.pool_key, self.ydl, reusable=False)
+        output_paths.get_reservations().release(self.ydl)
+        if self.telemetry:
+            self.telemetry.finish(None)
+
+
+def download(url, save_path, selected_format, progress_hooks=None, engine=None, telemetry=None,
+             defer_postprocess=False):
+    """Завантаження одного URL у вибраному форматі
+
+    Якщо метадані вже є в кеші (наприклад, після превью), повторне
+    отримання інформації про відео пропускається. engine - значення
+    параметрів рушія, які замінюють значення пресету (None - як у пресеті).
+    Перед завантаженням progress_hooks отримують подію 'planned' зі списком
+    потоків (див. postprocessing.format_plan_pp). Екземпляр YoutubeDL
+    береться з пулу (ydl_pool) і повторно використовується наступними
+    завданнями з тими самими параметрами. telemetry (telemetry.JobTelemetry)
+    отримує події прогресу і постпроцесорів і завершується разом із завданням.
+    Якщо в engine задано sections, завантажуються лише ці фрагменти (sections.py).
+    Перед завантаженням для файлу резервується місце на диску за оцінкою
+    розміру форматів (output_paths.SpaceReservations), а якщо його не вистачає -
+    завдання завершується з output_paths.NotEnoughSpace.
+
+    З defer_postprocess=True повертається StagedDownload одразу після
+    завантаження байтів, а постобробку виконує його postprocess() (зазвичай
+    у postprocessing.PostprocessPool).
+    """
+    yt_dlp = lazy_imports.yt_dlp()
+    cache = metadata_cache.get_cache()
+    key = canonical_video_id(url)
+    info = cache.get(key)
+
+    registry = presets.get_registry()
+    engine = registry.engine(selected_format, engine)
+    progress_hooks = list(progress_hooks or [])
+    postprocessor_hooks = []
+    if telemetry:
+        progress_hooks.append(telemetry.progress_hook)
+        postprocessor_hooks.append(telemetry.postprocessor_hook)
+
+    limiter = download_engine.get_limiter()
+    limiter.job_started()
+    pool = ydl_pool.get_pool()
+    ydl = None
+    result = None
+    try:
+        ydl_opts = build_ydl_opts(selected_format, save_path, progress_hooks, engine, postprocessor_hooks)
+        container = registry.postprocess_container(selected_format)
+        native_audio, audio_codec = registry.native_audio(selected_format)
+
+        def setup(ydl, hooks):
+            if container:
+                ydl.add_post_processor(postprocessing.smart_container_pp(ydl, container), when='post_process')
+            if native_audio:
+                ydl.add_post_processor(postprocessing.native_audio_pp(ydl, audio_codec), when='post_process')
+            ydl.add_post_processor(postprocessing.shard_key_pp(ydl), when='pre_process')
+            ydl.add_post_processor(postprocessing.free_space_pp(ydl), when='before_dl')
+            ydl.add_post_processor(postprocessing.format_plan_pp(ydl, hooks), when='before_dl')
+
+        ydl_class = download_engine.youtube_dl_class(engine)
+        variant = (container, native_audio, audio_codec)
+        pool_key, ydl = pool.acquire(ydl_class, ydl_opts, setup, variant=variant)
+        if info is not None:
+            try:
+                if defer_postprocess:
+                    ydl.defer_postprocess()
+                result = ydl.process_ie_result(copy.deepcopy(info), download=True)
+            except yt_dlp.utils.DownloadError as e:
+                # Посилання на потоки могли застаріти - отримуємо метадані заново
+                print(f"Кешовані метадані не підійшли, повторне отримання: {e}")
+                cache.discard(key)
+                output_paths.get_reservations().release(ydl)
+
+        if result is None:
+            if defer_postprocess:
+                ydl.defer_postprocess()
+            result = ydl.extract_info(url, download=True)
+            cache.put(key, ydl.sanitize_info(result, remove_private_keys=True))
+    except BaseException:
+        if ydl is not None:
+            pool.release(pool_key, ydl, reusable=False)
+            output_paths.get_reservations().release(ydl)
+        if telemetry:
+            telemetry.finish(None)
+        raise
+    finally:
+        limiter.job_finished()
+
+    if telemetry:
+        telemetry.downloaded()
+    preset = sections.preset_key(selected_format, engine['sections'])
+    staged = StagedDownload(pool, pool_key, ydl, result, save_path, key, preset, telemetry)
+    if defer_postprocess:
+        return staged
+    return staged.postprocess()
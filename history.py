@@ -0,0 +1,152 @@
+"""Історія завантажень у SQLite без залежності від Qt (спільна для GUI та пакетного режиму)"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    video_id TEXT,
+    title TEXT,
+    preset TEXT,
+    output_path TEXT,
+    size INTEGER,
+    duration REAL,
+    throughput REAL,
+    status TEXT NOT NULL,
+    message TEXT,
+    started_at REAL,
+    finished_at REAL NOT NULL,
+    telemetry TEXT
+);
+CREATE INDEX IF NOT EXISTS downloads_video_id ON downloads (video_id, preset, status);
+CREATE INDEX IF NOT EXISTS downloads_finished_at ON downloads (finished_at);
+"""
+COLUMNS = ('id', 'url', 'video_id', 'title', 'preset', 'output_path', 'size', 'duration',
+           'throughput', 'status', 'message', 'started_at', 'finished_at', 'telemetry')
+# Стовпці, додані після першої версії схеми: (назва, тип)
+MIGRATIONS = (('telemetry', 'TEXT'),)
+
+
+class HistoryStore:
+    """Записи про завершені завдання з індексами за ID відео і часом"""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        # Одне з'єднання на процес: записи йдуть з потоків завантаження, читання - з GUI
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.executescript(SCHEMA)
+            existing = {row['name'] for row in self.connection.execute("PRAGMA table_info(downloads)")}
+            for name, column_type in MIGRATIONS:
+                if name not in existing:
+                    self.connection.execute(f"ALTER TABLE downloads ADD COLUMN {name} {column_type}")
+
+    def add(self, record):
+        """Додавання запису; повертає його id"""
+        record = dict(record)
+        record.setdefault('finished_at', time.time())
+        fields = [column for column in COLUMNS[1:] if column in record]
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                f"INSERT INTO downloads ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                [record[field] for field in fields]
+            )
+            return cursor.lastrowid
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    def page(self, offset=0, limit=100):
+        """Записи від найновіших до найстаріших (limit=-1 - усі записи)"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM downloads ORDER BY finished_at DESC, id DESC LIMIT ? OFFSET ?",
+                (limit, offset)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def newer_than(self, record_id):
+        """Записи, додані після record_id (від найновіших)"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM downloads WHERE id > ? ORDER BY finished_at DESC, id DESC",
+                (record_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def find_downloaded(self, video_id, preset):
+        """Останнє успішне завантаження відео в цьому пресеті, файл якого ще існує, або None"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT * FROM downloads WHERE video_id = ? AND preset = ? AND status = 'done' "
+                "ORDER BY finished_at DESC",
+                (video_id, preset)
+            ).fetchall()
+        for row in rows:
+            if row['output_path'] and os.path.exists(row['output_path']):
+                return dict(row)
+        return None
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+def output_path(info):
+    """Шлях до готового файлу з результату yt_dlp"""
+    for download in reversed((info or {}).get('requested_downloads') or []):
+        if download.get('filepath'):
+            return download['filepath']
+    return (info or {}).get('filepath')
+
+
+def build_record(url, video_id, preset, status, message="", info=None, started_at=None, finished_at=None,
+                 telemetry=None):
+    """Запис історії з результату завантаження (розмір, тривалість, швидкість)
+
+    telemetry - зведення telemetry.JobTelemetry, зберігається як JSON.
+    """
+    finished_at = finished_at or time.time()
+    path = output_path(info)
+    if path:
+        path = os.path.abspath(path)
+    size = os.path.getsize(path) if path and os.path.exists(path) else None
+    duration = round(finished_at - started_at, 3) if started_at else None
+    return {
+        'url': url,
+        'video_id': video_id,
+        'title': (info or {}).get('title'),
+        'preset': preset,
+        'output_path': path,
+        'size': size,
+        'duration': duration,
+        'throughput': round(size / duration, 1) if size and duration else None,
+        'status': status,
+        'message': message,
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'telemetry': json.dumps(telemetry, ensure_ascii=False) if telemetry else None
+    }
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Спільна історія в ~/.ytdownloader_cache/history.sqlite3"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            cache_dir = os.path.join(os.path.expanduser('~'), '.ytdownloader_cache')
+            os.makedirs(cache_dir, exist_ok=True)
+            _store = HistoryStore(os.path.join(cache_dir, 'history.sqlite3'))
+        return _store
@@ -0,0 +1,76 @@
+"""Спільний HTTP-клієнт без залежності від Qt: пул з'єднань keep-alive, тайм-аути та повтори
+
+Превью, перевірка і завантаження оновлень ходять через одну сесію requests,
+тому повторні запити до того ж хоста (i.ytimg.com, api.github.com) не
+відкривають нове TCP/TLS-з'єднання.
+"""
+import threading
+import lazy_imports
+
+# (підключення, читання) - без тайм-ауту запит без мережі може висіти хвилинами
+REQUEST_TIMEOUT = (3.05, 10)
+# Кількість хостів, для яких тримаються пули, і з'єднань на один хост
+POOL_CONNECTIONS = 8
+POOL_MAXSIZE = 8
+# Повтори при обриві з'єднання і тимчасових відповідях сервера: 0.5 с, 1 с, 2 с
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def create_session(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                   retries=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF):
+    """Нова сесія requests з пулом з'єднань і повторами з експоненційною затримкою"""
+    requests = lazy_imports.requests()
+    retry = requests.adapters.Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        # Повторюються лише ідемпотентні запити
+        allowed_methods=frozenset({'GET', 'HEAD'}),
+        respect_retry_after_header=True,
+        # Після останньої спроби повертається відповідь, а не RetryError -
+        # код відповіді перевіряє той, хто робив запит
+        raise_on_status=False
+    )
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Спільна сесія для всіх потоків
+
+    Після створення стан сесії не змінюється (заголовки передаються в кожен
+    запит окремо), а пул з'єднань urllib3 потокобезпечний, тому сесію можна
+    використовувати з кількох потоків одночасно.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+def get(url, timeout=REQUEST_TIMEOUT, **kwargs):
+    """GET через спільну сесію (з тайм-аутом за замовчуванням)"""
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+
+def close():
+    """Закриття з'єднань спільної сесії (при виході з програми)"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
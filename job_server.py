@@ -0,0 +1,564 @@
+"""Локальний HTTP API для постановки завдань з інших програм (без залежності від Qt)
+
+Сервер слухає лише 127.0.0.1 і працює або окремо (python main.py --serve),
+або всередині GUI ([Server] enabled = true у config.ini) - тоді завдання
+потрапляють у ту саму чергу, що й з поля URL.
+
+    POST   /jobs          {"jobs": [{"url": ..., "preset": ..., "out_dir": ..., "sections": ...}]}
+                          (або один об'єкт) -> {"jobs": [{"id": ..., "status": ...}, ...]};
+                          також output_template, sharding і ascii_filenames (output_paths.py)
+    GET    /jobs          список завдань (?status=done&limit=100)
+    GET    /jobs/<id>     стан завдання
+    DELETE /jobs/<id>     скасування
+    GET    /events        потік подій JSON lines (?job=<id> - лише для цих завдань)
+    GET    /stats         стан черги, пропускна здатність, пули
+    GET    /presets       назви пресетів
+
+Якщо задано token, кожен запит має містити заголовок
+"Authorization: Bearer <token>". Запити із заголовком Origin (зі сторінок у
+браузері) і POST без Content-Type: application/json відхиляються, а out_dir
+завдання має лежати в папці за замовчуванням або в дозволених (--allow-dir,
+[Server] allowed_dirs). Події мають той самий формат, що й вивід
+пакетного режиму (cli.py), плюс поле job.
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import cli
+import downloader
+import metadata_cache
+import output_paths
+import postprocessing
+import presets
+import sections
+import ydl_pool
+
+HOST = '127.0.0.1'
+# Значення заголовка Host, з якими приймаються запити
+LOCAL_HOSTS = ('127.0.0.1', 'localhost', '::1')
+DEFAULT_PORT = 8770
+# Події для повільного клієнта, які чекають на відправку; зайві відкидаються
+EVENT_QUEUE_SIZE = 1000
+# Порожня подія для потоку /events, щоб помічати закриті з'єднання
+HEARTBEAT_INTERVAL = 15
+# Вікно для швидкості і кількості завершених завдань (с)
+THROUGHPUT_WINDOW = 60
+MAX_BODY_SIZE = 16 * 1024 * 1024
+ACTIVE_STATUSES = ('pending', 'downloading', 'processing')
+JOB_STATUSES = ACTIVE_STATUSES + ('done', 'error', 'cancelled', 'skipped')
+# Поля завдання з параметрами шляху файлу (див. output_paths.py)
+OUTPUT_FIELDS = ('output_template', 'sharding', 'ascii_filenames')
+# Допустимі типи полів завдання з POST /jobs
+FIELD_TYPES = {
+    'preset': str, 'out_dir': str, 'sections': (str, list),
+    'output_template': str, 'sharding': str, 'ascii_filenames': bool
+}
+# Поля подій, які зберігаються в стані завдання
+RECORD_FIELDS = ('percent', 'speed', 'eta', 'phase', 'downloaded_bytes', 'output_path', 'message', 'elapsed')
+
+
+class EventBus:
+    """Розсилка подій підписникам /events; публікація ніколи не блокує завантаження"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = {}
+        self.dropped = 0
+
+    def subscribe(self, job_ids=None):
+        events = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        with self.lock:
+            self.subscribers[events] = set(job_ids) if job_ids else None
+        return events
+
+    def unsubscribe(self, events):
+        with self.lock:
+            self.subscribers.pop(events, None)
+
+    def publish(self, event, **fields):
+        record = {'event': event, 'time': round(time.time(), 3)}
+        record.update(fields)
+        with self.lock:
+            subscribers = list(self.subscribers.items())
+        for events, job_ids in subscribers:
+            if job_ids is not None and record.get('job') not in job_ids:
+                continue
+            try:
+                events.put_nowait(record)
+            except queue.Full:
+                with self.lock:
+                    self.dropped += 1
+
+
+class JobTable:
+    """Стан завдань API і пропускна здатність; оновлюється подіями завдань"""
+
+    def __init__(self, bus):
+        self.bus = bus
+        self.lock = threading.Lock()
+        self.records = {}
+        self.started = time.monotonic()
+        self.finished = deque()
+        self.completed = 0
+        self.downloaded_bytes = 0
+
+    def add(self, record):
+        record = dict(record, created=round(time.time(), 3))
+        with self.lock:
+            self.records[record['id']] = record
+        self.bus.publish('queued', job=record['id'], url=record['url'], preset=record['preset'],
+                         status=record['status'])
+        return dict(record)
+
+    def update(self, job_id, event=None, **fields):
+        """Оновлення стану завдання; event - подія для підписників /events"""
+        with self.lock:
+            record = self.records.get(job_id)
+            if record is None:
+                return
+            if fields.get('status') == 'done' and record['status'] != 'done':
+                self._count_finished(record, fields)
+            for name in ('status',) + RECORD_FIELDS:
+                if fields.get(name) is not None:
+                    record[name] = fields[name]
+        if event:
+            self.bus.publish(event, job=job_id, **fields)
+
+    def _count_finished(self, record, fields):
+        streams = (fields.get('telemetry') or {}).get('streams') or []
+        size = sum(stream.get('bytes') or 0 for stream in streams) or record.get('downloaded_bytes') or 0
+        now = time.monotonic()
+        self.completed += 1
+        self.downloaded_bytes += size
+        self.finished.append((now, size))
+        while self.finished and now - self.finished[0][0] > THROUGHPUT_WINDOW:
+            self.finished.popleft()
+
+    def get(self, job_id):
+        with self.lock:
+            record = self.records.get(job_id)
+            return dict(record) if record else None
+
+    def list(self, status=None, limit=None):
+        with self.lock:
+            records = [dict(record) for record in self.records.values()
+                       if status is None or record['status'] == status]
+        return records[-limit:] if limit else records
+
+    def find_active(self, video_id, out_dir, preset):
+        with self.lock:
+            for record in self.records.values():
+                if (record['status'] in ACTIVE_STATUSES and record['video_id'] == video_id
+                        and record['out_dir'] == out_dir and record['preset_key'] == preset):
+                    return dict(record)
+        return None
+
+    def stats(self):
+        """Кількість завдань за станом і пропускна здатність за останні THROUGHPUT_WINDOW с"""
+        now = time.monotonic()
+        with self.lock:
+            counts = dict.fromkeys(JOB_STATUSES, 0)
+            for record in self.records.values():
+                counts[record['status']] = counts.get(record['status'], 0) + 1
+            recent = [(at, size) for at, size in self.finished if now - at <= THROUGHPUT_WINDOW]
+            window = min(THROUGHPUT_WINDOW, now - self.started) or 1
+            throughput = {
+                'window_seconds': THROUGHPUT_WINDOW,
+                'jobs_per_minute': round(len(recent) * 60 / window, 2),
+                'bytes_per_second': round(sum(size for _, size in recent) / window, 1),
+                'completed': self.completed,
+                'downloaded_bytes': self.downloaded_bytes
+            }
+        counts['total'] = sum(counts.values())
+        return {
+            'uptime_seconds': round(now - self.started, 1),
+            'jobs': counts,
+            'throughput': throughput,
+            'postprocess': postprocessing.get_pool().depth(),
+            'ydl_pool': ydl_pool.get_pool().stats(),
+            'metadata_cache': metadata_cache.get_cache().stats(),
+            'disk_reservations': output_paths.get_reservations().stats(),
+            'events_dropped': self.bus.dropped
+        }
+
+
+def is_inside(path, folders):
+    """Чи лежить path у одній з папок folders (з урахуванням символічних посилань)"""
+    path = os.path.realpath(path)
+    for folder in folders:
+        folder = os.path.realpath(folder)
+        try:
+            if os.path.commonpath([path, folder]) == folder:
+                return True
+        except ValueError:
+            # Різні диски у Windows
+            continue
+    return False
+
+
+def parse_item(item, default_out, default_engine=None, allowed_dirs=None):
+    """Перевірка одного завдання з POST /jobs: (url, preset, out_dir, engine) або ValueError
+
+    default_engine - параметри рушія для полів, яких немає в завданні (шаблон імені, підпапки).
+    out_dir (відносний - від default_out) має лежати в default_out або в одній з allowed_dirs.
+    """
+    if isinstance(item, str):
+        item = {'url': item}
+    if not isinstance(item, dict):
+        raise ValueError("Завдання має бути об'єктом або рядком URL")
+    url = str(item.get('url') or '').strip()
+    if not url.startswith(('http://', 'https://')):
+        raise ValueError(f"Невірний формат URL: {url}")
+    for key, types in FIELD_TYPES.items():
+        if item.get(key) is not None and not isinstance(item[key], types):
+            raise ValueError(f"Невірний тип поля {key}")
+    if isinstance(item.get('sections'), list) and not all(isinstance(section, str) for section in item['sections']):
+        raise ValueError("Невірний тип поля sections")
+    registry = presets.get_registry()
+    preset = item.get('preset') or registry.names()[0]
+    if preset not in registry.names():
+        raise ValueError(f"Невідомий пресет: {preset}")
+    out_dir = os.path.abspath(os.path.join(default_out, os.path.expanduser(str(item.get('out_dir') or ''))))
+    if not is_inside(out_dir, [default_out] + list(allowed_dirs or [])):
+        raise ValueError(f"Папка поза дозволеними для API: {out_dir}")
+    engine = dict(default_engine or {})
+    engine['sections'] = sections.parse(item.get('sections'))
+    for key in OUTPUT_FIELDS:
+        if item.get(key) is not None:
+            engine[key] = item[key]
+    if engine.get('output_template') is not None:
+        engine['output_template'] = output_paths.parse_template(engine['output_template'])
+    engine['sharding'] = output_paths.parse_sharding(engine.get('sharding'))
+    if engine.get('ascii_filenames') is not None:
+        engine['ascii_filenames'] = bool(engine['ascii_filenames'])
+    return url, preset, out_dir, engine
+
+
+class JobReporter:
+    """Адаптер подій cli.BatchJob до JobTable (з ідентифікатором завдання)"""
+
+    STATUSES = {'start': 'downloading', 'downloaded': 'processing', 'finished': 'done'}
+
+    def __init__(self, table, job_id, cancel_event):
+        self.table = table
+        self.job_id = job_id
+        self.cancel_event = cancel_event
+
+    def emit(self, event, **fields):
+        fields.pop('url', None)
+        if event == 'error':
+            fields['status'] = 'cancelled' if self.cancel_event.is_set() else 'error'
+        elif event in self.STATUSES:
+            fields['status'] = self.STATUSES[event]
+        self.table.update(self.job_id, event, **fields)
+
+
+class HeadlessBackend:
+    """Черга завдань без GUI: ті самі етапи завантаження і постобробки, що й у cli.py"""
+
+    def __init__(self, bus, max_workers=4, postprocess_workers=None, default_out='.', default_engine=None,
+                 allowed_dirs=None):
+        self.table = JobTable(bus)
+        self.default_out = default_out
+        self.default_engine = default_engine or {}
+        self.allowed_dirs = list(allowed_dirs or [])
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='api-download')
+        self.postprocess_pool = postprocessing.get_pool(postprocess_workers)
+        self.cancel_events = {}
+
+    def submit(self, items):
+        results = []
+        for item in items:
+            try:
+                url, preset, out_dir, engine = parse_item(item, self.default_out, self.default_engine, self.allowed_dirs)
+            except ValueError as e:
+                results.append({'error': str(e), 'item': item})
+                continue
+            try:
+                results.append(self.add(url, preset, out_dir, engine))
+            except Exception as e:
+                # Помилка одного завдання не скасовує ті, що вже в черзі
+                results.append({'error': str(e), 'item': item})
+        return results
+
+    def add(self, url, preset, out_dir, engine):
+        video_id = downloader.canonical_video_id(url)
+        preset_key = downloader.job_preset(preset, engine)
+        active = self.table.find_active(video_id, out_dir, preset_key)
+        if active:
+            self.table.bus.publish('attached', job=active['id'], url=url)
+            return dict(active, attached=True)
+
+        existing = downloader.find_existing(url, out_dir, preset, engine)
+        record = {
+            'id': uuid.uuid4().hex, 'url': url, 'video_id': video_id, 'preset': preset,
+            'preset_key': preset_key, 'out_dir': out_dir, 'sections': engine['sections'],
+            'status': 'skipped' if existing else 'pending'
+        }
+        if existing:
+            record['output_path'] = existing['path']
+            return self.table.add(record)
+        os.makedirs(out_dir, exist_ok=True)
+
+        cancel_event = threading.Event()
+        self.cancel_events[record['id']] = cancel_event
+        reporter = JobReporter(self.table, record['id'], cancel_event)
+        job = cli.BatchJob(url, out_dir, preset, reporter, cancel_event, engine)
+        result = self.table.add(record)
+        self.executor.submit(self.run, record['id'], job)
+        return result
+
+    def run(self, job_id, job):
+        try:
+            if job.cancel_event.is_set():
+                self.table.update(job_id, 'error', status='cancelled', message="Завантаження скасовано")
+                return
+            result = job.run(self.postprocess_pool)
+            if isinstance(result, Future):
+                result.add_done_callback(lambda future: self.cancel_events.pop(job_id, None))
+                return
+        except Exception as e:
+            self.table.update(job_id, 'error', status='error', message=str(e))
+        self.cancel_events.pop(job_id, None)
+
+    def cancel(self, job_id):
+        cancel_event = self.cancel_events.get(job_id)
+        if cancel_event is None:
+            return False
+        cancel_event.set()
+        return True
+
+    def shutdown(self):
+        for cancel_event in list(self.cancel_events.values()):
+            cancel_event.set()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.postprocess_pool.shutdown(wait=True)
+        ydl_pool.get_pool().close()
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'YTDownloaderAPI'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def backend(self):
+        return self.server.backend
+
+    def route(self):
+        parsed = urlparse(self.path)
+        parts = [part for part in parsed.path.split('/') if part]
+        return parts, parse_qs(parsed.query)
+
+    def authorized(self):
+        """Перевірка токена і того, що запит не надіслано зі сторінки в браузері"""
+        # Браузер додає Origin до запитів fetch/форм з інших сайтів; локальні клієнти його не надсилають
+        if self.headers.get('Origin') is not None:
+            self.send_json({'error': "Запити з браузера заборонено"}, 403)
+            return False
+        # Захист від DNS rebinding: ім'я хоста має вказувати на локальну адресу
+        host = (self.headers.get('Host') or '').rsplit(':', 1)[0].strip('[]').lower()
+        if host not in LOCAL_HOSTS:
+            self.send_json({'error': "Невірний заголовок Host"}, 403)
+            return False
+        token = self.server.token
+        if not token or self.headers.get('Authorization') == f'Bearer {token}':
+            return True
+        self.send_json({'error': "Потрібен токен доступу"}, 401)
+        return False
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length <= 0 or length > MAX_BODY_SIZE:
+            raise ValueError("Потрібне тіло запиту JSON")
+        return json.loads(self.rfile.read(length).decode('utf-8'))
+
+    def do_GET(self):
+        if not self.authorized():
+            return
+        parts, query = self.route()
+        if parts == ['jobs']:
+            try:
+                limit = int((query.get('limit') or [0])[0]) or None
+                if limit is not None and limit < 0:
+                    raise ValueError(limit)
+            except ValueError:
+                return self.send_json({'error': "limit має бути невід'ємним цілим числом"}, 400)
+            return self.send_json({'jobs': self.backend.table.list((query.get('status') or [None])[0], limit)})
+        if len(parts) == 2 and parts[0] == 'jobs':
+            record = self.backend.table.get(parts[1])
+            return self.send_json(record, 200) if record else self.send_json({'error': "Завдання не знайдено"}, 404)
+        if parts == ['stats']:
+            return self.send_json(self.backend.table.stats())
+        if parts == ['presets']:
+            return self.send_json({'presets': presets.get_registry().names()})
+        if parts == ['events']:
+            return self.stream_events(query.get('job'))
+        self.send_json({'error': "Невідомий шлях"}, 404)
+
+    def do_POST(self):
+        if not self.authorized():
+            return
+        parts, _ = self.route()
+        if parts != ['jobs']:
+            return self.send_json({'error': "Невідомий шлях"}, 404)
+        # Браузер без дозволу CORS може надіслати лише text/plain або форму, а не application/json
+        content_type = (self.headers.get('Content-Type') or '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            return self.send_json({'error': "Content-Type має бути application/json"}, 415)
+        try:
+            data = self.read_json()
+        except ValueError as e:
+            return self.send_json({'error': f"Невірний JSON: {e}"}, 400)
+        items = data.get('jobs') if isinstance(data, dict) and 'jobs' in data else data
+        if not isinstance(items, list):
+            items = [items]
+        try:
+            results = self.backend.submit(items)
+        except Exception as e:
+            return self.send_json({'error': str(e)}, 503)
+        status = 202 if any('id' in result for result in results) else 400
+        self.send_json({'jobs': results}, status)
+
+    def do_DELETE(self):
+        if not self.authorized():
+            return
+        parts, _ = self.route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            return self.send_json({'error': "Невідомий шлях"}, 404)
+        if self.backend.cancel(parts[1]):
+            return self.send_json({'id': parts[1], 'cancelled': True}, 202)
+        self.send_json({'error': "Завдання не знайдено або вже завершено"}, 404)
+
+    def stream_events(self, job_ids=None):
+        """Події JSON lines до закриття з'єднання клієнтом"""
+        events = self.server.bus.subscribe(job_ids)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while not self.server.stopping.is_set():
+                try:
+                    record = events.get(timeout=HEARTBEAT_INTERVAL)
+                except queue.Empty:
+                    record = {'event': 'heartbeat', 'time': round(time.time(), 3)}
+                self.wfile.write((json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError, OSError):
+            pass
+        finally:
+            self.server.bus.unsubscribe(events)
+
+
+class JobServer:
+    """HTTP-сервер API у фоновому потоці
+
+    backend має атрибут table (JobTable) і методи submit(items) та
+    cancel(job_id); submit викликається з потоків сервера.
+    """
+
+    def __init__(self, backend, bus, port=DEFAULT_PORT, token=None, host=HOST):
+        self.httpd = ThreadingHTTPServer((host, port), JobRequestHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.backend = backend
+        self.httpd.bus = bus
+        self.httpd.token = token or None
+        self.httpd.stopping = threading.Event()
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='job-server', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.stopping.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='main.py --serve', description="YouTube Downloader: локальний API завдань")
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, metavar='PORT', help="порт на 127.0.0.1 (0 - будь-який вільний)")
+    parser.add_argument('--token', default=os.environ.get('YTDOWNLOADER_TOKEN'), metavar='TOKEN',
+                        help="токен доступу (за замовчуванням - змінна YTDOWNLOADER_TOKEN)")
+    parser.add_argument('--out', default='.', metavar='DIR', help="папка за замовчуванням для завдань без out_dir")
+    parser.add_argument('--allow-dir', action='append', default=[], metavar='DIR',
+                        help="ще одна папка, в яку дозволено зберігати (out_dir завдань); можна кілька разів")
+    parser.add_argument('--jobs', type=int, default=4, metavar='N', help="кількість одночасних завантажень")
+    parser.add_argument('--postprocess-jobs', type=int, default=None, metavar='N',
+                        help="кількість потоків постобробки (за замовчуванням - кількість ядер процесора)")
+    parser.add_argument('--presets', default=presets.USER_PRESETS_FILE, metavar='FILE', help="JSON-файл з пресетами користувача")
+    parser.add_argument('--output-template', type=output_paths.parse_template, default=None, metavar='TEMPLATE',
+                        help="шаблон імені файлу yt_dlp для завдань без output_template (див. output_paths.py)")
+    parser.add_argument('--shard', choices=tuple(output_paths.SHARDING), default=None,
+                        help="підпапки для завдань без sharding: за автором, датою або ID")
+    parser.add_argument('--ascii-filenames', action='store_true', default=None,
+                        help="лише ASCII в іменах файлів")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Сервер без GUI; зупиняється через Ctrl+C або SIGTERM"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    if args.jobs < 1 or (args.postprocess_jobs is not None and args.postprocess_jobs < 1):
+        print("--jobs і --postprocess-jobs мають бути більше 0", file=sys.stderr)
+        return 2
+    presets.get_registry(args.presets)
+
+    bus = EventBus()
+    default_engine = {
+        'output_template': args.output_template,
+        'sharding': args.shard,
+        'ascii_filenames': args.ascii_filenames
+    }
+    backend = HeadlessBackend(bus, args.jobs, args.postprocess_jobs, os.path.abspath(args.out), default_engine,
+                              [os.path.abspath(os.path.expanduser(path)) for path in args.allow_dir])
+    try:
+        server = JobServer(backend, bus, args.port, args.token).start()
+    except OSError as e:
+        print(f"Не вдалося запустити сервер: {e}", file=sys.stderr)
+        return 2
+    print(json.dumps({'event': 'listening', 'url': server.url}, ensure_ascii=False), flush=True)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *args: stop.set())
+    try:
+        while not stop.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+    backend.shutdown()
+    return 0
@@ -0,0 +1,63 @@
+"""Журнал незавершених завдань для відновлення після перезапуску чи збою"""
+import json
+import os
+import time
+
+# Поля завдання, які потрібні, щоб поставити його в чергу знову
+JOB_FIELDS = ('url', 'title', 'save_path', 'format', 'engine')
+
+
+class JobJournal:
+    """JSON-файл із завданнями в черзі та в процесі завантаження
+
+    Крім параметрів завдання зберігаються завантажені байти і .part-файли,
+    з яких yt_dlp (continuedl) продовжить завантаження. Запис атомарний
+    (tmp-файл + os.replace), тому збій під час запису не псує журнал.
+    """
+
+    def __init__(self, path, interval=2.0):
+        self.path = path
+        self.interval = interval
+        self.last_write = 0.0
+
+    def read(self):
+        """Записи з журналу (порожній список, якщо журналу немає чи він пошкоджений)"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                records = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return [record for record in records if isinstance(record, dict) and record.get('url')]
+
+    def write(self, records):
+        tmp_file = self.path + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.path)
+        self.last_write = time.monotonic()
+
+    def due(self):
+        """Чи настав час для чергового запису прогресу"""
+        return time.monotonic() - self.last_write >= self.interval
+
+
+def job_record(job):
+    """Запис журналу для завдання"""
+    record = {key: job.get(key) for key in JOB_FIELDS}
+    record['status'] = job.get('status')
+    record['downloaded_bytes'] = job.get('downloaded_bytes', 0)
+    record['part_files'] = job.get('part_files', [])
+    return record
+
+
+def resumable_bytes(record):
+    """Скільки байтів вже лежить у .part-файлах завдання (за диском, а не за журналом)"""
+    total = 0
+    for path in record.get('part_files') or []:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
@@ -0,0 +1,54 @@
+"""Відкладений імпорт важких модулів
+
+yt_dlp при імпорті завантажує сотні модулів екстракторів, тому він і requests
+імпортуються лише при першому превью чи завантаженні (або заздалегідь у
+фоновому потоці після показу вікна). Імпорти написані явно всередині функцій,
+щоб PyInstaller їх бачив.
+"""
+import threading
+import time
+
+import_times = {}
+
+
+def _timed(name, loader):
+    started = time.perf_counter()
+    module = loader()
+    # Перший виклик - справжній імпорт, наступні беруть модуль з sys.modules
+    import_times.setdefault(name, round((time.perf_counter() - started) * 1000, 1))
+    return module
+
+
+def yt_dlp():
+    def load():
+        import yt_dlp
+        return yt_dlp
+    return _timed('yt_dlp', load)
+
+
+def requests():
+    def load():
+        import requests
+        return requests
+    return _timed('requests', load)
+
+
+def packaging_version():
+    def load():
+        from packaging import version
+        return version
+    return _timed('packaging', load)
+
+
+def warm_up():
+    """Імпорт важких модулів у фоновому потоці, поки користувач вводить URL"""
+    def run():
+        try:
+            requests()
+            yt_dlp()
+        except Exception as e:
+            print(f"Помилка попереднього імпорту модулів: {e}")
+
+    thread = threading.Thread(target=run, name="warm-up-imports", daemon=True)
+    thread.start()
+    return thread
@@ -1,15 +1,52 @@
+import startup
 import os
 import sys
-import yt_dlp
-from PyQt6.QtWidgets import QApplication, QWidget, QLabel, QPushButton, QComboBox, QFileDialog, QLineEdit, QVBoxLayout, QHBoxLayout, QGridLayout, QTextEdit, QProgressBar, QMessageBox
-from PyQt6.QtGui import QPixmap, QIcon, QImage
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
+
+if __name__ == "__main__" and "--batch" in sys.argv[1:]:
+    # Пакетний режим працює без Qt і без перевірки оновлень
+    import cli
+    sys.exit(cli.main(sys.argv[1:]))
+
+if __name__ == "__main__" and "--serve" in sys.argv[1:]:
+    # Локальний API завдань без GUI (див. job_server.py)
+    import job_server
+    sys.exit(job_server.main(sys.argv[1:]))
+
+if __name__ == "__main__" and "--startup-report" in sys.argv[1:]:
+    startup.enable_import_timing()
+
+from PyQt6.QtWidgets import QApplication, QWidget, QLabel, QPushButton, QComboBox, QFileDialog, QLineEdit, QVBoxLayout, QHBoxLayout, QGridLayout, QPlainTextEdit, QTabWidget, QTableView, QProgressBar, QMessageBox, QProgressDialog, QSpinBox, QCheckBox, QTableWidget, QTableWidgetItem, QHeaderView, QAbstractItemView
+from PyQt6.QtGui import QPixmap, QIcon, QImage, QImageReader
+from PyQt6.QtCore import Qt, QThread, QObject, pyqtSignal, QTimer, QByteArray, QBuffer, QIODevice, QAbstractTableModel, QModelIndex, QFileSystemWatcher
 from time import sleep
 import configparser
-import requests
-from packaging import version
 import json
+import uuid
+import threading
+import time
+from collections import deque, OrderedDict
+from concurrent.futures import Future
 from datetime import datetime
+import download_engine
+import dedup
+import downloader
+import history
+import http_client
+import job_server
+import journal
+import lazy_imports
+import metadata_cache
+import output_paths
+import postprocessing
+import progress
+import presets
+import sections
+import telemetry
+import thumbnail_cache
+import updater
+import ydl_pool
+
+startup.mark('imports_done')
 
 def resource_path(relative_path):
     """ Отримати абсолютний шлях до ресурсу """
@@ -25,212 +62,944 @@ def resource_path(relative_path):
         print(f"Файл не знайдено: {path}")
     return path
 
+def load_config(path='config.ini'):
+    """Читання config.ini у словник налаштувань"""
+    config = configparser.ConfigParser()
+    settings = {
+        'github_token': "",
+        'github_repo': "",
+        'github_api_url': updater.DEFAULT_API_URL,
+        'max_workers': None,
+        'rate_limit': None,
+        'postprocess_workers': None,
+        'auto_resume': False,
+        'output_template': "",
+        'sharding': output_paths.DEFAULT_SHARDING,
+        'ascii_filenames': False,
+        'server_enabled': False,
+        'server_port': job_server.DEFAULT_PORT,
+        'server_token': "",
+        'server_allowed_dirs': []
+    }
+    try:
+        config.read(path)
+        settings['github_token'] = config['GitHub']['token']
+        settings['github_repo'] = config['GitHub']['repo']
+        settings['github_api_url'] = config['GitHub'].get('api_url', updater.DEFAULT_API_URL)
+    except Exception as e:
+        print(f"Помилка завантаження конфігурації: {e}")
+
+    # Кількість одночасних завантажень
+    settings['max_workers'] = config.getint('Downloads', 'max_workers', fallback=None)
+    # Спільний ліміт швидкості, МБ/с (0 - без обмеження)
+    settings['rate_limit'] = config.getfloat('Downloads', 'rate_limit', fallback=None)
+    # Потоки постобробки (злиття, конвертація); за замовчуванням - кількість ядер
+    settings['postprocess_workers'] = config.getint('Downloads', 'postprocess_workers', fallback=None)
+    # Відновлювати незавершені завдання без запитання
+    settings['auto_resume'] = config.getboolean('Downloads', 'auto_resume', fallback=False)
+    # Шлях файлу в папці збереження: шаблон yt_dlp і підпапки (none, uploader, date, id)
+    settings['output_template'] = config.get('Downloads', 'output_template', fallback="", raw=True)
+    settings['sharding'] = config.get('Downloads', 'sharding', fallback=output_paths.DEFAULT_SHARDING)
+    # Лише ASCII в іменах файлів (для старих файлових систем і мережевих дисків)
+    settings['ascii_filenames'] = config.getboolean('Downloads', 'ascii_filenames', fallback=False)
+    # Локальний API завдань (job_server.py) на 127.0.0.1
+    settings['server_enabled'] = config.getboolean('Server', 'enabled', fallback=False)
+    settings['server_port'] = config.getint('Server', 'port', fallback=job_server.DEFAULT_PORT)
+    settings['server_token'] = config.get('Server', 'token', fallback="")
+    # Папки, крім поточної папки збереження, куди API може зберігати файли (через ';')
+    settings['server_allowed_dirs'] = [
+        os.path.abspath(os.path.expanduser(path.strip()))
+        for path in config.get('Server', 'allowed_dirs', fallback="").split(';') if path.strip()
+    ]
+    return settings
+
 class DownloadThread(QThread):
-    progress_update = pyqtSignal(int)
-    download_finished = pyqtSignal(str)
+    """Мережевий етап завдання; постобробка виконується в postprocessing.PostprocessPool
 
-    def __init__(self, url, save_path, selected_format):
+    Після завантаження байтів надсилається network_finished і потік
+    завершується, звільняючи місце в черзі; download_finished надходить
+    після постобробки (з потоку пулу, доставляється через чергу подій Qt).
+    """
+    download_finished = pyqtSignal(str, str)
+    network_finished = pyqtSignal(str)
+
+    def __init__(self, url, save_path, selected_format, job_id="", engine=None, progress_tracker=None):
         super().__init__()
+        self.job_id = job_id
         self.url = url
         self.save_path = save_path
         self.selected_format = selected_format
-        self.last_progress = 0
-        self.progress_history = []
+        self.engine = engine
+        # Прогрес збирається без сигналів Qt, черга забирає його з фіксованою частотою
+        self.progress_tracker = progress_tracker or progress.ProgressAggregator()
+        self.telemetry = None
         self.is_cancelled = False
 
     def cancel(self):
         self.is_cancelled = True
 
     def run(self):
+        started_at = time.time()
+        self.telemetry = telemetry.JobTelemetry()
         try:
-            self.is_cancelled = False
-            self.last_progress = 0
-            self.progress_history = []
-            self.progress_update.emit(0) 
+            self.progress_tracker.start(self.job_id)
             
-            ydl_opts = {
-                'outtmpl': os.path.join(self.save_path, '%(title)s.%(ext)s'),
-                'progress_hooks': [self.progress_hook],
-                'quiet': True,
-            }
-
-            if self.selected_format == "MP4 (1080p)":
-                ydl_opts.update({
-                    'format': 'bestvideo[height<=1080][vcodec!*=av1][vcodec!*=vp9][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][vcodec!*=av1][vcodec!*=vp9][ext=mp4]/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegVideoConvertor',
-                        'preferedformat': 'mp4'
-                    }],
-                    'merge_output_format': 'mp4',
-                    'audio_quality': 0,
-                    'prefer_ffmpeg': True,
-                    'format_sort': ['res:1080', 'vcodec:h264', 'acodec:m4a']
-                })
-            elif self.selected_format == "MP4 (4k)":
-                ydl_opts.update({
-                    'format': 'bestvideo[height<=2160][vcodec!*=av1][vcodec!*=vp9][ext=mp4]+bestaudio[ext=m4a]/best[height<=2160][vcodec!*=av1][vcodec!*=vp9][ext=mp4]/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegVideoConvertor',
-                        'preferedformat': 'mp4'
-                    }],
-                    'merge_output_format': 'mp4',
-                    'audio_quality': 0,
-                    'prefer_ffmpeg': True,
-                    'format_sort': ['res:2160', 'vcodec:h264', 'acodec:m4a']
-                })
-            elif self.selected_format == "MP3":
-                ydl_opts.update({
-                    'format': 'bestaudio/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'mp3',
-                        'preferredquality': '320'
-                    }],
-                    'audio_quality': 0,
-                    'prefer_ffmpeg': True
-                })
-            elif self.selected_format == "M4A":
-                ydl_opts.update({
-                    'format': 'bestaudio/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': 'm4a',
-                        'preferredquality': '0'
-                    }],
-                    'audio_quality': 0,
-                    'prefer_ffmpeg': True
-                })
-            else:
-                ydl_opts.update({
-                    'format': 'bestvideo[vcodec!*=av1][vcodec!*=vp9][ext=mp4]+bestaudio[ext=m4a]/best[vcodec!*=av1][vcodec!*=vp9][ext=mp4]/best',
-                    'postprocessors': [{
-                        'key': 'FFmpegVideoConvertor',
-                        'preferedformat': 'mp4'
-                    }],
-                    'merge_output_format': 'mp4',
-                    'audio_quality': 0,
-                    'prefer_ffmpeg': True,
-                    'format_sort': ['vcodec:h264', 'acodec:m4a']
-                })
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([self.url])
-            
-            if self.last_progress < 100:
-                self.progress_update.emit(100)
-            
-            self.download_finished.emit(f"Завантажено: {self.url} у форматі {self.selected_format}")
+            staged = downloader.download(
+                self.url,
+                self.save_path,
+                self.selected_format,
+                progress_hooks=[self.progress_hook],
+                engine=self.engine,
+                telemetry=self.telemetry,
+                defer_postprocess=True
+            )
+
+            self.progress_tracker.stage(self.job_id, 'postprocess_wait')
+            self.network_finished.emit(self.job_id)
+            postprocessing.get_pool().submit(self.finish_job, staged, started_at)
+        except Exception as e:
+            self.fail(e, started_at)
+
+    def finish_job(self, staged, started_at):
+        """Постобробка завантаженого завдання (у потоці пулу постобробки)"""
+        try:
+            if self.is_cancelled:
+                staged.discard()
+                raise Exception("Завантаження скасовано")
+            self.progress_tracker.stage(self.job_id, 'postprocess')
+            info = staged.postprocess()
+
+            self.progress_tracker.finish(self.job_id)
+
+            message = f"Завантажено: {self.url} у форматі {self.selected_format}"
+            summary = postprocessing.postprocess_summary(info)
+            if summary:
+                message += f" ({summary})"
+            self.save_history('done', message, info, started_at)
+            self.download_finished.emit(self.job_id, message)
         except Exception as e:
-            error_message = str(e)
-            self.progress_update.emit(0)
-            self.download_finished.emit(f"Помилка: {error_message}")
+            self.fail(e, started_at)
+
+    def fail(self, error, started_at):
+        error_message = str(error)
+        self.progress_tracker.finish(self.job_id, success=False)
+        self.save_history('cancelled' if self.is_cancelled else 'error', error_message, None, started_at)
+        self.download_finished.emit(self.job_id, f"Помилка: {error_message}")
+
+    def save_history(self, status, message, info, started_at):
+        """Запис результату в історію завантажень"""
+        try:
+            history.get_store().add(history.build_record(
+                self.url, downloader.canonical_video_id(self.url),
+                downloader.job_preset(self.selected_format, self.engine),
+                status, message, info, started_at, telemetry=self.telemetry.summary()
+            ))
+        except Exception as e:
+            print(f"Помилка запису в історію: {str(e)}")
 
     def progress_hook(self, d):
         if self.is_cancelled:
             raise Exception("Завантаження скасовано")
-        if d['status'] == 'downloading':
-            try:
-                total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-                downloaded_bytes = d.get('downloaded_bytes', 0)
-                
-                if not isinstance(total_bytes, (int, float)) or not isinstance(downloaded_bytes, (int, float)):
-                    return
-                
-                if total_bytes <= 0:
-                    return
-                
-                if downloaded_bytes > total_bytes:
-                    downloaded_bytes = total_bytes
-                
-                progress = int((downloaded_bytes / total_bytes) * 100)
-                
-                progress = max(0, min(99, progress))
-                
-                if len(self.progress_history) < 3:
-                    if progress > self.last_progress:
-                        self.last_progress = progress
-                        self.progress_update.emit(progress)
-                else:
-                    self.progress_history.append(progress)
-                    if len(self.progress_history) > 10:
-                        self.progress_history.pop(0)
-                    
-                    sorted_progress = sorted(self.progress_history)
-                    filtered_progress = sorted_progress[1:-1] if len(sorted_progress) > 4 else sorted_progress
-                    avg_progress = sum(filtered_progress) / len(filtered_progress)
-                    
-                    if avg_progress > self.last_progress and avg_progress < 99:
-                        self.last_progress = avg_progress
-                        self.progress_update.emit(int(avg_progress))
-                    
-            except Exception as e:
-                print(f"Помилка оновлення прогресу: {str(e)}")
-            
-        elif d['status'] == 'finished':
-            if self.last_progress < 100:
-                self.progress_update.emit(100)
+        self.progress_tracker.update(self.job_id, d)
+
+PREVIEW_WIDTH = 400
+PREVIEW_HEIGHT = 220
+# Якість JPEG для вже зменшених превью в дисковому кеші
+PREVIEW_JPEG_QUALITY = 90
+MAX_THUMBNAIL_ATTEMPTS = 3
+_image_formats = None
+
+
+def supported_image_formats():
+    """Розширення файлів зображень, які вміє декодувати Qt (з урахуванням плагінів)"""
+    global _image_formats
+    if _image_formats is None:
+        _image_formats = {bytes(fmt).decode().lower() for fmt in QImageReader.supportedImageFormats()}
+    return _image_formats
+
+
+def scale_preview(image):
+    """Зменшення QImage до розміру превью (менші зображення не збільшуються)"""
+    if image.width() <= PREVIEW_WIDTH and image.height() <= PREVIEW_HEIGHT:
+        return image
+    return image.scaled(
+        PREVIEW_WIDTH, PREVIEW_HEIGHT,
+        Qt.AspectRatioMode.KeepAspectRatio,
+        Qt.TransformationMode.SmoothTransformation
+    )
+
+
+def encode_preview(image):
+    """JPEG-байти зменшеного превью для дискового кешу"""
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.OpenModeFlag.WriteOnly)
+    image.save(buffer, 'JPG', PREVIEW_JPEG_QUALITY)
+    buffer.close()
+    return bytes(data)
+
 
 class PreviewThread(QThread):
-    preview_ready = pyqtSignal(QPixmap, str)
+    """Отримання превью: декодування і масштабування виконуються тут, у робочому потоці
+
+    Потік працює лише з QImage (QPixmap можна створювати тільки в GUI-потоці),
+    а GUI отримує вже зменшене до PREVIEW_WIDTH x PREVIEW_HEIGHT зображення.
+    """
+    preview_ready = pyqtSignal(QImage, str, str)
     error = pyqtSignal(str)
 
     def __init__(self, url):
         super().__init__()
         self.url = url
-        self.cache_dir = os.path.join(os.path.expanduser('~'), '.ytdownloader_cache')
-        if not os.path.exists(self.cache_dir):
-            os.makedirs(self.cache_dir)
+        self.is_cancelled = False
+
+    def cancel(self):
+        self.is_cancelled = True
 
     def run(self):
         try:
-            # Перевірка кешу
-            cache_file = os.path.join(self.cache_dir, f"{hash(self.url)}.jpg")
-            if os.path.exists(cache_file):
-                pixmap = QPixmap(cache_file)
-                if not pixmap.isNull():
-                    self.preview_ready.emit(pixmap, "")
+            key = downloader.canonical_video_id(self.url)
+
+            # Перевірка кешу превью (ключ - ID відео, тож різні варіанти URL дають влучання)
+            data = thumbnail_cache.get_cache().get(key)
+            if data:
+                image = QImage()
+                if image.loadFromData(data):
+                    info = metadata_cache.get_cache().peek(key) or {}
+                    # Записи старих версій зберігали зображення в повному розмірі
+                    self.preview_ready.emit(scale_preview(image), info.get('title', ''), key)
                     return
 
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(self.url, download=False)
+            # Метадані зберігаються в кеш і повторно використовуються при завантаженні
+            info = downloader.extract_info(self.url)
+            
+            if not info:
+                self.error.emit("Не вдалося отримати інформацію про відео")
+                return
                 
-                if not info:
-                    self.error.emit("Не вдалося отримати інформацію про відео")
-                    return
-                    
-                thumbnail_url = info.get('thumbnail')
-                if not thumbnail_url:
-                    self.error.emit("Не знайдено превью для відео")
+            # Результат вже нікому не потрібен - метадані збережено, превью не завантажуємо
+            if self.is_cancelled:
+                return
+
+            thumbnail_urls = downloader.thumbnail_urls(
+                info, PREVIEW_WIDTH, PREVIEW_HEIGHT, supported_image_formats()
+            )
+            if not thumbnail_urls:
+                self.error.emit("Не знайдено превью для відео")
+                return
+
+            # Найменший придатний варіант може бути відсутнім на сервері - пробуємо наступний
+            image = None
+            error = "Помилка завантаження превью"
+            for thumbnail_url in thumbnail_urls[:MAX_THUMBNAIL_ATTEMPTS]:
+                if self.is_cancelled:
                     return
-                    
-                response = requests.get(thumbnail_url)
+                response = http_client.get(thumbnail_url)
                 if response.status_code != 200:
-                    self.error.emit("Помилка завантаження превью")
-                    return
-                    
+                    continue
                 image = QImage()
-                image.loadFromData(response.content)
-                
-                if image.isNull():
-                    self.error.emit("Помилка обробки зображення")
-                    return
-                    
-                pixmap = QPixmap.fromImage(image)
-                title = info.get('title', 'Без назви')
-                
-                # Зберігаємо в кеш
-                pixmap.save(cache_file, "JPEG")
-                self.preview_ready.emit(pixmap, title)
+                if image.loadFromData(response.content):
+                    break
+                image = None
+                error = "Помилка обробки зображення"
+
+            if image is None:
+                self.error.emit(error)
+                return
+
+            image = scale_preview(image)
+            title = info.get('title', 'Без назви')
+
+            # У кеш іде вже зменшене зображення, тож наступний показ не масштабує нічого
+            thumbnail_cache.get_cache().put(key, encode_preview(image))
+            self.preview_ready.emit(image, title, key)
         except Exception as e:
             self.error.emit(str(e))
 
+class PreviewManager(QObject):
+    """Керування запитами превью
+
+    Кожен запит отримує номер покоління; результати старших поколінь
+    не показуються. Однакові URL об'єднуються в одне отримання, а кількість
+    одночасних отримань обмежена (в очікуванні лишається тільки останній запит).
+    """
+    preview_loaded = pyqtSignal(str, QPixmap, str, str)
+    preview_ready = pyqtSignal(QPixmap, str)
+    error = pyqtSignal(str)
+
+    def __init__(self, max_concurrent=2, parent=None):
+        super().__init__(parent)
+        self.max_concurrent = max_concurrent
+        self.generation = 0
+        self.in_flight = {}
+        self.delivered = set()
+        self.waiting = None
+
+    def request(self, url):
+        """Запит превью для URL (попередні запити стають застарілими)"""
+        self.generation += 1
+
+        for other_url, (thread, _) in self.in_flight.items():
+            if other_url != url:
+                thread.cancel()
+
+        if url in self.in_flight:
+            # Той самий URL вже отримується - просто чекаємо на його результат
+            thread = self.in_flight[url][0]
+            thread.is_cancelled = False
+            self.in_flight[url] = (thread, self.generation)
+            self.waiting = None
+        elif len(self.in_flight) >= self.max_concurrent:
+            self.waiting = (url, self.generation)
+        else:
+            self.waiting = None
+            self.start(url, self.generation)
+
+    def invalidate(self):
+        """Позначення всіх запитів застарілими"""
+        self.generation += 1
+        self.waiting = None
+        for thread, _ in self.in_flight.values():
+            thread.cancel()
+
+    def start(self, url, generation):
+        thread = PreviewThread(url)
+        thread.preview_ready.connect(
+            lambda image, title, key, url=url: self.on_ready(url, image, title, key)
+        )
+        thread.error.connect(lambda message, url=url: self.on_error(url, message))
+        thread.finished.connect(lambda url=url: self.on_finished(url))
+        self.in_flight[url] = (thread, generation)
+        thread.start()
+
+    def is_current(self, url):
+        return url in self.in_flight and self.in_flight[url][1] == self.generation
+
+    def on_ready(self, url, image, title, key):
+        self.delivered.add(url)
+        # Зображення вже зменшене в потоці, тут лише перетворення в QPixmap
+        pixmap = QPixmap.fromImage(image)
+        # Застарілий результат все одно кешується, але не показується
+        self.preview_loaded.emit(url, pixmap, title, key)
+        if self.is_current(url):
+            self.preview_ready.emit(pixmap, title)
+
+    def on_error(self, url, message):
+        self.delivered.add(url)
+        if self.is_current(url):
+            self.error.emit(message)
+
+    def on_finished(self, url):
+        thread, generation = self.in_flight.pop(url, (None, None))
+        if thread:
+            thread.deleteLater()
+        if url not in self.delivered and generation == self.generation:
+            # Потік встиг зупинитися як скасований, але URL знову актуальний
+            self.start(url, generation)
+            return
+        self.delivered.discard(url)
+        if self.waiting and len(self.in_flight) < self.max_concurrent:
+            waiting_url, generation = self.waiting
+            self.waiting = None
+            if generation == self.generation:
+                self.start(waiting_url, generation)
+
+    def shutdown(self):
+        for thread, _ in self.in_flight.values():
+            thread.cancel()
+            thread.wait(3000)
+
+class PixmapCache:
+    """LRU-кеш готових QPixmap в пам'яті (використовується тільки в GUI-потоці)"""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.items = OrderedDict()
+
+    def get(self, key):
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, pixmap, title):
+        self.items[key] = (pixmap, title)
+        self.items.move_to_end(key)
+        while len(self.items) > self.capacity:
+            self.items.popitem(last=False)
+
+class ExpandThread(QThread):
+    """Розгортання плейлиста або каналу в окремі відео"""
+    expanded = pyqtSignal(str, list, int)
+    error = pyqtSignal(str, str)
+
+    def __init__(self, url, archive_file):
+        super().__init__()
+        self.url = url
+        self.archive_file = archive_file
+
+    def run(self):
+        try:
+            entries, skipped = downloader.expand_url(self.url, downloader.read_archive(self.archive_file))
+            self.expanded.emit(self.url, entries, skipped)
+        except Exception as e:
+            self.error.emit(self.url, str(e))
+
+class UpdateChecker(QObject):
+    """Читання конфігурації та перевірка оновлень у фоновому потоці
+
+    Використовується daemon-потік, щоб повільна мережа не затримувала закриття програми.
+    """
+    config_loaded = pyqtSignal(dict)
+    update_available = pyqtSignal(dict)
+
+    def __init__(self, current_version, cache_file, parent=None):
+        super().__init__(parent)
+        self.current_version = current_version
+        self.cache_file = cache_file
+
+    def start(self):
+        threading.Thread(target=self.run, name="update-check", daemon=True).start()
+
+    def run(self):
+        try:
+            settings = load_config()
+            self.config_loaded.emit(settings)
+
+            release = updater.check_for_update(
+                self.current_version,
+                settings['github_repo'],
+                token=settings['github_token'],
+                api_url=settings['github_api_url'],
+                cache_file=self.cache_file
+            )
+            if release:
+                self.update_available.emit(release)
+        except Exception as e:
+            print(f"Помилка перевірки оновлень: {e}")
+
+class UpdateDownloadThread(QThread):
+    """Фонове завантаження файлу оновлення з докачуванням і перевіркою хешу"""
+    progress = pyqtSignal(int, int, float)
+    finished_ok = pyqtSignal(str, bool)
+    failed = pyqtSignal(str, bool)
+
+    # Не частіше ніж раз на 100 мс, щоб не перевантажувати цикл подій
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, release_info, asset, dest_file):
+        super().__init__()
+        self.release_info = release_info
+        self.asset = asset
+        self.dest_file = dest_file
+        self.is_cancelled = False
+        self.last_emit = 0.0
+
+    def cancel(self):
+        self.is_cancelled = True
+
+    def on_progress(self, downloaded, total, speed):
+        now = time.monotonic()
+        if now - self.last_emit >= self.PROGRESS_INTERVAL or downloaded >= total:
+            self.last_emit = now
+            self.progress.emit(downloaded, total, speed)
+
+    def run(self):
+        try:
+            expected_sha256 = updater.find_expected_sha256(self.release_info, self.asset)
+            path = updater.download_update(
+                self.asset['browser_download_url'],
+                self.dest_file,
+                expected_sha256=expected_sha256,
+                progress_callback=self.on_progress,
+                is_cancelled=lambda: self.is_cancelled,
+                expected_size=self.asset.get('size') or None,
+                part_key=f"{self.release_info['tag_name']}-{self.asset['name']}"
+            )
+            self.finished_ok.emit(path, expected_sha256 is not None)
+        except updater.UpdateCancelled as e:
+            self.failed.emit(str(e), True)
+        except Exception as e:
+            self.failed.emit(str(e), False)
+
+
+# Завдання, які ще не завершилися (у журналі і для приєднання повторних запитів)
+ACTIVE_STATUSES = ('pending', 'downloading', 'processing')
+
+
+class DownloadQueue(QObject):
+    """Черга завантажень з обмеженою кількістю одночасних потоків"""
+    job_added = pyqtSignal(dict)
+    job_progress = pyqtSignal(str, dict)
+    job_finished = pyqtSignal(str, str, str)
+    job_attached = pyqtSignal(str, str)
+
+    # Частота оновлення прогресу в інтерфейсі (10 Гц) незалежно від кількості завдань
+    PROGRESS_INTERVAL_MS = 100
+
+    def __init__(self, queue_file, max_workers=3, parent=None):
+        super().__init__(parent)
+        self.queue_file = queue_file
+        self.journal = journal.JobJournal(queue_file)
+        # Завдання з журналу, про відновлення яких ще не вирішено
+        self.restored = []
+        self.max_workers = max_workers
+        self.jobs = {}
+        self.pending = deque()
+        self.threads = {}
+        # Завдання, байти яких уже завантажено, в черзі пулу постобробки
+        self.postprocessing = {}
+        self.shutting_down = False
+        self.progress = progress.ProgressAggregator()
+        self.progress_timer = QTimer(self)
+        self.progress_timer.setInterval(self.PROGRESS_INTERVAL_MS)
+        self.progress_timer.timeout.connect(self.publish_progress)
+        # Зміни в папках збереження позначають їхні індекси для повторного перегляду
+        self.folder_watcher = QFileSystemWatcher(self)
+        self.folder_watcher.directoryChanged.connect(lambda path: dedup.get_index(path).mark_dirty())
+
+    def add(self, url, save_path, selected_format, title=None, engine=None):
+        """Додавання завдання в чергу
+
+        Ще до отримання метаданих відео, яке вже є в папці, архіві чи історії,
+        пропускається, а повторний запит на відео з черги приєднується до
+        наявного завдання (повертається його id).
+        """
+        video_id = self.video_id(url)
+        preset = self.job_preset(selected_format, engine)
+        active = self.find_active(video_id, save_path, preset)
+        if active:
+            self.job_attached.emit(active['id'], url)
+            return active['id']
+
+        existing = self.find_existing(url, save_path, selected_format, engine)
+        job = {
+            'id': uuid.uuid4().hex,
+            'url': url,
+            'video_id': video_id,
+            'title': title,
+            'save_path': save_path,
+            'format': selected_format,
+            'preset': preset,
+            'engine': engine,
+            'status': 'skipped' if existing else 'pending'
+        }
+        self.jobs[job['id']] = job
+        self.job_added.emit(job)
+        if existing:
+            self.job_finished.emit(job['id'], 'skipped', f"Вже завантажено: {url} ({existing['path']})")
+            return job['id']
+        if os.path.isdir(save_path) and save_path not in self.folder_watcher.directories():
+            self.folder_watcher.addPath(save_path)
+        self.pending.append(job['id'])
+        self.save()
+        self.fill_slots()
+        return job['id']
+
+    def video_id(self, url):
+        try:
+            return downloader.canonical_video_id(url)
+        except Exception as e:
+            print(f"Помилка визначення ID відео: {str(e)}")
+            return f"url {url}"
+
+    def job_preset(self, selected_format, engine=None):
+        try:
+            return downloader.job_preset(selected_format, engine)
+        except Exception as e:
+            print(f"Помилка визначення пресету завдання: {str(e)}")
+            return selected_format
+
+    def find_active(self, video_id, save_path, preset):
+        """Завдання в черзі чи в процесі завантаження для того ж відео, папки і пресету (з фрагментами)"""
+        for job in self.jobs.values():
+            if (job['status'] in ACTIVE_STATUSES and job.get('video_id') == video_id
+                    and job['save_path'] == save_path and job.get('preset', job['format']) == preset):
+                return job
+        return None
+
+    def find_existing(self, url, save_path, selected_format, engine=None):
+        try:
+            return downloader.find_existing(url, save_path, selected_format, engine)
+        except Exception as e:
+            print(f"Помилка перевірки вже завантажених відео: {str(e)}")
+            return None
+
+    def set_max_workers(self, max_workers):
+        """Зміна кількості одночасних завантажень"""
+        self.max_workers = max(1, int(max_workers))
+        self.fill_slots()
+
+    def fill_slots(self):
+        """Запуск завдань з черги, поки є вільні потоки"""
+        while self.pending and len(self.threads) < self.max_workers:
+            job = self.jobs[self.pending.popleft()]
+            job['status'] = 'downloading'
+
+            thread = DownloadThread(
+                url=job['url'],
+                save_path=job['save_path'],
+                selected_format=job['format'],
+                job_id=job['id'],
+                engine=job['engine'],
+                progress_tracker=self.progress
+            )
+            thread.download_finished.connect(self.on_finished)
+            thread.network_finished.connect(self.on_network_finished)
+            self.threads[job['id']] = thread
+            thread.start()
+        if self.threads and not self.progress_timer.isActive():
+            self.progress_timer.start()
+        self.save()
+
+    def cancel(self, job_id):
+        """Скасування завдання: з черги або через DownloadThread.cancel()"""
+        job = self.jobs.get(job_id)
+        if not job:
+            return
+        if job_id in self.pending:
+            self.pending.remove(job_id)
+            job['status'] = 'cancelled'
+            self.save()
+            self.job_finished.emit(job_id, 'cancelled', f"Скасовано: {job['url']}")
+        elif job_id in self.threads:
+            self.threads[job_id].cancel()
+        elif job_id in self.postprocessing:
+            # Постобробка, яка вже почалася, доводиться до кінця
+            self.postprocessing[job_id].cancel()
+
+    def cancel_all(self):
+        """Скасування всіх завдань"""
+        for job_id in list(self.pending) + list(self.threads) + list(self.postprocessing):
+            self.cancel(job_id)
+
+    def publish_progress(self):
+        """Передача в інтерфейс прогресу завдань, які змінилися з минулого разу"""
+        for job_id, stats in self.progress.snapshot().items():
+            job = self.jobs.get(job_id)
+            if job and stats['part_files']:
+                job['downloaded_bytes'] = stats['downloaded_bytes']
+                job['part_files'] = stats['part_files']
+            self.job_progress.emit(job_id, stats)
+        # Зміщення записуються в журнал не частіше ніж раз на journal.interval
+        if self.threads and self.journal.due():
+            self.save()
+
+    def on_network_finished(self, job_id):
+        """Байти завантажено: завдання переходить в етап постобробки, потік звільняється"""
+        thread = self.threads.pop(job_id, None)
+        if thread is None:
+            return
+        self.postprocessing[job_id] = thread
+        job = self.jobs.get(job_id)
+        if job:
+            job['status'] = 'processing'
+        self.fill_slots()
+
+    def on_finished(self, job_id, message):
+        self.publish_progress()
+        self.progress.remove(job_id)
+        thread = self.threads.pop(job_id, None) or self.postprocessing.pop(job_id, None)
+        job = self.jobs.get(job_id)
+        if job:
+            if thread and thread.is_cancelled:
+                job['status'] = 'cancelled'
+            elif message.startswith("Помилка"):
+                job['status'] = 'error'
+            else:
+                job['status'] = 'done'
+            self.job_finished.emit(job_id, job['status'], message)
+        if thread:
+            thread.wait()
+            thread.deleteLater()
+        self.fill_slots()
+        if not self.threads and not self.postprocessing:
+            self.progress_timer.stop()
+
+    def active_count(self):
+        return len(self.threads) + len(self.postprocessing) + len(self.pending)
+
+    def stage_depths(self):
+        """Глибина черги кожного етапу: очікування, завантаження, постобробка"""
+        depth = postprocessing.get_pool().depth()
+        return {
+            'pending': len(self.pending),
+            'network': len(self.threads),
+            'network_workers': self.max_workers,
+            'postprocess_queued': depth['queued'],
+            'postprocess_running': depth['running'],
+            'postprocess_workers': depth['workers']
+        }
+
+    def shutdown(self):
+        """Зупинка потоків при закритті програми без видалення завдань з черги"""
+        # Останні зміщення потрапляють у журнал до зупинки потоків
+        self.progress_timer.stop()
+        self.publish_progress()
+        self.save()
+        self.shutting_down = True
+        for thread in list(self.threads.values()) + list(self.postprocessing.values()):
+            thread.cancel()
+        for thread in self.threads.values():
+            thread.wait(3000)
+
+    def save(self):
+        """Запис незавершених завдань і їхніх зміщень у журнал"""
+        if self.shutting_down:
+            return
+        try:
+            records = [
+                journal.job_record(job)
+                for job in self.jobs.values()
+                if job['status'] in ACTIVE_STATUSES
+            ]
+            self.journal.write(records + self.restored)
+        except Exception as e:
+            print(f"Помилка збереження черги: {str(e)}")
+
+    def load(self):
+        """Читання журналу після перезапуску; завдання ставляться в чергу через resume_restored()"""
+        self.restored = self.journal.read()
+        return len(self.restored)
+
+    def resume_restored(self):
+        """Повернення завдань з журналу в чергу (yt_dlp продовжить з .part-файлів)"""
+        records, self.restored = self.restored, []
+        for record in records:
+            job_id = self.add(record['url'], record['save_path'], record['format'],
+                              record.get('title'), record.get('engine'))
+            job = self.jobs.get(job_id)
+            if job and job['status'] in ACTIVE_STATUSES and not job.get('part_files'):
+                job['part_files'] = record.get('part_files') or []
+                job['downloaded_bytes'] = record.get('downloaded_bytes', 0)
+        self.save()
+        return len(records)
+
+    def discard_restored(self):
+        """Відмова від відновлення: завдання видаляються з журналу (.part-файли залишаються)"""
+        self.restored = []
+        self.save()
+
+class ApiBridge(QObject):
+    """Бекенд job_server для GUI: завдання з API потрапляють у DownloadQueue
+
+    Методи submit і cancel викликаються з потоків HTTP-сервера і передають
+    роботу в потік GUI сигналами; стан завдань для API зберігається в
+    job_server.JobTable і оновлюється сигналами черги.
+    """
+    submit_requested = pyqtSignal(list, object)
+    cancel_requested = pyqtSignal(str)
+
+    # Скільки чекати, поки GUI прийме завдання (с)
+    SUBMIT_TIMEOUT = 30
+
+    def __init__(self, download_queue, bus, default_out, default_engine=None, allowed_dirs=None, parent=None):
+        """default_out() - папка для завдань без out_dir (поточна папка GUI)
+
+        default_engine() - параметри рушія для завдань, які їх не задають (розкладання з GUI),
+        allowed_dirs - інші папки, в які дозволено зберігати завдання API.
+        """
+        super().__init__(parent)
+        self.download_queue = download_queue
+        self.table = job_server.JobTable(bus)
+        self.default_out = default_out
+        self.default_engine = default_engine or dict
+        self.allowed_dirs = list(allowed_dirs or [])
+        self.submit_requested.connect(self.on_submit)
+        self.cancel_requested.connect(self.download_queue.cancel)
+        download_queue.job_progress.connect(self.on_progress)
+        download_queue.job_finished.connect(self.on_finished)
+
+    def submit(self, items):
+        future = Future()
+        self.submit_requested.emit(items, future)
+        return future.result(timeout=self.SUBMIT_TIMEOUT)
+
+    def cancel(self, job_id):
+        record = self.table.get(job_id)
+        if not record or record['status'] not in job_server.ACTIVE_STATUSES:
+            return False
+        self.cancel_requested.emit(job_id)
+        return True
+
+    def on_submit(self, items, future):
+        results = []
+        try:
+            for item in items:
+                try:
+                    url, preset, out_dir, engine = job_server.parse_item(
+                        item, self.default_out() or os.path.expanduser('~'), self.default_engine(), self.allowed_dirs)
+                except ValueError as e:
+                    results.append({'error': str(e), 'item': item})
+                    continue
+                try:
+                    results.append(self.add(url, preset, out_dir, engine))
+                except Exception as e:
+                    # Помилка одного завдання не скасовує ті, що вже в черзі
+                    results.append({'error': str(e), 'item': item})
+            future.set_result(results)
+        except Exception as e:
+            future.set_exception(e)
+
+    def add(self, url, preset, out_dir, engine):
+        os.makedirs(out_dir, exist_ok=True)
+        job_id = self.download_queue.add(url, out_dir, preset, engine=engine)
+        record = self.table.get(job_id)
+        if record is not None:
+            return dict(record, attached=True)
+        job = self.download_queue.jobs[job_id]
+        return self.table.add({
+            'id': job_id, 'url': url, 'video_id': job['video_id'], 'preset': preset,
+            'preset_key': job['preset'], 'out_dir': out_dir, 'sections': engine['sections'],
+            'status': job['status']
+        })
+
+    def on_progress(self, job_id, stats):
+        record = self.table.get(job_id)
+        if record is None or record['status'] not in job_server.ACTIVE_STATUSES:
+            return
+        if record['status'] == 'pending':
+            self.table.update(job_id, 'start', status='downloading')
+        elif record['status'] == 'downloading' and stats.get('stage'):
+            self.table.update(job_id, 'downloaded', status='processing')
+        if stats['percent'] != record.get('percent'):
+            self.table.update(
+                job_id, 'progress', percent=stats['percent'], downloaded_bytes=stats['downloaded_bytes'],
+                speed=int(stats['speed']) if stats['speed'] else None, eta=stats['eta'], phase=stats['phase']
+            )
+
+    def on_finished(self, job_id, status, message):
+        if self.table.get(job_id) is None:
+            return
+        event = {'done': 'finished', 'skipped': 'skipped'}.get(status, 'error')
+        self.table.update(job_id, event, status=status, message=message)
+
+
+class HistoryModel(QAbstractTableModel):
+    """Модель історії завантажень: записи читаються з бази сторінками під час прокрутки"""
+    HEADERS = ["Час", "Назва", "Формат", "Розмір", "Тривалість", "Швидкість",
+               "Метадані", "Пік", "Обробка", "Статус", "Файл"]
+    STATUS_TEXT = {'done': "Завершено", 'error': "Помилка", 'cancelled': "Скасовано"}
+
+    def __init__(self, store, page_size=100, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.page_size = page_size
+        self.rows = []
+        self.total = 0
+        self.reload()
+
+    def reload(self):
+        self.beginResetModel()
+        try:
+            self.total = self.store.count()
+            self.rows = self.store.page(0, self.page_size)
+        except Exception as e:
+            print(f"Помилка читання історії: {str(e)}")
+            self.total, self.rows = 0, []
+        self.endResetModel()
+
+    def load_newer(self):
+        """Додавання нових записів на початок без перечитування всієї таблиці"""
+        try:
+            newer = self.store.newer_than(max((row['id'] for row in self.rows), default=0))
+        except Exception as e:
+            print(f"Помилка читання історії: {str(e)}")
+            return
+        if not newer:
+            return
+        self.beginInsertRows(QModelIndex(), 0, len(newer) - 1)
+        self.rows[:0] = newer
+        self.total += len(newer)
+        self.endInsertRows()
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and len(self.rows) < self.total
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        try:
+            page = self.store.page(len(self.rows), self.page_size)
+        except Exception as e:
+            print(f"Помилка читання історії: {str(e)}")
+            return
+        if not page:
+            self.total = len(self.rows)
+            return
+        self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+        self.rows.extend(page)
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    @staticmethod
+    def telemetry(row):
+        """Розібране зведення телеметрії рядка (розбирається один раз)"""
+        if '_telemetry' not in row:
+            row['_telemetry'] = telemetry.parse(row.get('telemetry')) or {}
+        return row['_telemetry']
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            details = telemetry.describe(self.telemetry(row))
+            text = row['message'] or row['url']
+            return f"{text}\n\n{details}" if details else text
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        column = index.column()
+        if column == 0:
+            return datetime.fromtimestamp(row['finished_at']).strftime("%Y-%m-%d %H:%M")
+        if column == 1:
+            return row['title'] or row['url']
+        if column == 2:
+            return row['preset']
+        if column == 3:
+            return f"{row['size'] / 1024 / 1024:.1f} МБ" if row['size'] else ""
+        if column == 4:
+            return progress.format_eta(row['duration']) if row['duration'] is not None else ""
+        if column == 5:
+            return progress.format_speed(row['throughput'])
+        if column == 6:
+            seconds = self.telemetry(row).get('extract_seconds')
+            return f"{seconds:.1f} с" if seconds is not None else ""
+        if column == 7:
+            peaks = [stream['peak_rate'] for stream in self.telemetry(row).get('streams') or [] if stream['peak_rate']]
+            return progress.format_speed(max(peaks)) if peaks else ""
+        if column == 8:
+            summary = self.telemetry(row)
+            seconds = [summary.get(key) for key in ('merge_seconds', 'postprocess_seconds')]
+            seconds = [value for value in seconds if value is not None]
+            return f"{sum(seconds):.1f} с" if seconds else ""
+        if column == 9:
+            return self.STATUS_TEXT.get(row['status'], row['status'])
+        if column == 10:
+            return row['output_path'] or ""
+        return None
+
 class YouTubeDownloader(QWidget):
     def __init__(self):
         super().__init__()
         self.version = "1.0.4"
+        self.github_token = ""
+        self.github_repo = ""
+        self.output_template = None
+        self.ascii_filenames = False
+        self.first_show_done = False
         self.init_ui()
-        self.load_config()
-        self.check_for_updates()
+        self.download_queue.load()
 
     def init_ui(self):
         """Ініціалізація інтерфейсу"""
@@ -238,10 +1007,19 @@ class YouTubeDownloader(QWidget):
             self.setWindowTitle("YouTube Downloader")
             self.resize(1024, 768)
             self.setup_layouts()
+            self.max_history_items = 100
             self.setup_widgets()
             self.save_path = ""
-            self.max_history_items = 100
-            self.downloading = False  # Флаг для відстеження стану завантаження
+            self.job_rows = {}
+            self.job_progress = {}
+            self.expand_threads = []
+            self.pixmap_cache = PixmapCache()
+            self.preview_keys = {}
+            self.preview_manager = PreviewManager(parent=self)
+            self.preview_manager.preview_loaded.connect(self.on_preview_loaded)
+            self.preview_manager.preview_ready.connect(self.update_preview)
+            self.preview_manager.error.connect(self.handle_preview_error)
+            self.setup_queue()
         except Exception as e:
             QMessageBox.critical(self, "Помилка", f"Помилка ініціалізації: {str(e)}")
 
@@ -271,10 +1049,21 @@ class YouTubeDownloader(QWidget):
 
             # Format Combo
             self.format_combo = QComboBox(self)
-            self.format_combo.addItems(["MP4 (1080p)", "MP4 (4k)", "MP3", "M4A"])
+            self.format_combo.addItems(presets.get_registry().names())
             self.format_combo.currentTextChanged.connect(self.on_format_changed)
             self.top_layout.addWidget(self.format_combo)
 
+            # Workers Spin
+            self.workers_spin = QSpinBox(self)
+            self.workers_spin.setRange(1, 16)
+            self.workers_spin.setValue(3)
+            self.workers_spin.setPrefix("Потоків: ")
+            self.workers_spin.valueChanged.connect(self.on_workers_changed)
+            self.top_layout.addWidget(self.workers_spin)
+
+            # Download Engine
+            self.setup_engine_widgets()
+
             # Folder Button
             self.select_folder_btn = QPushButton("Вибрати папку", self)
             self.select_folder_btn.setIcon(QIcon(resource_path('assets/folder.png')))
@@ -295,15 +1084,189 @@ class YouTubeDownloader(QWidget):
             self.progress_bar = QProgressBar(self)
             self.main_layout.addWidget(self.progress_bar)
 
+            # Queue
+            self.setup_queue_table()
+
             # History
-            self.history_text = QTextEdit(self)
-            self.history_text.setReadOnly(True)
-            self.history_text.setPlaceholderText("Історія завантажень...")
-            self.main_layout.addWidget(self.history_text)
+            self.setup_history_tabs()
+
+            # Cache Stats
+            self.cache_label = QLabel("Кеш метаданих: влучань 0, промахів 0", self)
+            self.cache_label.setStyleSheet("color: #666;")
+            self.main_layout.addWidget(self.cache_label)
+
+            # Глибина черг етапів: завантаження і постобробка
+            self.stage_label = QLabel("", self)
+            self.stage_label.setStyleSheet("color: #666;")
+            self.main_layout.addWidget(self.stage_label)
 
         except Exception as e:
             QMessageBox.critical(self, "Помилка", f"Помилка налаштування віджетів: {str(e)}")
 
+    def setup_engine_widgets(self):
+        """Параметри рушія завантаження (значення пресету, які можна змінити)"""
+        engine_layout = QHBoxLayout()
+        engine_layout.setSpacing(10)
+
+        self.fragments_spin = QSpinBox(self)
+        self.fragments_spin.setRange(1, 32)
+        self.fragments_spin.setPrefix("Фрагментів: ")
+        self.fragments_spin.setToolTip("Кількість фрагментів DASH/HLS, які завантажуються одночасно")
+        engine_layout.addWidget(self.fragments_spin)
+
+        self.parallel_streams_check = QCheckBox("Відео й аудіо одночасно", self)
+        engine_layout.addWidget(self.parallel_streams_check)
+
+        self.external_combo = QComboBox(self)
+        self.external_combo.addItem("Вбудований завантажувач", None)
+        for name in download_engine.available_external_downloaders():
+            self.external_combo.addItem(name, name)
+        engine_layout.addWidget(self.external_combo)
+
+        self.rate_spin = QSpinBox(self)
+        self.rate_spin.setRange(0, 1000)
+        self.rate_spin.setSuffix(" МБ/с")
+        self.rate_spin.setSpecialValueText("Без ліміту швидкості")
+        self.rate_spin.setToolTip("Спільний ліміт швидкості для всіх завантажень")
+        self.rate_spin.valueChanged.connect(self.on_rate_limit_changed)
+        engine_layout.addWidget(self.rate_spin)
+
+        self.sections_input = QLineEdit(self)
+        self.sections_input.setPlaceholderText("Фрагменти: 10:00-12:30, назва розділу")
+        self.sections_input.setToolTip(
+            "Завантажити лише ці проміжки або розділи (через кому); порожньо - усе відео.\n"
+            "Різання по ключових кадрах без перекодування"
+        )
+        self.sections_input.setFixedWidth(260)
+        engine_layout.addWidget(self.sections_input)
+
+        # Розкладання по підпапках належить папці збереження, а не пресету
+        self.sharding_combo = QComboBox(self)
+        for name, (title, _) in output_paths.SHARDING.items():
+            self.sharding_combo.addItem(title, name)
+        self.sharding_combo.setToolTip("Підпапки для великих бібліотек: за автором, роком і місяцем або ID")
+        engine_layout.addWidget(self.sharding_combo)
+
+        engine_layout.addStretch()
+        self.main_layout.addLayout(engine_layout)
+        self.load_engine_settings(self.format_combo.currentText())
+
+    def load_engine_settings(self, selected_format):
+        """Заповнення параметрів рушія значеннями пресету"""
+        engine = presets.get_registry().engine(selected_format)
+        self.fragments_spin.setValue(engine['concurrent_fragments'])
+        self.parallel_streams_check.setChecked(engine['parallel_streams'])
+        index = self.external_combo.findData(engine['external_downloader'])
+        if index < 0:
+            # Завантажувач з пресету не знайдено в PATH
+            self.external_combo.addItem(engine['external_downloader'], engine['external_downloader'])
+            index = self.external_combo.count() - 1
+        self.external_combo.setCurrentIndex(index)
+        self.sections_input.setText(sections.label(engine['sections']))
+
+    def engine_settings(self):
+        """Параметри рушія для нових завдань (ValueError, якщо фрагменти задано невірно)"""
+        return {
+            'concurrent_fragments': self.fragments_spin.value(),
+            'parallel_streams': self.parallel_streams_check.isChecked(),
+            'external_downloader': self.external_combo.currentData() or 'native',
+            'sections': sections.parse(self.sections_input.text()),
+            **self.output_settings()
+        }
+
+    def output_settings(self):
+        """Шаблон імені, підпапки і обмеження імен файлів для нових завдань (див. output_paths.py)"""
+        return {
+            'output_template': self.output_template,
+            'sharding': self.sharding_combo.currentData(),
+            'ascii_filenames': self.ascii_filenames
+        }
+
+    def on_rate_limit_changed(self, value):
+        """Обробка зміни спільного ліміту швидкості"""
+        download_engine.get_limiter().set_rate(value * 1024 * 1024)
+
+    def setup_queue_table(self):
+        """Налаштування таблиці черги завантажень"""
+        try:
+            self.queue_table = QTableWidget(0, 5, self)
+            self.queue_table.setHorizontalHeaderLabels(["URL", "Формат", "Прогрес", "Статус", ""])
+            self.queue_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+            self.queue_table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+            self.queue_table.verticalHeader().setVisible(False)
+            header = self.queue_table.horizontalHeader()
+            header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+            header.setSectionResizeMode(2, QHeaderView.ResizeMode.Fixed)
+            self.queue_table.setColumnWidth(2, 200)
+            self.main_layout.addWidget(self.queue_table)
+        except Exception as e:
+            QMessageBox.critical(self, "Помилка", f"Помилка налаштування черги: {str(e)}")
+
+    def setup_history_tabs(self):
+        """Журнал поточного сеансу та історія завантажень з бази"""
+        self.history_tabs = QTabWidget(self)
+
+        # Журнал обмежений max_history_items рядками, старі рядки видаляються
+        self.history_text = QPlainTextEdit(self)
+        self.history_text.setReadOnly(True)
+        self.history_text.setMaximumBlockCount(self.max_history_items)
+        self.history_text.setPlaceholderText("Журнал завантажень...")
+        self.history_tabs.addTab(self.history_text, "Журнал")
+
+        self.history_model = HistoryModel(history.get_store(), page_size=self.max_history_items, parent=self)
+        self.history_view = QTableView(self)
+        self.history_view.setModel(self.history_model)
+        self.history_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.history_view.verticalHeader().setVisible(False)
+        self.history_view.horizontalHeader().setSectionResizeMode(1, QHeaderView.ResizeMode.Stretch)
+
+        history_page = QWidget(self)
+        history_layout = QVBoxLayout(history_page)
+        history_layout.setContentsMargins(0, 0, 0, 0)
+        history_layout.addWidget(self.history_view)
+        export_layout = QHBoxLayout()
+        export_layout.addStretch()
+        self.export_telemetry_btn = QPushButton("Експорт телеметрії...", self)
+        self.export_telemetry_btn.clicked.connect(self.export_telemetry)
+        export_layout.addWidget(self.export_telemetry_btn)
+        history_layout.addLayout(export_layout)
+        self.history_tabs.addTab(history_page, "Історія")
+
+        self.main_layout.addWidget(self.history_tabs)
+
+    def export_telemetry(self):
+        """Експорт історії з телеметрією завдань у JSON або CSV"""
+        try:
+            path, selected_filter = QFileDialog.getSaveFileName(
+                self, "Експорт телеметрії", "telemetry.json", "JSON (*.json);;CSV (*.csv)"
+            )
+            if not path:
+                return
+            if not os.path.splitext(path)[1]:
+                path += '.csv' if selected_filter.startswith('CSV') else '.json'
+            store = history.get_store()
+            count = telemetry.export(store.page(0, -1), path)
+            self.add_to_history(f"Телеметрію {count} завдань експортовано у {path}")
+        except Exception as e:
+            QMessageBox.warning(self, "Помилка", f"Не вдалося експортувати телеметрію: {str(e)}")
+
+    def setup_queue(self):
+        """Створення черги завантажень"""
+        cache_dir = os.path.join(os.path.expanduser('~'), '.ytdownloader_cache')
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        thumbnail_cache.remove_legacy_files(cache_dir)
+
+        self.download_queue = DownloadQueue(
+            os.path.join(cache_dir, 'queue.json'),
+            max_workers=self.workers_spin.value(),
+            parent=self
+        )
+        self.download_queue.job_added.connect(self.add_job_row)
+        self.download_queue.job_progress.connect(self.update_progress)
+        self.download_queue.job_finished.connect(self.download_complete)
+        self.download_queue.job_attached.connect(self.on_job_attached)
+
     def setup_preview_section(self):
         """Налаштування секції превью"""
         try:
@@ -312,11 +1275,11 @@ class YouTubeDownloader(QWidget):
             
             # Ліва колонка - превью
             preview_container = QWidget()
-            preview_container.setFixedSize(400, 220)
+            preview_container.setFixedSize(PREVIEW_WIDTH, PREVIEW_HEIGHT)
             preview_container.setStyleSheet("border: 1px solid gray;")
             
             self.preview_label = QLabel(preview_container)
-            self.preview_label.setFixedSize(400, 220)
+            self.preview_label.setFixedSize(PREVIEW_WIDTH, PREVIEW_HEIGHT)
             self.preview_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
             preview_layout.addWidget(preview_container)
 
@@ -366,70 +1329,190 @@ class YouTubeDownloader(QWidget):
             QMessageBox.critical(self, "Помилка", f"Помилка налаштування превью: {str(e)}")
 
     def start_download(self):
-        """Початок завантаження з перевірками"""
+        """Додавання URL у чергу завантажень з перевірками"""
         try:
-            if self.downloading:
-                QMessageBox.warning(self, "Увага", "Завантаження вже виконується!")
-                return
-
             if not self.save_path:
                 QMessageBox.warning(self, "Помилка", "Виберіть папку для збереження!")
                 return
 
-            url = self.url_input.text().strip()
-            if not url:
+            # Можна вставити одразу кілька URL, розділених пробілами або новими рядками
+            urls = self.url_input.text().split()
+            if not urls:
                 QMessageBox.warning(self, "Помилка", "Введіть URL відео!")
                 return
 
-            self.downloading = True
-            self.download_btn.setEnabled(False)
-            self.progress_bar.setValue(0)
-            
-            # Створюємо потік завантаження
-            self.download_thread = DownloadThread(
-                url=url,
-                save_path=self.save_path,
-                selected_format=self.format_combo.currentText()
-            )
-            
-            # Підключаємо сигнали
-            self.download_thread.progress_update.connect(self.update_progress)
-            self.download_thread.download_finished.connect(self.download_complete)
-            
-            # Запускаємо завантаження
-            self.download_thread.start()
-            
+            invalid_urls = [url for url in urls if not url.startswith(('http://', 'https://'))]
+            if invalid_urls:
+                QMessageBox.warning(self, "Помилка", f"Невірний формат URL: {invalid_urls[0]}")
+                return
+
+            selected_format = self.format_combo.currentText()
+            try:
+                engine = self.engine_settings()
+            except ValueError as e:
+                QMessageBox.warning(self, "Помилка", str(e))
+                return
+            for url in urls:
+                if downloader.is_playlist_url(url):
+                    self.expand_playlist(url, selected_format, engine)
+                else:
+                    self.download_queue.add(url, self.save_path, selected_format, engine=engine)
+
+            self.clear_interface()
+
         except Exception as e:
-            self.downloading = False
-            self.download_btn.setEnabled(True)
             QMessageBox.critical(self, "Помилка", f"Помилка запуску завантаження: {str(e)}")
 
-    def update_progress(self, progress):
-        """Оновлення прогрес-бару"""
+    def expand_playlist(self, url, selected_format, engine=None):
+        """Розгортання плейлиста у фоні з додаванням кожного відео в чергу"""
+        save_path = self.save_path
+        thread = ExpandThread(url, downloader.archive_path(save_path, selected_format))
+        thread.expanded.connect(
+            lambda source_url, entries, skipped: self.on_playlist_expanded(
+                thread, source_url, entries, skipped, save_path, selected_format, engine
+            )
+        )
+        thread.error.connect(
+            lambda source_url, message: self.on_playlist_error(thread, source_url, message)
+        )
+        self.expand_threads.append(thread)
+        self.add_to_history(f"Отримання списку відео: {url}")
+        thread.start()
+
+    def on_playlist_expanded(self, thread, url, entries, skipped, save_path, selected_format, engine=None):
+        """Додавання відео з плейлиста в чергу"""
+        self.finish_expand_thread(thread)
+        for entry in entries:
+            self.download_queue.add(entry['url'], save_path, selected_format, entry.get('title'), engine)
+        self.add_to_history(f"Плейлист: {url} - додано {len(entries)}, вже завантажено {skipped}")
+
+    def on_playlist_error(self, thread, url, message):
+        self.finish_expand_thread(thread)
+        self.add_to_history(f"Помилка отримання плейлиста {url}: {message}")
+
+    def finish_expand_thread(self, thread):
+        if thread in self.expand_threads:
+            self.expand_threads.remove(thread)
+        thread.wait()
+        thread.deleteLater()
+
+    def add_job_row(self, job):
+        """Додавання рядка завдання в таблицю черги"""
+        try:
+            row = self.queue_table.rowCount()
+            self.queue_table.insertRow(row)
+            url_item = QTableWidgetItem(job.get('title') or job['url'])
+            url_item.setToolTip(job['url'])
+            self.queue_table.setItem(row, 0, url_item)
+            self.queue_table.setItem(row, 1, QTableWidgetItem(job.get('preset') or job['format']))
+
+            progress_bar = QProgressBar(self.queue_table)
+            progress_bar.setValue(0)
+            self.queue_table.setCellWidget(row, 2, progress_bar)
+            self.queue_table.setItem(row, 3, QTableWidgetItem("В черзі"))
+
+            cancel_btn = QPushButton("Скасувати", self.queue_table)
+            cancel_btn.clicked.connect(lambda checked, job_id=job['id']: self.download_queue.cancel(job_id))
+            self.queue_table.setCellWidget(row, 4, cancel_btn)
+
+            self.job_rows[job['id']] = row
+            self.job_progress[job['id']] = 0
+            self.update_total_progress()
+        except Exception as e:
+            print(f"Помилка додавання завдання в таблицю: {str(e)}")
+
+    def update_progress(self, job_id, stats):
+        """Оновлення прогрес-бару завдання: відсоток, швидкість, час до завершення, фрагменти"""
         try:
-            if 0 <= progress <= 100:
-                self.progress_bar.setValue(progress)
+            row = self.job_rows.get(job_id)
+            if row is None:
+                return
+            progress_bar = self.queue_table.cellWidget(row, 2)
+            progress_bar.setValue(stats['percent'])
+            progress_bar.setFormat(progress.describe(stats))
+            self.queue_table.item(row, 3).setText("Обробка" if stats.get('stage') else "Завантаження")
+            self.job_progress[job_id] = stats['percent']
+            self.update_total_progress()
         except Exception as e:
             print(f"Помилка оновлення прогрес-бару: {str(e)}")
 
-    def download_complete(self, message):
-        """Обробка завершення завантаження"""
+    def update_total_progress(self):
+        """Загальний прогрес поточної черги"""
+        if self.job_progress:
+            self.progress_bar.setValue(int(sum(self.job_progress.values()) / len(self.job_progress)))
+        if self.download_queue.active_count() == 0:
+            self.job_progress = {}
+        self.update_stage_stats()
+
+    def update_stage_stats(self):
+        """Оновлення глибини черг етапів"""
+        depths = self.download_queue.stage_depths()
+        if not self.download_queue.active_count():
+            self.stage_label.setText("")
+            return
+        self.stage_label.setText(
+            f"В черзі: {depths['pending']} · завантаження: {depths['network']}/{depths['network_workers']} · "
+            f"постобробка: {depths['postprocess_running']}/{depths['postprocess_workers']}, "
+            f"очікують {depths['postprocess_queued']}"
+        )
+
+    def download_complete(self, job_id, status, message):
+        """Обробка завершення завдання"""
         try:
-            self.downloading = False
-            self.download_btn.setEnabled(True)
             self.add_to_history(message)
-            
-            if not message.startswith("Помилка"):
-                self.clear_interface()
-                
+
+            row = self.job_rows.get(job_id)
+            if row is not None:
+                status_text = {
+                    'done': "Завершено",
+                    'error': "Помилка",
+                    'cancelled': "Скасовано",
+                    'skipped': "Пропущено"
+                }.get(status, status)
+                self.queue_table.item(row, 3).setText(status_text)
+                self.queue_table.cellWidget(row, 4).setEnabled(False)
+                progress_bar = self.queue_table.cellWidget(row, 2)
+                progress_bar.setFormat("%p%")
+                if status == 'done':
+                    progress_bar.setValue(100)
+
+            if status == 'done':
+                self.job_progress[job_id] = 100
+            else:
+                self.job_progress.pop(job_id, None)
+            self.update_total_progress()
+            self.update_cache_stats()
+            if status != 'skipped':
+                self.history_model.load_newer()
+
         except Exception as e:
             print(f"Помилка обробки завершення завантаження: {str(e)}")
 
+    def on_job_attached(self, job_id, url):
+        """Повторний запит на відео, яке вже в черзі"""
+        job = self.download_queue.jobs.get(job_id)
+        self.add_to_history(f"Вже в черзі: {url} ({job['url'] if job else job_id})")
+
+    def update_cache_stats(self):
+        """Оновлення лічильників кешу метаданих"""
+        stats = metadata_cache.get_cache().stats()
+        text = f"Кеш метаданих: влучань {stats['hits']}, промахів {stats['misses']}"
+        savings = postprocessing.get_savings().stats()
+        if savings['copied']:
+            text += (f" · аудіо без перекодування: {savings['copied']}, "
+                     f"заощаджено ~{savings['cpu_saved_seconds']:.0f} с процесора")
+        self.cache_label.setText(text)
+
+    def on_workers_changed(self, value):
+        """Обробка зміни кількості потоків"""
+        if hasattr(self, 'download_queue'):
+            self.download_queue.set_max_workers(value)
+
     def add_to_history(self, message):
         """Додавання запису в історію"""
         try:
             current_time = datetime.now().strftime("%H:%M:%S")
-            self.history_text.append(f"[{current_time}] {message}")
+            self.history_text.appendPlainText(f"[{current_time}] {message}")
         except Exception as e:
             print(f"Помилка додавання в історію: {str(e)}")
 
@@ -464,22 +1547,31 @@ class YouTubeDownloader(QWidget):
         try:
             if hasattr(self, 'video_format'):
                 self.video_format.setText(f"Формат: {new_format}")
+            if hasattr(self, 'fragments_spin'):
+                self.load_engine_settings(new_format)
         except Exception as e:
             print(f"Помилка при зміні формату: {str(e)}")
 
     def show_preview(self):
         """Показ превью відео"""
         try:
-            url = self.url_input.text().strip()
-            if url and not self.downloading:
+            urls = self.url_input.text().split()
+            if urls:
+                url = urls[0]
                 if not url.startswith(('http://', 'https://')):
                     self.add_to_history("Помилка: Невірний формат URL")
                     return
+
+                # Превью вже є в пам'яті - показуємо без потоку і мережі
+                cached = self.pixmap_cache.get(self.preview_keys.get(url))
+                if cached:
+                    self.preview_manager.invalidate()
+                    self.update_preview(cached[0], cached[1])
+                    return
                 
-                self.preview_thread = PreviewThread(url)
-                self.preview_thread.preview_ready.connect(self.update_preview)
-                self.preview_thread.error.connect(self.handle_preview_error)
-                self.preview_thread.start()
+                self.preview_manager.request(url)
+            else:
+                self.preview_manager.invalidate()
             
         except Exception as e:
             self.add_to_history(f"Помилка превью: {str(e)}")
@@ -499,168 +1591,208 @@ class YouTubeDownloader(QWidget):
         except Exception as e:
             print(f"Помилка очистки превью: {str(e)}")
 
+    def on_preview_loaded(self, url, pixmap, title, key):
+        """Збереження превью в пам'яті"""
+        self.preview_keys[url] = key
+        self.pixmap_cache.put(key, pixmap, title)
+
     def update_preview(self, pixmap, title):
         """Оновлення превью"""
         try:
-            scaled_pixmap = pixmap.scaled(
-                400, 220,
-                Qt.AspectRatioMode.KeepAspectRatio,
-                Qt.TransformationMode.SmoothTransformation
-            )
-            
-            self.preview_label.setPixmap(scaled_pixmap)
+            # Превью вже зменшене до розміру мітки в PreviewThread
+            self.preview_label.setPixmap(pixmap)
             
             # Форматуємо текст
             title = title if len(title) <= 50 else title[:47] + "..."
-            url = self.url_input.text().strip()
+            urls = self.url_input.text().split()
+            url = urls[0] if urls else ""
             url = url if len(url) <= 50 else url[:47] + "..."
             
             self.video_title.setText(f"Назва: {title}")
             self.video_format.setText(f"Формат: {self.format_combo.currentText()}")
             self.video_url.setText(f"URL: {url}")
+            self.update_cache_stats()
             
         except Exception as e:
             print(f"Помилка оновлення превью: {str(e)}")
 
-    def load_config(self):
-        config = configparser.ConfigParser()
+    def showEvent(self, event):
+        super().showEvent(event)
+        if not self.first_show_done:
+            self.first_show_done = True
+            # Спрацює після обробки подій показу і першого малювання вікна
+            QTimer.singleShot(0, self.on_first_shown)
+
+    def on_first_shown(self):
+        """Фонові задачі запуску після того, як вікно вже показане"""
+        startup.mark('window_shown')
+        if '--startup-report' in sys.argv:
+            # Відкладені імпорти вимірюються окремо, вже після показу вікна
+            startup_records = list(startup.import_records)
+            lazy_imports.warm_up().join()
+            startup.report_imports(startup_records, deferred=lazy_imports.import_times)
+            QApplication.quit()
+            return
+        if '--startup-time' in sys.argv:
+            startup.report()
+        if '--quit-after-show' in sys.argv:
+            QApplication.quit()
+            return
+
+        # yt_dlp і requests імпортуються у фоні, поки користувач вводить URL
+        lazy_imports.warm_up()
+
+        self.update_checker = UpdateChecker(
+            self.version,
+            os.path.join(os.path.expanduser('~'), '.ytdownloader_cache', 'update_check.json'),
+            parent=self
+        )
+        self.update_checker.config_loaded.connect(self.apply_config)
+        self.update_checker.update_available.connect(self.on_update_available)
+        self.update_checker.start()
+
+    def apply_config(self, settings):
+        """Застосування налаштувань, прочитаних у фоні"""
+        self.github_token = settings['github_token']
+        self.github_repo = settings['github_repo']
+        if settings['max_workers']:
+            self.workers_spin.setValue(settings['max_workers'])
+        if settings['rate_limit']:
+            self.rate_spin.setValue(int(settings['rate_limit']))
+        # Розмір пулу постобробки задається до першого завдання
+        postprocessing.get_pool(settings['postprocess_workers'])
         try:
-            config.read('config.ini')
-            self.github_token = config['GitHub']['token']
-            self.github_repo = config['GitHub']['repo']
+            self.output_template = output_paths.parse_template(settings['output_template'])
+        except ValueError as e:
+            print(f"Помилка в output_template: {e}")
+        index = self.sharding_combo.findData(settings['sharding'])
+        if index >= 0:
+            self.sharding_combo.setCurrentIndex(index)
+        self.ascii_filenames = settings['ascii_filenames']
+        self.offer_resume(settings['auto_resume'])
+        if settings['server_enabled']:
+            self.start_job_server(settings['server_port'], settings['server_token'], settings['server_allowed_dirs'])
+
+    def start_job_server(self, port, token="", allowed_dirs=None):
+        """Запуск локального API завдань поруч з GUI"""
+        try:
+            bus = job_server.EventBus()
+            self.api_bridge = ApiBridge(
+                self.download_queue, bus, lambda: self.save_path, self.output_settings, allowed_dirs, parent=self)
+            self.job_server = job_server.JobServer(self.api_bridge, bus, port, token).start()
+            self.add_to_history(f"API завдань: {self.job_server.url}")
         except Exception as e:
-            print(f"Помилка завантаження конфігурації: {e}")
-            self.github_token = ""
-            self.github_repo = ""
+            print(f"Помилка запуску API завдань: {str(e)}")
+
+    def offer_resume(self, auto_resume=False):
+        """Пропозиція продовжити завдання, які не завершилися до закриття чи збою програми"""
+        try:
+            records = self.download_queue.restored
+            if not records:
+                return
+            partial = sum(journal.resumable_bytes(record) for record in records)
+            if not auto_resume:
+                text = f"Знайдено незавершених завантажень: {len(records)}"
+                if partial:
+                    text += f" (вже завантажено {partial / 1024 / 1024:.1f} МБ)"
+                reply = QMessageBox.question(
+                    self, "Незавершені завантаження", f"{text}.\nПродовжити їх?",
+                    QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+                )
+                if reply != QMessageBox.StandardButton.Yes:
+                    self.download_queue.discard_restored()
+                    return
+            count = self.download_queue.resume_restored()
+            self.add_to_history(f"Відновлено завдань: {count}, продовження з {partial / 1024 / 1024:.1f} МБ")
+        except Exception as e:
+            print(f"Помилка відновлення завдань: {str(e)}")
+
+    def closeEvent(self, event):
+        """Зупинка завантажень при закритті; незавершені завдання залишаються в черзі"""
+        if getattr(self, 'job_server', None):
+            self.job_server.stop()
+        self.download_queue.shutdown()
+        self.preview_manager.shutdown()
+        if getattr(self, 'update_thread', None) and self.update_thread.isRunning():
+            self.update_thread.cancel()
+            self.update_thread.wait(3000)
+        for thread in self.expand_threads:
+            thread.wait(3000)
+        # Постобробка, яка ще не почалася, відкидається (завдання лишаються в журналі)
+        postprocessing.get_pool().shutdown(wait=False)
+        # Вільні екземпляри YoutubeDL зберігають cookies, з'єднання закриваються
+        ydl_pool.get_pool().close()
+        http_client.close()
+        super().closeEvent(event)
 
     def select_folder(self):
         self.save_path = QFileDialog.getExistingDirectory(self, "Виберіть папку для збереження")
         if self.save_path:
             self.select_folder_btn.setText(self.save_path)
 
-    def setup_download_options(self):
-        self.selected_format = self.format_combo.currentText()
-        
-        ffmpeg_path = resource_path('ffmpeg.exe')
-        
-        ydl_opts = {
-            'ffmpeg_location': ffmpeg_path,
-            'outtmpl': os.path.join(self.save_path, '%(title)s.%(ext)s'),
-            'progress_hooks': [self.progress_hook],
-            'quiet': True
-        }
-
-        if self.selected_format == "MP4 (1080p)":
-            ydl_opts.update({
-                'format': 'bestvideo[height<=1080][vcodec!*=av1][vcodec!*=vp9][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][vcodec!*=av1][vcodec!*=vp9][ext=mp4]/best',
-                'postprocessors': [{
-                    'key': 'FFmpegVideoConvertor',
-                    'preferedformat': 'mp4'
-                }],
-                'merge_output_format': 'mp4',
-                'audio_quality': 0,
-                'prefer_ffmpeg': True,
-                'format_sort': ['res:1080', 'vcodec:h264', 'acodec:m4a']
-            })
-        
-        elif self.selected_format == "MP4 (4k)":
-            ydl_opts.update({
-                'format': 'bestvideo[height<=2160][vcodec!*=av1][vcodec!*=vp9][ext=mp4]+bestaudio[ext=m4a]/best[height<=2160][vcodec!*=av1][vcodec!*=vp9][ext=mp4]/best',
-                'postprocessors': [{
-                    'key': 'FFmpegVideoConvertor',
-                    'preferedformat': 'mp4'
-                }],
-                'merge_output_format': 'mp4',
-                'audio_quality': 0,
-                'prefer_ffmpeg': True,
-                'format_sort': ['res:2160', 'vcodec:h264', 'acodec:m4a']
-            })
-        
-        elif self.selected_format == "MP3":
-            ydl_opts.update({
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'mp3',
-                    'preferredquality': '320'
-                }],
-                'audio_quality': 0,
-                'prefer_ffmpeg': True
-            })
-        
-        elif self.selected_format == "M4A":
-            ydl_opts.update({
-                'format': 'bestaudio/best',
-                'postprocessors': [{
-                    'key': 'FFmpegExtractAudio',
-                    'preferredcodec': 'm4a',
-                    'preferredquality': '0'
-                }],
-                'audio_quality': 0,
-                'prefer_ffmpeg': True
-            })
-        
-        return ydl_opts
-
-    def check_for_updates(self):
-        try:
-            headers = {'Authorization': f'token {self.github_token}'} if self.github_token else {}
-            response = requests.get(
-                f'https://api.github.com/repos/{self.github_repo}/releases/latest',
-                headers=headers
+    def on_update_available(self, release_info):
+        """Пропозиція завантажити нову версію"""
+        try:
+            latest_version = release_info['tag_name'].replace('v', '')
+            reply = QMessageBox.question(
+                self,
+                "Доступне оновлення",
+                f"Доступна нова версія {latest_version}. Бажаєте завантажити?",
+                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
             )
             
-            if response.status_code == 200:
-                release_info = response.json()
-                latest_version = release_info['tag_name'].replace('v', '')
-                
-                if version.parse(latest_version) > version.parse(self.version):
-                    reply = QMessageBox.question(
-                        self,
-                        "Доступне оновлення",
-                        f"Доступна нова версія {latest_version}. Бажаєте завантажити?",
-                        QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
-                    )
-                    
-                    if reply == QMessageBox.StandardButton.Yes:
-                        for asset in release_info['assets']:
-                            if asset['name'].endswith('.exe'):
-                                self.download_update(asset['browser_download_url'])
-                                break
+            if reply == QMessageBox.StandardButton.Yes:
+                for asset in release_info['assets']:
+                    if asset['name'].endswith('.exe'):
+                        self.download_update(release_info, asset)
+                        break
         except Exception as e:
             print(f"Помилка перевірки оновлень: {e}")
 
-    def download_update(self, download_url):
+    def download_update(self, release_info, asset):
+        """Завантаження оновлення у фоні з прогресом і можливістю скасування"""
         try:
-            progress_dialog = QMessageBox(self)
-            progress_dialog.setWindowTitle("Завантаження оновлення")
-            progress_dialog.setText("Завантаження оновлення...")
-            progress_dialog.setStandardButtons(QMessageBox.StandardButton.Cancel)
-            progress_dialog.show()
+            self.update_dialog = QProgressDialog("Завантаження оновлення...", "Скасувати", 0, 100, self)
+            self.update_dialog.setWindowTitle("Завантаження оновлення")
+            self.update_dialog.setAutoClose(False)
+            self.update_dialog.setAutoReset(False)
 
-            response = requests.get(download_url, stream=True)
-            total_size = int(response.headers.get('content-length', 0))
-            
-            update_file = "update.exe"
-            block_size = 1024
-            
-            with open(update_file, 'wb') as f:
-                for data in response.iter_content(block_size):
-                    f.write(data)
-                    
-            progress_dialog.close()
-            
-            QMessageBox.information(
-                self,
-                "Оновлення завантажено",
-                "Оновлення успішно завантажено. Будь ласка, закрийте програму та запустіть файл update.exe"
-            )
-            
+            self.update_thread = UpdateDownloadThread(release_info, asset, "update.exe")
+            self.update_thread.progress.connect(self.on_update_progress)
+            self.update_thread.finished_ok.connect(self.on_update_downloaded)
+            self.update_thread.failed.connect(self.on_update_failed)
+            self.update_dialog.canceled.connect(self.update_thread.cancel)
+            self.update_dialog.show()
+            self.update_thread.start()
         except Exception as e:
             QMessageBox.warning(self, "Помилка", f"Помилка завантаження оновлення: {e}")
 
+    def on_update_progress(self, downloaded, total, speed):
+        """Прогрес і швидкість завантаження оновлення"""
+        if total > 0:
+            self.update_dialog.setValue(int(downloaded * 100 / total))
+        self.update_dialog.setLabelText(
+            f"Завантаження оновлення... {downloaded / 1048576:.1f} з {total / 1048576:.1f} МБ "
+            f"({speed / 1048576:.1f} МБ/с)"
+        )
+
+    def on_update_downloaded(self, path, verified):
+        self.update_dialog.close()
+        message = "Оновлення успішно завантажено. Будь ласка, закрийте програму та запустіть файл update.exe"
+        if not verified:
+            message += "\n\nУвага: контрольна сума не опублікована в релізі, файл не перевірено."
+        QMessageBox.information(self, "Оновлення завантажено", message)
+
+    def on_update_failed(self, error_message, cancelled):
+        self.update_dialog.close()
+        if cancelled:
+            self.add_to_history("Завантаження оновлення скасовано (можна продовжити пізніше)")
+        else:
+            QMessageBox.warning(self, "Помилка", f"Помилка завантаження оновлення: {error_message}")
+
 if __name__ == "__main__":
     app = QApplication(sys.argv)
+    startup.mark('qt_ready')
     window = YouTubeDownloader()
     window.show()
     sys.exit(app.exec())
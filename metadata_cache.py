@@ -0,0 +1,133 @@
+"""Дисковий кеш результатів extract_info, спільний для превью і завантаження"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+# Посилання на потоки YouTube живуть кілька годин, тому TTL менший за цей час
+DEFAULT_TTL = 60 * 60
+DEFAULT_MAX_ENTRIES = 500
+
+
+class MetadataCache:
+    """Кеш info-словників за канонічним ID відео з TTL та LRU-обмеженням розміру"""
+
+    def __init__(self, cache_dir, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def get(self, key):
+        """Info-словник з кешу або None"""
+        path = self._path(key)
+        with self.lock:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError):
+                self.misses += 1
+                return None
+
+            if entry.get('key') != key:
+                self.misses += 1
+                return None
+
+            # Застарілий запис не видаляється: назва і превью лишаються придатними для peek()
+            if time.time() - entry.get('stored_at', 0) > self.ttl:
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            # Час модифікації файлу використовується як час останнього доступу для LRU
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return entry['info']
+
+    def peek(self, key):
+        """Info-словник без перевірки TTL і без впливу на лічильники (для відображення назви)"""
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry['info'] if entry.get('key') == key else None
+
+    def put(self, key, info):
+        """Збереження info-словника (тільки для окремих відео, не плейлистів)"""
+        if not info or info.get('_type') not in (None, 'video'):
+            return
+        path = self._path(key)
+        entry = {'key': key, 'stored_at': time.time(), 'info': info}
+        with self.lock:
+            try:
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Помилка збереження метаданих у кеш: {e}")
+                return
+            self._evict()
+
+    def discard(self, key):
+        """Видалення запису (наприклад, коли посилання на потоки застаріли)"""
+        with self.lock:
+            self._remove(self._path(key))
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'hit_rate': round(self.hits / total, 3) if total else 0.0
+            }
+
+    def _evict(self):
+        try:
+            files = [
+                entry for entry in os.scandir(self.cache_dir)
+                if entry.is_file() and entry.name.endswith('.json')
+            ]
+        except OSError:
+            return
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.max_entries]:
+            self._remove(entry.path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(cache_dir=None):
+    """Спільний для всього процесу екземпляр кешу"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if cache_dir is None:
+                cache_dir = os.path.join(os.path.expanduser('~'), '.ytdownloader_cache', 'info')
+            _cache = MetadataCache(cache_dir)
+        return _cache
@@ -0,0 +1,196 @@
+"""Шаблони шляхів збереження, розкладання бібліотеки по підпапках і перевірка місця на диску (без залежності від Qt)
+
+Шлях файлу відносно папки збереження складається з підпапки розкладання і
+шаблону yt_dlp, наприклад для sharding="uploader":
+
+    %(uploader,channel,uploader_id|Невідомий автор).80B/%(title).150B [%(id)s].%(ext)s
+
+Шаблон задається в config.ini, CLI, API або пресеті (поле output_template) і
+не може виходити за межі папки збереження. Назви обрізаються за байтами, щоб
+довгі кириличні назви вкладалися в обмеження файлових систем (255 байтів),
+а windowsfilenames робить імена придатними для NTFS і мережевих дисків. ID у
+назві за замовчуванням розрізняє відео з однаковими назвами (і його впізнає
+dedup.ID_IN_NAME_RE).
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+from functools import lru_cache
+
+import lazy_imports
+
+DEFAULT_TEMPLATE = '%(title).150B [%(id)s].%(ext)s'
+EXT_SUFFIX = '.%(ext)s'
+# Підпапки розкладання: (назва для інтерфейсу, шаблон yt_dlp або None)
+SHARDING = {
+    'none': ("Без підпапок", None),
+    'uploader': ("За автором", '%(uploader,channel,uploader_id|Невідомий автор).80B'),
+    'date': ("За датою", '%(upload_date>%Y|Без дати)s/%(upload_date>%m|00)s'),
+    # Хеш ID (поле SHARD_FIELD): 256 рівномірно заповнених підпапок, однакових
+    # і на файлових системах без урахування регістру (NTFS, APFS)
+    'id': ("За ID", '%(library_shard)s')
+}
+# Поле info, яке додає postprocessing.shard_key_pp
+SHARD_FIELD = 'library_shard'
+DEFAULT_SHARDING = 'none'
+# Скільки місця лишати вільним після завантаження, байтів
+SPACE_RESERVE = 512 * 1024 ** 2
+# Під час злиття потоки і готовий файл якийсь час лежать на диску одночасно
+MERGE_SPACE_FACTOR = 2
+
+
+class NotEnoughSpace(Exception):
+    """Завдання не вміститься на диск"""
+
+
+@lru_cache(maxsize=64)
+def parse_template(text):
+    """Перевірений шаблон імені файлу (порожній рядок - None) або ValueError
+
+    Шаблон відносний (без '..'), а '.%(ext)s' додається, якщо його немає.
+    """
+    if not text or not text.strip():
+        return None
+    template = text.strip()
+    parts = re.split(r'[\\/]', template)
+    if os.path.isabs(template) or re.match(r'^[A-Za-z]:', template) or '..' in parts:
+        raise ValueError(f"Шаблон має бути відносним шляхом у папці збереження: {template}")
+    if not template.endswith(EXT_SUFFIX):
+        template += EXT_SUFFIX
+    error = lazy_imports.yt_dlp().YoutubeDL.validate_outtmpl(template)
+    if error:
+        raise ValueError(f"Невірний шаблон імені файлу {template}: {error}")
+    return template
+
+
+def parse_sharding(value):
+    """Назва розкладання по підпапках (None - як у пресеті) або ValueError"""
+    if value is None or value == '':
+        return None
+    if value not in SHARDING:
+        raise ValueError(f"Невідоме розкладання по підпапках: {value} (можливі: {', '.join(SHARDING)})")
+    return value
+
+
+def outtmpl(engine, suffix=''):
+    """Відносний шаблон yt_dlp для параметрів рушія (див. download_engine.DEFAULT_ENGINE)
+
+    suffix вставляється перед розширенням (наприклад, sections.OUTTMPL_SUFFIX).
+    """
+    template = engine.get('output_template') or DEFAULT_TEMPLATE
+    if suffix and template.endswith(EXT_SUFFIX):
+        template = template[:-len(EXT_SUFFIX)] + suffix + EXT_SUFFIX
+    shard = SHARDING[engine.get('sharding') or DEFAULT_SHARDING][1]
+    return f"{shard}/{template}" if shard else template
+
+
+def shard_key(video_id):
+    """Назва підпапки для розкладання за ID: перші два символи sha1 в нижньому регістрі"""
+    return hashlib.sha1(str(video_id).encode('utf-8')).hexdigest()[:2]
+
+
+def format_size(size):
+    for unit in ('Б', 'КБ', 'МБ', 'ГБ'):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ТБ"
+
+
+def required_space(info):
+    """Оцінка місця для завдання з метаданих після вибору форматів або None
+
+    Для фрагментів (sections.py) розмір пропорційний їхній тривалості.
+    """
+    formats = info.get('requested_formats') or [info]
+    sizes = [fmt.get('filesize') or fmt.get('filesize_approx') for fmt in formats]
+    if not all(sizes):
+        return None
+    size = sum(sizes)
+    duration = info.get('duration')
+    if info.get('section_end') is not None and duration:
+        clip = min(info['section_end'], duration) - (info.get('section_start') or 0)
+        size = size * max(clip, 0) / duration
+    if len(formats) > 1:
+        size *= MERGE_SPACE_FACTOR
+    return int(size)
+
+
+def _existing_parent(path):
+    path = os.path.abspath(path)
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class SpaceReservations:
+    """Місце, обіцяне завданням, які ще не завершилися (окремо для кожного диска)
+
+    Кожне завдання перевіряє вільне місце з урахуванням уже зарезервованого
+    іншими завданнями, тож кілька одночасних завантажень 4K не пройдуть
+    перевірку на одному й тому самому вільному місці. Резерв не зменшується
+    в міру завантаження, тож оцінка для наступних завдань з запасом.
+    """
+
+    def __init__(self, reserve=SPACE_RESERVE):
+        self.reserve = reserve
+        self.lock = threading.Lock()
+        self.jobs = {}
+
+    def claim(self, owner, info, filename):
+        """Резервування місця для файлу filename; NotEnoughSpace, якщо не вміщається
+
+        owner - об'єкт завдання (екземпляр YoutubeDL), за яким резерв знімається в release().
+        """
+        size = required_space(info)
+        if not size:
+            return
+        folder = _existing_parent(os.path.dirname(filename))
+        try:
+            device = os.stat(folder).st_dev
+            free = shutil.disk_usage(folder).free
+        except OSError:
+            return
+        with self.lock:
+            reserved = sum(
+                job_size
+                for job_owner, entries in self.jobs.items() if job_owner is not owner
+                for job_device, job_size in entries if job_device == device
+            )
+            available = free - reserved - self.reserve
+            if size > available:
+                raise NotEnoughSpace(
+                    f"Недостатньо місця на диску: потрібно ~{format_size(size)}, "
+                    f"доступно {format_size(max(available, 0))} ({folder})"
+                )
+            self.jobs.setdefault(owner, []).append((device, size))
+
+    def release(self, owner):
+        """Зняття резерву завдання (після постобробки, скасування або помилки)"""
+        with self.lock:
+            self.jobs.pop(owner, None)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'jobs': len(self.jobs),
+                'reserved_bytes': sum(size for entries in self.jobs.values() for _, size in entries)
+            }
+
+
+_reservations = None
+_reservations_lock = threading.Lock()
+
+
+def get_reservations():
+    """Спільні резерви місця для всіх завдань процесу"""
+    global _reservations
+    with _reservations_lock:
+        if _reservations is None:
+            _reservations = SpaceReservations()
+        return _reservations
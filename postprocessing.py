@@ -0,0 +1,492 @@
+"""Постобробка з урахуванням кодеків: перекодування лише тоді, коли без нього не обійтися"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import lazy_imports
+import output_paths
+import progress
+
+# Кодеки, які можна без перекодування покласти в контейнер (префікси рядків vcodec/acodec yt_dlp)
+CONTAINER_CODECS = {
+    'mp4': (
+        ('avc1', 'avc3', 'h264', 'hev1', 'hvc1', 'h265', 'hevc', 'av01', 'av1'),
+        ('mp4a', 'aac', 'mp3', 'ac-3', 'ec-3')
+    ),
+    'webm': (
+        ('vp8', 'vp9', 'vp09', 'av01', 'av1'),
+        ('opus', 'vorbis')
+    ),
+    # MKV приймає будь-які кодеки
+    'mkv': (None, None)
+}
+
+SKIP = 'skip'
+REMUX = 'remux'
+AUDIO_TRANSCODE = 'audio_transcode'
+REENCODE = 'reencode'
+AUDIO_COPY = 'audio_copy'
+AUDIO_ENCODE = 'audio_encode'
+
+PATH_LABELS = {
+    SKIP: "без обробки",
+    REMUX: "ремукс без перекодування",
+    AUDIO_TRANSCODE: "перекодування лише аудіо",
+    REENCODE: "повне перекодування",
+    AUDIO_COPY: "копіювання аудіо без перекодування",
+    AUDIO_ENCODE: "перекодування аудіо"
+}
+
+# Префікси acodec yt_dlp для вибору потоку аудіо в цільовому кодеку (див. presets.py, native_audio)
+AUDIO_CODEC_PREFIXES = {
+    'm4a': 'mp4a', 'aac': 'mp4a', 'mp3': 'mp3', 'opus': 'opus',
+    'vorbis': 'vorbis', 'flac': 'flac', 'alac': 'alac'
+}
+# Стандартні бітрейти (кбіт/с), до яких округлюється бітрейт джерела
+AUDIO_BITRATES = (64, 96, 128, 160, 192, 224, 256, 320)
+# Найбільший бітрейт, вище якого кодеку немає сенсу підніматися, і бітрейт для невідомого джерела
+AUDIO_ENCODER_BITRATES = {
+    'libmp3lame': (320, 192),
+    'aac': (256, 192),
+    'libfdk_aac': (256, 192),
+    'libopus': (192, 128),
+    'libvorbis': (256, 192)
+}
+# Кодек для перекодування лише аудіо в SmartContainerPP (має бути в AUDIO_ENCODER_BITRATES)
+TRANSCODE_AUDIO_ENCODER = 'aac'
+# Оцінка часу кодування (с процесора на секунду аудіо), доки немає власних вимірів
+DEFAULT_ENCODE_RATE = 0.02
+
+
+def _codec_fits(codec, allowed):
+    if allowed is None or not codec or codec == 'none':
+        return True
+    codec = codec.lower()
+    return codec.startswith(allowed)
+
+
+def choose_path(info, container):
+    """Вибір найдешевшого способу отримати файл у потрібному контейнері"""
+    allowed_video, allowed_audio = CONTAINER_CODECS.get(container, (None, None))
+    video_fits = _codec_fits(info.get('vcodec'), allowed_video)
+    audio_fits = _codec_fits(info.get('acodec'), allowed_audio)
+
+    if not video_fits:
+        return REENCODE
+    if not audio_fits:
+        return AUDIO_TRANSCODE
+    if (info.get('ext') or '').lower() == container:
+        return SKIP
+    return REMUX
+
+
+def audio_bitrate(source_abr, encoder):
+    """Бітрейт перекодування (кбіт/с) з бітрейту джерела або None для кодеків без втрат
+
+    Перекодування з втратами не додає якості, тож бітрейт джерела лише
+    округлюється вгору до стандартного і обмежується стелею кодека.
+    """
+    limits = AUDIO_ENCODER_BITRATES.get(encoder)
+    if limits is None:
+        return None
+    cap, default = limits
+    if not source_abr:
+        return default
+    for bitrate in AUDIO_BITRATES:
+        if bitrate >= source_abr:
+            return min(bitrate, cap)
+    return cap
+
+
+class AudioSavings:
+    """Час процесора, заощаджений копіюванням аудіо замість перекодування
+
+    Оцінка будується на власних вимірах кодування в цьому процесі (секунд
+    ffmpeg на секунду аудіо), а до першого виміру - на DEFAULT_ENCODE_RATE.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.copied = 0
+        self.encoded = 0
+        self.cpu_saved_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.encoded_media_seconds = 0.0
+
+    def encode_rate(self):
+        with self.lock:
+            if self.encoded_media_seconds:
+                return self.encode_seconds / self.encoded_media_seconds
+            return DEFAULT_ENCODE_RATE
+
+    def record_encode(self, duration, seconds):
+        with self.lock:
+            self.encoded += 1
+            if duration:
+                self.encode_seconds += seconds
+                self.encoded_media_seconds += duration
+
+    def record_copy(self, duration):
+        """Облік копіювання; повертає оцінку заощадженого часу (с)"""
+        saved = (duration or 0) * self.encode_rate()
+        with self.lock:
+            self.copied += 1
+            self.cpu_saved_seconds += saved
+        return round(saved, 3)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'copied': self.copied,
+                'encoded': self.encoded,
+                'cpu_saved_seconds': round(self.cpu_saved_seconds, 3)
+            }
+
+
+_savings = None
+_savings_lock = threading.Lock()
+
+
+def get_savings():
+    """Спільний лічильник заощадженого часу процесора"""
+    global _savings
+    with _savings_lock:
+        if _savings is None:
+            _savings = AudioSavings()
+        return _savings
+
+
+_pp_class = None
+_plan_pp_class = None
+_audio_pp_class = None
+_space_pp_class = None
+_shard_pp_class = None
+
+
+def smart_container_pp(downloader, container):
+    """Екземпляр постпроцесора (клас створюється при першому виклику, щоб не імпортувати yt_dlp заздалегідь)"""
+    global _pp_class
+    if _pp_class is None:
+        _pp_class = _make_pp_class()
+    return _pp_class(downloader, container)
+
+
+def native_audio_pp(downloader, codec=None):
+    """Постпроцесор аудіо: копіювання потоку, якщо кодек уже цільовий, інакше
+    перекодування з бітрейтом джерела (codec=None - завжди без перекодування)"""
+    global _audio_pp_class
+    if _audio_pp_class is None:
+        _audio_pp_class = _make_audio_pp_class()
+    return _audio_pp_class(downloader, codec)
+
+
+def format_plan_pp(downloader, hooks):
+    """Постпроцесор етапу before_dl, який повідомляє хуки прогресу про потоки завантаження
+
+    Хуки отримують подію {'status': 'planned', 'formats': [...], 'info_dict': ...},
+    де для кожного потоку є format_id, kind ('video', 'audio', 'av') і
+    очікуваний розмір size (або None).
+    """
+    global _plan_pp_class
+    if _plan_pp_class is None:
+        _plan_pp_class = _make_plan_pp_class()
+    return _plan_pp_class(downloader, hooks)
+
+
+def free_space_pp(downloader):
+    """Постпроцесор етапу before_dl, який резервує місце на диску для файлу завдання
+
+    Використовує filesize/filesize_approx вибраних форматів; якщо місця не
+    вистачає, завантаження не починається (output_paths.NotEnoughSpace).
+    """
+    global _space_pp_class
+    if _space_pp_class is None:
+        _space_pp_class = _make_space_pp_class()
+    return _space_pp_class(downloader)
+
+
+def _make_space_pp_class():
+    yt_dlp = lazy_imports.yt_dlp()
+
+    class FreeSpacePP(yt_dlp.postprocessor.PostProcessor):
+        def run(self, info):
+            filename = info.get('_filename') or info.get('filename')
+            if filename and not self._downloader.params.get('skip_download'):
+                output_paths.get_reservations().claim(self._downloader, info, filename)
+            return [], info
+
+    return FreeSpacePP
+
+
+def shard_key_pp(downloader):
+    """Постпроцесор етапу pre_process, який додає в info назву підпапки для розкладання за ID
+
+    Шаблон yt_dlp не вміє змінювати регістр чи хешувати поля, тому підпапка
+    (output_paths.shard_key) обчислюється тут, до побудови імені файлу.
+    """
+    global _shard_pp_class
+    if _shard_pp_class is None:
+        _shard_pp_class = _make_shard_pp_class()
+    return _shard_pp_class(downloader)
+
+
+def _make_shard_pp_class():
+    yt_dlp = lazy_imports.yt_dlp()
+
+    class ShardKeyPP(yt_dlp.postprocessor.PostProcessor):
+        def run(self, info):
+            info[output_paths.SHARD_FIELD] = output_paths.shard_key(info.get('id'))
+            return [], info
+
+    return ShardKeyPP
+
+
+def _make_plan_pp_class():
+    yt_dlp = lazy_imports.yt_dlp()
+
+    class FormatPlanPP(yt_dlp.postprocessor.PostProcessor):
+        def __init__(self, downloader, hooks):
+            super().__init__(downloader)
+            self.hooks = list(hooks)
+
+        def run(self, info):
+            formats = [
+                {
+                    'format_id': fmt.get('format_id'),
+                    'kind': progress.format_kind(fmt),
+                    'size': fmt.get('filesize') or fmt.get('filesize_approx')
+                }
+                for fmt in info.get('requested_formats') or [info]
+            ]
+            event = {'status': 'planned', 'formats': formats, 'info_dict': info}
+            for hook in self.hooks:
+                hook(event)
+            return [], info
+
+    return FormatPlanPP
+
+
+def _make_pp_class():
+    yt_dlp = lazy_imports.yt_dlp()
+    from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor, FFmpegPostProcessorError
+    from yt_dlp.utils import prepend_extension, replace_extension
+
+    class SmartContainerPP(FFmpegPostProcessor):
+        """Копіювання потоків, якщо кодеки вже підходять до контейнера, інакше перекодування"""
+
+        def __init__(self, downloader, container):
+            super().__init__(downloader)
+            self.container = container
+            self.bitrate = None
+
+        def _options(self, path):
+            if path == REMUX:
+                options = list(FFmpegPostProcessor.stream_copy_opts(ext=self.container))
+            elif path == AUDIO_TRANSCODE:
+                options = list(FFmpegPostProcessor.stream_copy_opts(ext=self.container))
+                options += ['-c:a', TRANSCODE_AUDIO_ENCODER, '-b:a', f'{self.bitrate}k']
+            else:
+                options = list(FFmpegPostProcessor.stream_copy_opts(False))
+            if self.container == 'mp4':
+                options += ['-movflags', '+faststart']
+            return options
+
+        def _convert(self, filename, source_ext, path):
+            if source_ext == self.container:
+                outpath = prepend_extension(filename, 'temp')
+            else:
+                outpath = replace_extension(filename, self.container, source_ext)
+            self.run_ffmpeg(filename, outpath, self._options(path))
+            if source_ext == self.container:
+                os.replace(outpath, filename)
+                outpath = filename
+            return outpath
+
+        def _probe_codecs(self, info):
+            """Кодеки з самого файлу, якщо екстрактор їх не повідомив (потрібен ffprobe)"""
+            if (info.get('vcodec') and info.get('acodec')) or not self.probe_available:
+                return info
+            codecs = {}
+            try:
+                for stream in self.get_metadata_object(info['filepath']).get('streams', []):
+                    key = {'video': 'vcodec', 'audio': 'acodec'}.get(stream.get('codec_type'))
+                    if key and key not in codecs:
+                        codecs[key] = stream.get('codec_name')
+            except Exception as e:
+                self.report_warning(f"Не вдалося визначити кодеки: {e}")
+                return info
+            return {**info, 'vcodec': codecs.get('vcodec', 'none'), 'acodec': codecs.get('acodec', 'none')}
+
+        @yt_dlp.postprocessor.PostProcessor._restrict_to(images=False)
+        def run(self, info):
+            filename, source_ext = info['filepath'], info['ext'].lower()
+            path = choose_path(self._probe_codecs(info), self.container)
+            # Бітрейт джерела, округлений до стандартного (див. NativeAudioPP._quality_args)
+            self.bitrate = audio_bitrate(info.get('abr'), TRANSCODE_AUDIO_ENCODER)
+            started = time.monotonic()
+
+            if path != SKIP:
+                try:
+                    outpath = self._convert(filename, source_ext, path)
+                except FFmpegPostProcessorError as e:
+                    if path == REENCODE:
+                        raise
+                    # Кодеки не вдалося визначити правильно - повертаємось до перекодування
+                    self.report_warning(f"Копіювання потоків не вдалося ({e}), повне перекодування")
+                    path = REENCODE
+                    outpath = self._convert(filename, source_ext, path)
+            else:
+                outpath = filename
+
+            ffmpeg_seconds = round(time.monotonic() - started, 3)
+            info['ytd_postprocess'] = {'path': path, 'ffmpeg_seconds': ffmpeg_seconds}
+            if path == AUDIO_TRANSCODE:
+                info['ytd_postprocess']['bitrate'] = self.bitrate
+            self.write_debug(
+                f"{PATH_LABELS[path]}: {info.get('vcodec')}/{info.get('acodec')} "
+                f"{source_ext} -> {self.container}, ffmpeg {ffmpeg_seconds} с"
+            )
+
+            if outpath == filename:
+                return [], info
+            info['filepath'] = outpath
+            info['format'] = info['ext'] = self.container
+            return [filename], info
+
+    return SmartContainerPP
+
+
+def _make_audio_pp_class():
+    lazy_imports.yt_dlp()
+    from yt_dlp.postprocessor.ffmpeg import FFmpegExtractAudioPP
+
+    class NativeAudioPP(FFmpegExtractAudioPP):
+        """FFmpegExtractAudio, який перекодовує з бітрейтом джерела замість фіксованої якості"""
+
+        def __init__(self, downloader, codec=None):
+            super().__init__(downloader, preferredcodec=codec or 'best')
+            self.source_abr = None
+            self.bitrate = None
+            self.encoder = None
+
+        def _quality_args(self, codec):
+            # Викликається лише тоді, коли без перекодування не обійтися
+            self.encoder = codec
+            self.bitrate = audio_bitrate(self.source_abr, codec)
+            return ['-b:a', f'{self.bitrate}k'] if self.bitrate else []
+
+        def _probe(self, info):
+            """Бітрейт (кбіт/с) і тривалість з ffprobe, якщо екстрактор їх не повідомив"""
+            abr, duration = info.get('abr') or info.get('tbr'), info.get('duration')
+            if (abr and duration) or not self.probe_available:
+                return abr, duration
+            try:
+                container = self.get_metadata_object(info['filepath']).get('format') or {}
+                abr = abr or float(container['bit_rate']) / 1000
+                duration = duration or float(container['duration'])
+            except (KeyError, TypeError, ValueError) as e:
+                self.report_warning(f"Не вдалося визначити бітрейт джерела: {e}")
+            return abr, duration
+
+        def run(self, info):
+            self.source_abr, duration = self._probe(info)
+            self.bitrate = self.encoder = None
+            started = time.monotonic()
+            files, info = super().run(info)
+            ffmpeg_seconds = round(time.monotonic() - started, 3)
+
+            savings = get_savings()
+            result = {'path': AUDIO_ENCODE if self.encoder else AUDIO_COPY, 'ffmpeg_seconds': ffmpeg_seconds}
+            if self.encoder:
+                savings.record_encode(duration, ffmpeg_seconds)
+                result['bitrate'] = self.bitrate
+            elif not files:
+                # Файл уже в потрібному форматі - ffmpeg не запускався, заощаджувати нічого
+                result['path'] = SKIP
+            else:
+                result['cpu_saved_seconds'] = savings.record_copy(duration)
+            info['ytd_postprocess'] = result
+            self.write_debug(
+                f"{PATH_LABELS[result['path']]}: {info.get('acodec')} ({self.source_abr} кбіт/с) -> "
+                f"{info.get('ext')}, ffmpeg {ffmpeg_seconds} с"
+            )
+            return files, info
+
+    return NativeAudioPP
+
+
+def postprocess_summary(info):
+    """Опис шляху постобробки для повідомлень, наприклад 'ремукс без перекодування, ffmpeg 1.2 с'"""
+    for download in (info or {}).get('requested_downloads') or [info or {}]:
+        result = download.get('ytd_postprocess')
+        if result:
+            label = PATH_LABELS[result['path']]
+            if result.get('bitrate'):
+                label += f" {result['bitrate']} кбіт/с"
+            summary = f"{label}, ffmpeg {result['ffmpeg_seconds']} с"
+            if result.get('cpu_saved_seconds'):
+                summary += f", заощаджено ~{result['cpu_saved_seconds']:.1f} с процесора"
+            return summary
+    return None
+
+
+class PostprocessPool:
+    """Пул постобробки (злиття, конвертація, витяг аудіо) розміром з кількість ядер
+
+    Потоки завантаження передають сюди завершені завантаження і відразу
+    беруться за наступний URL, тож мережа і процесор зайняті одночасно.
+    depth() показує глибину черги етапу.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='postprocess')
+        self.lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        # Найбільша кількість завдань в етапі одночасно (для зведення)
+        self.peak = 0
+
+    def submit(self, fn, *args, **kwargs):
+        """Постановка fn у чергу постобробки; повертає Future"""
+        with self.lock:
+            self.queued += 1
+            self.peak = max(self.peak, self.queued + self.running)
+
+        def run():
+            with self.lock:
+                self.queued -= 1
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+        try:
+            return self.executor.submit(run)
+        except RuntimeError:
+            with self.lock:
+                self.queued -= 1
+            raise
+
+    def depth(self):
+        with self.lock:
+            return {'queued': self.queued, 'running': self.running, 'workers': self.max_workers, 'peak': self.peak}
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool(max_workers=None):
+    """Спільний пул постобробки (max_workers враховується лише при створенні)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = PostprocessPool(max_workers)
+        return _pool
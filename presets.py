@@ -0,0 +1,294 @@
+"""Реєстр пресетів формату: опис пресетів як даних і побудова параметрів yt_dlp
+
+Пресети користувача читаються з presets.json (поруч з config.ini), наприклад:
+
+    {
+        "MP4 (1440p)": {"extends": "MP4 (1080p)", "max_height": 1440},
+        "MP3 (128k)": {"type": "audio", "audio_codec": "mp3", "audio_quality": "128"}
+    }
+
+Поля пресету:
+    type            - "video" або "audio"
+    max_height      - максимальна висота відео (None - без обмеження)
+    exclude_vcodecs - кодеки відео, які не вибираються (наприклад, av1, vp9)
+    video_ext       - контейнер потоку відео при виборі формату (None - будь-який)
+    audio_ext       - контейнер потоку аудіо при виборі формату (None - будь-який)
+    container       - контейнер результату (merge_output_format)
+    reencode        - True: завжди перекодовувати результат у container через FFmpegVideoConvertor;
+                      "auto": копіювати потоки, якщо кодеки підходять до container, і
+                      перекодовувати лише інакше (див. postprocessing.py); False: без обробки
+    audio_codec     - кодек для FFmpegExtractAudio (для type="audio")
+    audio_quality   - якість для FFmpegExtractAudio
+    native_audio    - True: вибирати потік аудіо в audio_codec і копіювати його без
+                      перекодування, а якщо такого немає - перекодовувати з бітрейтом
+                      джерела замість audio_quality (див. postprocessing.native_audio_pp);
+                      без audio_codec зберігається найкращий потік у власному кодеку
+    format          - готовий рядок вибору формату yt_dlp (замість побудованого)
+    format_sort     - готовий format_sort (замість побудованого)
+    concurrent_fragments - кількість фрагментів DASH/HLS, які завантажуються одночасно
+    parallel_streams     - завантажувати відео й аудіо bestvideo+bestaudio одночасно
+    external_downloader  - зовнішній завантажувач (aria2c, axel, curl, wget) або null
+    sections             - лише ці фрагменти: проміжки часу і назви розділів (див. sections.py)
+    output_template      - шаблон імені файлу yt_dlp відносно папки збереження (див. output_paths.py)
+    sharding             - підпапки: "none", "uploader", "date" або "id" (у GUI - вибір для папки)
+    ascii_filenames      - лише ASCII в іменах файлів
+    ydl_opts        - додаткові параметри yt_dlp без змін
+    extends         - назва пресету, поля якого успадковуються
+"""
+import copy
+import json
+import os
+import sys
+import threading
+
+import download_engine
+import postprocessing
+
+DEFAULT_PRESET = "MP4 (найкраща якість)"
+USER_PRESETS_FILE = 'presets.json'
+
+BUILTIN_PRESETS = {
+    "MP4 (1080p)": {
+        'type': 'video',
+        'max_height': 1080,
+        'exclude_vcodecs': ['av1', 'vp9'],
+        'video_ext': 'mp4',
+        'audio_ext': 'm4a',
+        'container': 'mp4',
+        'reencode': 'auto'
+    },
+    "MP4 (4k)": {
+        'extends': "MP4 (1080p)",
+        'max_height': 2160
+    },
+    "MP3": {
+        'type': 'audio',
+        'audio_codec': 'mp3',
+        'native_audio': True
+    },
+    "M4A": {
+        'type': 'audio',
+        'audio_codec': 'm4a',
+        'native_audio': True
+    },
+    "Opus": {
+        'type': 'audio',
+        'audio_codec': 'opus',
+        'native_audio': True
+    },
+    "Аудіо (оригінал)": {
+        'type': 'audio',
+        'audio_codec': None,
+        'native_audio': True
+    },
+    "MP4 (720p)": {
+        'extends': "MP4 (1080p)",
+        'max_height': 720
+    },
+    "MP4 (4k, AV1 дозволено)": {
+        'extends': "MP4 (1080p)",
+        'max_height': 2160,
+        'exclude_vcodecs': ['vp9'],
+        'reencode': False
+    },
+    "Оригінал (без перекодування)": {
+        'type': 'video',
+        'max_height': None,
+        'exclude_vcodecs': [],
+        'video_ext': None,
+        'audio_ext': None,
+        'container': 'mkv',
+        'reencode': False
+    },
+    DEFAULT_PRESET: {
+        'extends': "MP4 (1080p)",
+        'max_height': None
+    }
+}
+
+# Розширення файлів FFmpegExtractAudio для кодеків, у яких вони відрізняються від назви
+AUDIO_CODEC_EXTS = {'aac': 'm4a', 'alac': 'm4a', 'vorbis': 'ogg'}
+
+# Пресети, які показуються першими і в цьому порядку
+BUILTIN_ORDER = ["MP4 (1080p)", "MP4 (4k)", "MP3", "M4A", "Opus", "Аудіо (оригінал)", "MP4 (720p)",
+                 "MP4 (4k, AV1 дозволено)", "Оригінал (без перекодування)"]
+
+
+def bundled_ffmpeg():
+    """Шлях до ffmpeg, який постачається разом з програмою, або None (тоді з PATH)"""
+    base_path = getattr(sys, '_MEIPASS', os.path.abspath("."))
+    for name in ('ffmpeg.exe', 'ffmpeg'):
+        path = os.path.join(base_path, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _video_filter(preset):
+    parts = []
+    if preset.get('max_height'):
+        parts.append(f"[height<={preset['max_height']}]")
+    for vcodec in preset.get('exclude_vcodecs') or []:
+        parts.append(f"[vcodec!*={vcodec}]")
+    return ''.join(parts)
+
+
+def compile_preset(preset):
+    """Статична частина параметрів yt_dlp для пресету (без шляхів і хуків)"""
+    opts = {
+        'audio_quality': 0,
+        'prefer_ffmpeg': True
+    }
+
+    if preset.get('type') == 'audio':
+        opts['format'] = preset.get('format') or 'bestaudio/best'
+        if preset.get('native_audio'):
+            # Постпроцесор додається в downloader.download (див. PresetRegistry.native_audio)
+            prefix = postprocessing.AUDIO_CODEC_PREFIXES.get(preset.get('audio_codec'))
+            if prefix and not preset.get('format'):
+                opts['format'] = f"bestaudio[acodec^={prefix}]/bestaudio/best"
+        elif preset.get('audio_codec'):
+            opts['postprocessors'] = [{
+                'key': 'FFmpegExtractAudio',
+                'preferredcodec': preset['audio_codec'],
+                'preferredquality': str(preset.get('audio_quality', '0'))
+            }]
+    else:
+        video_filter = _video_filter(preset)
+        video_ext = f"[ext={preset['video_ext']}]" if preset.get('video_ext') else ''
+        audio_ext = f"[ext={preset['audio_ext']}]" if preset.get('audio_ext') else ''
+        fallbacks = [f"best{video_filter}{video_ext}", 'best']
+        opts['format'] = preset.get('format') or '/'.join(
+            [f"bestvideo{video_filter}{video_ext}+bestaudio{audio_ext}"] + list(dict.fromkeys(fallbacks))
+        )
+
+        format_sort = preset.get('format_sort')
+        if format_sort is None:
+            format_sort = []
+            if preset.get('max_height'):
+                format_sort.append(f"res:{preset['max_height']}")
+            if 'av1' in (preset.get('exclude_vcodecs') or []):
+                format_sort.append('vcodec:h264')
+            if preset.get('audio_ext') == 'm4a':
+                format_sort.append('acodec:m4a')
+        if format_sort:
+            opts['format_sort'] = format_sort
+
+        if preset.get('container'):
+            opts['merge_output_format'] = preset['container']
+            if preset.get('reencode') is True:
+                opts['postprocessors'] = [{
+                    'key': 'FFmpegVideoConvertor',
+                    'preferedformat': preset['container']
+                }]
+
+    ffmpeg_location = bundled_ffmpeg()
+    if ffmpeg_location:
+        opts['ffmpeg_location'] = ffmpeg_location
+
+    opts.update(preset.get('ydl_opts') or {})
+    return opts
+
+
+class PresetRegistry:
+    """Набір пресетів з кешуванням зібраних параметрів yt_dlp"""
+
+    def __init__(self, presets=None):
+        self.presets = dict(BUILTIN_PRESETS if presets is None else presets)
+        self.order = [name for name in BUILTIN_ORDER if name in self.presets]
+        self.compiled = {}
+        self.lock = threading.Lock()
+
+    def names(self):
+        """Назви пресетів для вибору в інтерфейсі та CLI"""
+        return self.order + [
+            name for name in self.presets
+            if name not in self.order and name != DEFAULT_PRESET
+        ] + [DEFAULT_PRESET]
+
+    def add(self, name, preset):
+        with self.lock:
+            self.presets[name] = preset
+            self.compiled.clear()
+
+    def load_file(self, path):
+        """Додавання пресетів з JSON-файлу користувача"""
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, encoding='utf-8') as f:
+                user_presets = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Помилка читання пресетів {path}: {e}")
+            return 0
+        for name, preset in user_presets.items():
+            self.add(name, preset)
+        return len(user_presets)
+
+    def resolve(self, name):
+        """Повний опис пресету з урахуванням extends"""
+        preset = self.presets.get(name)
+        if preset is None:
+            preset = self.presets[DEFAULT_PRESET]
+        chain = []
+        while preset is not None and len(chain) < 10:
+            chain.append(preset)
+            preset = self.presets.get(preset.get('extends'))
+        resolved = {}
+        for item in reversed(chain):
+            resolved.update(item)
+        resolved.pop('extends', None)
+        return resolved
+
+    def static_opts(self, name):
+        """Зібрані параметри yt_dlp (кешуються для кожного пресету)"""
+        with self.lock:
+            if name not in self.compiled:
+                self.compiled[name] = compile_preset(self.resolve(name))
+            return self.compiled[name]
+
+    def postprocess_container(self, name):
+        """Контейнер для постобробки з урахуванням кодеків (reencode="auto") або None"""
+        preset = self.resolve(name)
+        if preset.get('type') != 'audio' and preset.get('reencode') == 'auto':
+            return preset.get('container')
+        return None
+
+    def native_audio(self, name):
+        """(True, кодек) для пресету з native_audio (кодек None - як у джерелі), інакше (False, None)"""
+        preset = self.resolve(name)
+        if preset.get('type') == 'audio' and preset.get('native_audio'):
+            return True, preset.get('audio_codec')
+        return False, None
+
+    def engine(self, name, overrides=None):
+        """Параметри рушія завантаження пресету (див. download_engine.DEFAULT_ENGINE)"""
+        return download_engine.merge_engine(self.resolve(name), overrides)
+
+    def output_ext(self, name):
+        """Розширення готового файлу пресету або None, якщо воно залежить від джерела"""
+        preset = self.resolve(name)
+        if preset.get('type') == 'audio':
+            codec = preset.get('audio_codec')
+            return AUDIO_CODEC_EXTS.get(codec, codec)
+        return preset.get('container')
+
+    def build_ydl_opts(self, name, **dynamic_opts):
+        """Копія параметрів пресету, доповнена параметрами конкретного завдання"""
+        opts = copy.deepcopy(self.static_opts(name))
+        opts.update(dynamic_opts)
+        return opts
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(user_file=USER_PRESETS_FILE):
+    """Спільний реєстр: вбудовані пресети і пресети користувача"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = PresetRegistry()
+            _registry.load_file(user_file)
+        return _registry
@@ -0,0 +1,231 @@
+"""Збір прогресу завантажень з хуків yt_dlp без залежності від Qt
+
+Хуки викликаються на кожен блок даних у потоках завантаження, тому тут
+лише оновлюються лічильники під блокуванням. Інтерфейс забирає зміни
+через snapshot() з фіксованою частотою, а не на кожен виклик хука.
+"""
+import threading
+import time
+from collections import deque
+
+# Кількість вимірів для ковзної швидкості
+SPEED_WINDOW = 20
+PHASE_LABELS = {'video': "відео", 'audio': "аудіо", 'av': ""}
+STAGE_LABELS = {'postprocess': "обробка", 'postprocess_wait': "в черзі на обробку"}
+
+
+def format_kind(fmt):
+    """Тип потоку формату: 'video', 'audio' або 'av' (обидва чи невідомо)"""
+    if fmt.get('vcodec') == 'none':
+        return 'audio'
+    if fmt.get('acodec') == 'none':
+        return 'video'
+    return 'av'
+
+
+class JobProgress:
+    """Прогрес одного завдання з урахуванням окремих потоків відео й аудіо"""
+
+    def __init__(self):
+        self.phases = {}
+        self.order = []
+        self.current_id = None
+        self.samples = deque(maxlen=SPEED_WINDOW)
+        self.fragment_index = None
+        self.fragment_count = None
+        self.finished = False
+        # Етап після мережі: 'postprocess_wait' або 'postprocess' (див. ProgressAggregator.stage)
+        self.stage = None
+
+    def plan(self, formats):
+        """Потоки, які будуть завантажені (подія 'planned' з downloader.download)"""
+        self.phases = {}
+        self.order = []
+        for fmt in formats:
+            self.phase(str(fmt.get('format_id')), fmt.get('kind', 'av'), fmt.get('size'))
+
+    def phase(self, format_id, kind='av', expected=None):
+        if format_id not in self.phases:
+            self.phases[format_id] = {'kind': kind, 'downloaded': 0, 'total': expected, 'done': False, 'tmpfilename': None}
+            self.order.append(format_id)
+        return self.phases[format_id]
+
+    def update(self, d):
+        info = d.get('info_dict') or {}
+        self.current_id = str(info.get('format_id'))
+        phase = self.phase(self.current_id, format_kind(info))
+        if d['status'] == 'finished':
+            phase['done'] = True
+            phase['total'] = phase['downloaded'] = d.get('total_bytes') or d.get('downloaded_bytes') or phase['downloaded']
+        else:
+            phase['downloaded'] = d.get('downloaded_bytes') or 0
+            phase['tmpfilename'] = d.get('tmpfilename') or phase['tmpfilename']
+            phase['total'] = d.get('total_bytes') or d.get('total_bytes_estimate') or phase['total']
+            self.fragment_index = d.get('fragment_index')
+            self.fragment_count = d.get('fragment_count')
+        self.samples.append((time.monotonic(), self.downloaded()))
+
+    def downloaded(self):
+        return sum(phase['downloaded'] for phase in self.phases.values())
+
+    def fraction(self):
+        """Частка завершення всіх потоків (0..1)
+
+        Потоки зважуються за розміром, якщо він відомий для всіх, інакше
+        порівну. Тому коли після відео починається аудіо, прогрес не
+        повертається до нуля.
+        """
+        if self.finished:
+            return 1.0
+        phases = list(self.phases.values())
+        if not phases:
+            return 0.0
+        parts = []
+        for phase in phases:
+            if phase['done']:
+                parts.append(1.0)
+            elif phase['total']:
+                parts.append(min(1.0, phase['downloaded'] / phase['total']))
+            else:
+                parts.append(0.0)
+        totals = [phase['total'] for phase in phases]
+        if all(totals):
+            return sum(part * total for part, total in zip(parts, totals)) / sum(totals)
+        return sum(parts) / len(parts)
+
+    def speed(self):
+        """Ковзна швидкість у байтах/с за останні SPEED_WINDOW вимірів"""
+        if len(self.samples) < 2:
+            return None
+        (start_time, start_bytes), (end_time, end_bytes) = self.samples[0], self.samples[-1]
+        if end_time <= start_time:
+            return None
+        return max(0.0, (end_bytes - start_bytes) / (end_time - start_time))
+
+    def stats(self):
+        """Знімок прогресу для відображення"""
+        speed = self.speed()
+        phases = list(self.phases.values())
+        remaining = None
+        if phases and all(phase['total'] for phase in phases):
+            remaining = sum(max(0, phase['total'] - phase['downloaded']) for phase in phases if not phase['done'])
+        current = self.phases.get(self.current_id)
+        return {
+            'percent': 100 if self.finished else min(99, int(self.fraction() * 100)),
+            'downloaded_bytes': self.downloaded(),
+            'speed': speed,
+            'eta': int(remaining / speed) if remaining is not None and speed else None,
+            'fragment_index': self.fragment_index,
+            'fragment_count': self.fragment_count,
+            'phase': current['kind'] if current else None,
+            'phase_index': self.order.index(self.current_id) + 1 if current else None,
+            'phase_count': len(self.order),
+            'stage': None if self.finished else self.stage,
+            # Файли, з яких продовжиться завантаження після перезапуску
+            'part_files': [phase['tmpfilename'] for phase in phases if phase['tmpfilename'] and not phase['done']]
+        }
+
+
+class ProgressAggregator:
+    """Прогрес усіх завдань; хуки лише оновлюють дані, відображення забирає зміни через snapshot()"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.jobs = {}
+        self.dirty = set()
+
+    def hook(self, job_id):
+        """Хук прогресу yt_dlp для завдання"""
+        def hook(d):
+            self.update(job_id, d)
+        return hook
+
+    def update(self, job_id, d):
+        status = d.get('status')
+        if status not in ('planned', 'downloading', 'finished'):
+            return
+        with self.lock:
+            job = self.jobs.setdefault(job_id, JobProgress())
+            if status == 'planned':
+                job.plan(d.get('formats') or [])
+            else:
+                job.update(d)
+            self.dirty.add(job_id)
+
+    def start(self, job_id):
+        with self.lock:
+            self.jobs[job_id] = JobProgress()
+            self.dirty.add(job_id)
+
+    def stage(self, job_id, stage):
+        """Етап завдання після завантаження байтів (ключ STAGE_LABELS або None)"""
+        with self.lock:
+            job = self.jobs.setdefault(job_id, JobProgress())
+            job.stage = stage
+            self.dirty.add(job_id)
+
+    def finish(self, job_id, success=True):
+        """Завершення завдання: 100% при успіху, інакше скидання"""
+        with self.lock:
+            job = self.jobs.setdefault(job_id, JobProgress())
+            if success:
+                job.finished = True
+            else:
+                self.jobs[job_id] = JobProgress()
+            self.dirty.add(job_id)
+
+    def remove(self, job_id):
+        with self.lock:
+            self.jobs.pop(job_id, None)
+            self.dirty.discard(job_id)
+
+    def snapshot(self):
+        """Знімки завдань, які змінилися з попереднього виклику"""
+        with self.lock:
+            changed = {job_id: self.jobs[job_id].stats() for job_id in self.dirty if job_id in self.jobs}
+            self.dirty.clear()
+        return changed
+
+    def stats(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return job.stats() if job else None
+
+
+def format_speed(speed):
+    """Швидкість у зручному для читання вигляді"""
+    if not speed:
+        return ""
+    for unit in ("Б/с", "КБ/с"):
+        if speed < 1024:
+            return f"{speed:.0f} {unit}"
+        speed /= 1024
+    if speed < 1024:
+        return f"{speed:.1f} МБ/с"
+    return f"{speed / 1024:.1f} ГБ/с"
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{seconds:02}" if hours else f"{minutes:02}:{seconds:02}"
+
+
+def describe(stats):
+    """Рядок для прогрес-бару: відсоток, потік, швидкість, час до завершення, фрагменти"""
+    parts = [f"{stats['percent']}%"]
+    if stats.get('stage'):
+        parts.append(STAGE_LABELS.get(stats['stage'], stats['stage']))
+        return " · ".join(parts)
+    label = PHASE_LABELS.get(stats.get('phase'), "")
+    if label and stats.get('phase_count', 0) > 1:
+        parts.append(f"{label} {stats['phase_index']}/{stats['phase_count']}")
+    if stats.get('speed'):
+        parts.append(format_speed(stats['speed']))
+    if stats.get('eta') is not None:
+        parts.append(format_eta(stats['eta']))
+    if stats.get('fragment_count'):
+        parts.append(f"фр. {stats.get('fragment_index') or 0}/{stats['fragment_count']}")
+    return " · ".join(parts)
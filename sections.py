@@ -0,0 +1,110 @@
+"""Завантаження лише частини відео: проміжки часу і розділи (без залежності від Qt)
+
+Фрагменти задаються рядком через кому або крапку з комою, наприклад:
+
+    10:00-12:30, 1:02:00-1:05:30; Вступ
+
+Проміжок - це "початок-кінець" (H:MM:SS, MM:SS або секунди; кінець "inf" -
+до кінця відео), решта - назва розділу (без урахування регістру). Рядки, які
+починаються з '*', передаються yt_dlp без змін (синтаксис --download-sections).
+
+yt_dlp завантажує кожен фрагмент окремо через ffmpeg, який читає лише
+потрібні діапазони байтів або фрагменти DASH/HLS. Різання відбувається по
+ключових кадрах з копіюванням потоків (force_keyframes_at_cuts=False), тож
+трафік і місце на диску залежать від довжини фрагмента, а не всього відео.
+"""
+import re
+
+import lazy_imports
+
+SEPARATORS_RE = re.compile(r'[,;\n]')
+TIMESTAMP_RE = re.compile(r'^(?:(\d+):)?(?:(\d+):)?(\d+(?:\.\d+)?)$')
+RANGE_RE = re.compile(r'^(?P<start>[\d:.]+)?\s*-\s*(?P<end>[\d:.]+|inf)?$')
+# Суфікс імені файлу фрагмента, щоб фрагменти не перезаписували одне одне і повне відео
+OUTTMPL_SUFFIX = ' [%(section_start>%H.%M.%S)s-%(section_end>%H.%M.%S)s]'
+
+
+def parse_timestamp(text):
+    """Секунди з 'H:MM:SS', 'MM:SS' або 'SS'; None, якщо формат невірний"""
+    match = TIMESTAMP_RE.match(text.strip())
+    if not match:
+        return None
+    parts = [float(part) for part in match.groups() if part is not None]
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return seconds
+
+
+def parse(text):
+    """Список фрагментів з рядка інтерфейсу чи CLI (порожній рядок - None)
+
+    Повертає рядки: '*start-end' для проміжків і назви розділів. ValueError
+    для проміжку з невірним часом або кінцем раніше початку.
+    """
+    if not text:
+        return None
+    items = text if isinstance(text, (list, tuple)) else SEPARATORS_RE.split(text)
+    result = []
+    for item in items:
+        item = item.strip()
+        if not item:
+            continue
+        if item.startswith('*'):
+            result.append(item)
+            continue
+        match = RANGE_RE.match(item)
+        if not match:
+            # Не схоже на час - назва розділу
+            result.append(item)
+            continue
+        start = parse_timestamp(match.group('start') or '0')
+        end_text = match.group('end') or 'inf'
+        end = float('inf') if end_text == 'inf' else parse_timestamp(end_text)
+        if start is None or end is None:
+            raise ValueError(f"Невірний час у фрагменті: {item}")
+        if end <= start:
+            raise ValueError(f"Кінець фрагмента раніше за початок: {item}")
+        result.append(f"*{_format(start)}-{'inf' if end == float('inf') else _format(end)}")
+    return result or None
+
+
+def _format(seconds):
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(int(minutes), 60)
+    seconds = f"{seconds:06.3f}".rstrip('0').rstrip('.')
+    return f"{hours}:{minutes:02}:{seconds}" if hours else f"{minutes}:{seconds}"
+
+
+def label(sections):
+    """Короткий опис фрагментів для інтерфейсу і ключа пресету"""
+    return ", ".join(
+        section[1:] if section.startswith('*') else section
+        for section in sections or []
+    )
+
+
+def preset_key(selected_format, sections):
+    """Назва пресету для історії та індексу папки: фрагменти не вважаються повним відео"""
+    if not sections:
+        return selected_format
+    return f"{selected_format} [{label(sections)}]"
+
+
+def download_ranges(sections):
+    """Функція download_ranges для yt_dlp з розібраних фрагментів"""
+    yt_dlp = lazy_imports.yt_dlp()
+    chapters = []
+    ranges = []
+    for section in sections:
+        if not section.startswith('*'):
+            chapters.append(re.compile(re.escape(section), re.IGNORECASE))
+            continue
+        for part in section[1:].split(','):
+            start, _, end = part.strip().partition('-')
+            start_seconds = yt_dlp.utils.parse_duration(start) if start else 0
+            end_seconds = float('inf') if end in ('', 'inf') else yt_dlp.utils.parse_duration(end)
+            if start_seconds is None or end_seconds is None:
+                raise ValueError(f"Невірний час у фрагменті: {section}")
+            ranges.append([start_seconds, end_seconds])
+    return yt_dlp.utils.download_range_func(chapters, ranges)
@@ -0,0 +1,75 @@
+"""Вимірювання часу запуску програми"""
+import builtins
+import json
+import sys
+import threading
+import time
+
+# Відлік від першого імпорту модуля (main.py імпортує його першим)
+START = time.perf_counter()
+marks = {}
+
+# Записи у стилі -X importtime: (модуль, власний час мкс, сумарний час мкс, глибина)
+import_records = []
+_original_import = builtins.__import__
+_import_stack = threading.local()
+
+
+def mark(name):
+    """Позначка часу (мс від старту) для етапу запуску"""
+    marks[name] = round((time.perf_counter() - START) * 1000, 1)
+    return marks[name]
+
+
+def _resolve_name(name, globals, level):
+    if level == 0:
+        return name
+    package = (globals or {}).get('__package__') or ''
+    base = package.rsplit('.', level - 1)[0]
+    return f"{base}.{name}" if name else base
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    full_name = _resolve_name(name, globals, level)
+    if full_name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+
+    stack = getattr(_import_stack, 'stack', None)
+    if stack is None:
+        stack = _import_stack.stack = []
+    stack.append(0.0)
+    started = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        cumulative = time.perf_counter() - started
+        children = stack.pop()
+        if stack:
+            stack[-1] += cumulative
+        import_records.append((full_name, int((cumulative - children) * 1e6), int(cumulative * 1e6), len(stack)))
+
+
+def enable_import_timing():
+    """Запис часу кожного нового імпорту (працює і в зібраному PyInstaller exe, де немає -X)"""
+    builtins.__import__ = _timed_import
+
+
+def report(stream=None):
+    """Вивід позначок у форматі JSON-рядка"""
+    stream = stream or sys.stderr
+    stream.write(json.dumps({'event': 'startup', 'marks_ms': marks}) + '\n')
+    stream.flush()
+
+
+def report_imports(records, stream=None, limit=30, deferred=None):
+    """Звіт про найдовші імпорти у форматі -X importtime"""
+    stream = stream or sys.stderr
+    stream.write("import time: self [us] | cumulative | imported package\n")
+    top = sorted(records, key=lambda record: record[2], reverse=True)[:limit]
+    for name, self_us, cumulative_us, depth in top:
+        stream.write(f"import time: {self_us:>9} | {cumulative_us:>10} | {'  ' * depth}{name}\n")
+    total_us = sum(record[2] for record in records if record[3] == 0)
+    stream.write(f"startup imports total: {total_us / 1000:.1f} ms in {len(records)} modules\n")
+    if deferred:
+        stream.write(f"deferred imports (off the startup path), ms: {json.dumps(deferred)}\n")
+    report(stream)
@@ -0,0 +1,251 @@
+"""Телеметрія завдань без залежності від Qt: етапи, швидкість потоків, постобробка
+
+JobTelemetry отримує ті самі події, що й хуки прогресу yt_dlp, плюс події
+постпроцесорів (postprocessor_hooks), і після завершення дає зведення:
+
+    total_seconds       - від початку завдання до кінця
+    extract_seconds     - отримання метаданих і вибір форматів (до події 'planned')
+    first_byte_seconds  - від кінця отримання метаданих до першого байта
+    download_seconds    - від першого байта до кінця останнього потоку
+    postprocess_wait_seconds - очікування в черзі постобробки після завантаження
+    merge_seconds       - злиття потоків (Merger)
+    postprocess_seconds - решта постпроцесорів (конвертація, витяг аудіо тощо)
+    postprocessors      - тривалість кожного постпроцесора
+    streams             - для кожного потоку: байти, тривалість, середня і пікова швидкість
+    output_size         - розмір готового файлу
+"""
+import csv
+import json
+import os
+import threading
+import time
+
+import history
+import progress
+
+# Пікова швидкість рахується на вікнах не коротших за це значення (с)
+PEAK_WINDOW = 0.5
+MERGER = 'Merger'
+# Постпроцесори до завантаження (pre_process, before_dl), які не виконують реальної роботи з файлом
+IGNORED_POSTPROCESSORS = ('ShardKey', 'FormatPlan', 'FreeSpace')
+CSV_FIELDS = ('id', 'url', 'video_id', 'title', 'preset', 'status', 'finished_at', 'output_path',
+              'output_size', 'total_seconds', 'extract_seconds', 'first_byte_seconds',
+              'download_seconds', 'postprocess_wait_seconds', 'merge_seconds', 'postprocess_seconds')
+CSV_STREAM_FIELDS = ('bytes', 'seconds', 'avg_rate', 'peak_rate')
+STREAM_KINDS = ('video', 'audio', 'av')
+
+
+class StreamStats:
+    """Лічильники одного потоку (format_id)"""
+
+    def __init__(self, format_id, kind, now):
+        self.format_id = format_id
+        self.kind = kind
+        self.started = now
+        self.finished = None
+        self.first_bytes = None
+        self.start_bytes = 0
+        self.bytes = 0
+        self.window = (now, 0)
+        self.peak_rate = 0.0
+
+    def update(self, d, now):
+        downloaded = d.get('downloaded_bytes') or 0
+        if self.first_bytes is None:
+            # Після продовження з .part лічильник yt_dlp починається не з нуля
+            self.first_bytes = now
+            self.start_bytes = downloaded
+            self.window = (now, downloaded)
+        self.bytes = max(self.bytes, downloaded)
+        window_started, window_bytes = self.window
+        if now - window_started >= PEAK_WINDOW:
+            self.peak_rate = max(self.peak_rate, (downloaded - window_bytes) / (now - window_started))
+            self.window = (now, downloaded)
+        if d['status'] == 'finished':
+            self.finished = now
+            self.bytes = max(self.bytes, d.get('total_bytes') or 0)
+
+    def summary(self, planned_at):
+        end = self.finished
+        start = self.first_bytes or self.started
+        seconds = end - start if end else None
+        transferred = self.bytes - self.start_bytes
+        avg_rate = transferred / seconds if seconds else None
+        return {
+            'format_id': self.format_id,
+            'kind': self.kind,
+            'bytes': self.bytes,
+            'seconds': _round(seconds),
+            'first_byte_seconds': _round(self.first_bytes - planned_at) if self.first_bytes and planned_at else None,
+            'avg_rate': _round(avg_rate, 1),
+            # Потік, коротший за вікно, має лише середню швидкість
+            'peak_rate': _round(max(self.peak_rate, avg_rate or 0), 1)
+        }
+
+
+class JobTelemetry:
+    """Збір часу етапів одного завдання (хуки викликаються з потоків yt_dlp)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.finished = None
+        self.planned_at = None
+        self.first_byte_at = None
+        self.downloaded_at = None
+        self.first_pp_at = None
+        self.streams = {}
+        self.pp_started = {}
+        self.pp_seconds = {}
+        self.output_size = None
+
+    def progress_hook(self, d):
+        now = time.monotonic()
+        with self.lock:
+            if d['status'] == 'planned':
+                # Повторне отримання метаданих (застарілий кеш) переносить межу етапу
+                self.planned_at = now
+                return
+            if d['status'] not in ('downloading', 'finished'):
+                return
+            info = d.get('info_dict') or {}
+            format_id = info.get('format_id') or d.get('filename')
+            stream = self.streams.get(format_id)
+            if stream is None:
+                stream = self.streams[format_id] = StreamStats(format_id, progress.format_kind(info), now)
+            if self.first_byte_at is None:
+                self.first_byte_at = now
+            stream.update(d, now)
+
+    def postprocessor_hook(self, d):
+        now = time.monotonic()
+        name = d.get('postprocessor')
+        with self.lock:
+            if d['status'] == 'started':
+                if self.first_pp_at is None and name not in IGNORED_POSTPROCESSORS:
+                    self.first_pp_at = now
+                self.pp_started[name] = now
+            elif d['status'] == 'finished' and name in self.pp_started:
+                seconds = now - self.pp_started.pop(name)
+                self.pp_seconds[name] = self.pp_seconds.get(name, 0.0) + seconds
+
+    def downloaded(self):
+        """Кінець мережевого етапу (далі - черга постобробки)"""
+        with self.lock:
+            self.downloaded_at = time.monotonic()
+
+    def finish(self, info=None):
+        """Кінець завдання; info - результат yt_dlp (для розміру готового файлу)"""
+        with self.lock:
+            self.finished = time.monotonic()
+            path = history.output_path(info)
+            if path and os.path.exists(path):
+                self.output_size = os.path.getsize(path)
+
+    def summary(self):
+        with self.lock:
+            end = self.finished or time.monotonic()
+            streams = [stream.summary(self.planned_at) for stream in self.streams.values()]
+            stream_ends = [stream.finished for stream in self.streams.values() if stream.finished]
+            postprocessors = {
+                name: round(seconds, 3) for name, seconds in self.pp_seconds.items()
+                if name not in IGNORED_POSTPROCESSORS
+            }
+            return {
+                'total_seconds': _round(end - self.started),
+                'extract_seconds': _round(self.planned_at - self.started) if self.planned_at else None,
+                'first_byte_seconds': _round(self.first_byte_at - self.planned_at)
+                if self.first_byte_at and self.planned_at else None,
+                'download_seconds': _round(max(stream_ends) - self.first_byte_at)
+                if stream_ends and self.first_byte_at else None,
+                'postprocess_wait_seconds': _round(self.first_pp_at - self.downloaded_at)
+                if self.first_pp_at and self.downloaded_at and self.first_pp_at >= self.downloaded_at else None,
+                'merge_seconds': postprocessors.get(MERGER),
+                'postprocess_seconds': _round(sum(
+                    seconds for name, seconds in postprocessors.items() if name != MERGER
+                )) if postprocessors else None,
+                'postprocessors': postprocessors,
+                'streams': streams,
+                'output_size': self.output_size
+            }
+
+
+def _round(value, digits=3):
+    return round(value, digits) if value is not None else None
+
+
+def describe(summary):
+    """Багаторядковий опис зведення для підказки в історії"""
+    if not summary:
+        return ""
+    lines = []
+    for label, key in (("Метадані", 'extract_seconds'), ("Перший байт", 'first_byte_seconds'),
+                       ("Завантаження", 'download_seconds'),
+                       ("Черга обробки", 'postprocess_wait_seconds'), ("Злиття", 'merge_seconds'),
+                       ("Обробка", 'postprocess_seconds'), ("Усього", 'total_seconds')):
+        if summary.get(key) is not None:
+            lines.append(f"{label}: {summary[key]:.2f} с")
+    for stream in summary.get('streams') or []:
+        label = progress.PHASE_LABELS.get(stream['kind']) or "потік"
+        lines.append(
+            f"{label.capitalize()} {stream['format_id']}: "
+            f"{stream['bytes'] / 1024 / 1024:.1f} МБ, середня {progress.format_speed(stream['avg_rate'])}, "
+            f"пік {progress.format_speed(stream['peak_rate'])}"
+        )
+    for name, seconds in (summary.get('postprocessors') or {}).items():
+        lines.append(f"{name}: {seconds:.2f} с")
+    return "\n".join(lines)
+
+
+def parse(value):
+    """Зведення з поля telemetry запису історії (JSON-рядок) або None"""
+    if not value or isinstance(value, dict):
+        return value or None
+    try:
+        return json.loads(value)
+    except ValueError:
+        return None
+
+
+def export_rows(records):
+    """Записи історії з розібраним полем telemetry"""
+    return [dict(record, telemetry=parse(record.get('telemetry'))) for record in records]
+
+
+def csv_row(record):
+    """Плаский рядок CSV: поля завдання, етапи і потоки за типом (video/audio/av)"""
+    summary = record.get('telemetry') or {}
+    row = {field: record.get(field) for field in CSV_FIELDS}
+    row.update({field: summary.get(field) for field in CSV_FIELDS if field in summary})
+    if row['output_size'] is None:
+        row['output_size'] = record.get('size')
+    for kind in STREAM_KINDS:
+        streams = [stream for stream in summary.get('streams') or [] if stream['kind'] == kind]
+        for field in CSV_STREAM_FIELDS:
+            values = [stream[field] for stream in streams if stream.get(field) is not None]
+            if not values:
+                row[f'{kind}_{field}'] = None
+            elif field == 'peak_rate':
+                row[f'{kind}_{field}'] = max(values)
+            elif field == 'avg_rate':
+                row[f'{kind}_{field}'] = round(sum(values) / len(values), 1)
+            else:
+                row[f'{kind}_{field}'] = round(sum(values), 3)
+    return row
+
+
+def export(records, path):
+    """Запис телеметрії у JSON або CSV (за розширенням файлу); повертає кількість записів"""
+    rows = export_rows(records)
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8', newline='') as f:
+        if path.lower().endswith('.csv'):
+            fields = list(CSV_FIELDS) + [f'{kind}_{field}' for kind in STREAM_KINDS for field in CSV_STREAM_FIELDS]
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(csv_row(row))
+        else:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
+    return len(rows)
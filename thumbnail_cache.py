@@ -0,0 +1,119 @@
+"""Дисковий кеш превью з ключем за канонічним ID відео"""
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 60 * 60
+
+
+class ThumbnailCache:
+    """Кеш зображень зі стабільним хешем ключа, атомарним записом і витісненням за розміром/віком"""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.total_bytes = sum(size for _, size, _ in self._entries())
+
+    def path_for(self, key):
+        # sha1 не залежить від процесу, на відміну від вбудованого hash()
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.thumb")
+
+    def get(self, key):
+        """Байти зображення або None"""
+        path = self.path_for(key)
+        with self.lock:
+            try:
+                stat = os.stat(path)
+                if time.time() - stat.st_mtime > self.max_age:
+                    self._remove(path, stat.st_size)
+                    return None
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)
+                return data
+            except OSError:
+                return None
+
+    def put(self, key, data):
+        """Атомарне збереження зображення"""
+        path = self.path_for(key)
+        directory = os.path.dirname(path)
+        with self.lock:
+            try:
+                os.makedirs(directory, exist_ok=True)
+                old_size = os.path.getsize(path) if os.path.exists(path) else 0
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                try:
+                    with os.fdopen(fd, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+                self.total_bytes += len(data) - old_size
+            except OSError as e:
+                print(f"Помилка збереження превью в кеш: {e}")
+                return
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """(шлях, розмір, mtime) для всіх файлів кешу"""
+        entries = []
+        for path in glob.glob(os.path.join(self.cache_dir, '*', '*.thumb')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        """Видалення застарілих, а потім найдавніше використаних файлів до 90% ліміту"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self.total_bytes = sum(size for _, size, _ in entries)
+        now = time.time()
+        target = self.max_bytes * 0.9
+        for path, size, mtime in entries:
+            if self.total_bytes <= target and now - mtime <= self.max_age:
+                break
+            self._remove(path, size)
+
+    def _remove(self, path, size):
+        try:
+            os.remove(path)
+            self.total_bytes -= size
+        except OSError:
+            pass
+
+
+def remove_legacy_files(cache_dir):
+    """Видалення старих файлів {hash(url)}.jpg, які ніколи не давали влучань"""
+    for path in glob.glob(os.path.join(cache_dir, '*.jpg')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(cache_dir=None):
+    """Спільний для всього процесу екземпляр кешу превью"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if cache_dir is None:
+                cache_dir = os.path.join(os.path.expanduser('~'), '.ytdownloader_cache', 'thumbnails')
+            _cache = ThumbnailCache(cache_dir)
+        return _cache
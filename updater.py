@@ -0,0 +1,277 @@
+"""Перевірка оновлень через GitHub API без залежності від Qt"""
+import hashlib
+import json
+import os
+import re
+import time
+import http_client
+import lazy_imports
+
+DEFAULT_API_URL = 'https://api.github.com'
+REQUEST_TIMEOUT = http_client.REQUEST_TIMEOUT
+CHECK_INTERVAL = 6 * 60 * 60
+# Великі блоки замість iter_content(1024): у 1000 разів менше викликів запису
+CHUNK_SIZE = 1024 * 1024
+CHECKSUM_ASSET_NAMES = ('SHA256SUMS', 'SHA256SUMS.txt', 'checksums.txt')
+SHA256_RE = re.compile(r'\b([0-9a-fA-F]{64})\b')
+
+
+class UpdateCancelled(Exception):
+    """Завантаження оновлення скасовано користувачем"""
+
+
+def _read_cached_check(cache_file):
+    try:
+        with open(cache_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_cached_check(cache_file, repo, release):
+    try:
+        tmp_file = cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'checked_at': time.time(), 'repo': repo, 'release': release}, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"Помилка збереження результату перевірки оновлень: {e}")
+
+
+def fetch_latest_release(repo, token="", api_url=DEFAULT_API_URL, timeout=REQUEST_TIMEOUT):
+    """Інформація про останній реліз або None"""
+    headers = {'Authorization': f'token {token}'} if token else {}
+    response = http_client.get(
+        f'{api_url.rstrip("/")}/repos/{repo}/releases/latest',
+        headers=headers,
+        timeout=timeout
+    )
+    if response.status_code != 200:
+        return None
+
+    release_info = response.json()
+    # Зберігаємо лише потрібні поля, щоб кеш лишався маленьким
+    return {
+        'tag_name': release_info['tag_name'],
+        'body': release_info.get('body') or '',
+        'assets': [
+            {
+                'name': asset['name'],
+                'browser_download_url': asset['browser_download_url'],
+                'size': asset.get('size', 0),
+                'digest': asset.get('digest')
+            }
+            for asset in release_info.get('assets', [])
+        ]
+    }
+
+
+def check_for_update(current_version, repo, token="", api_url=DEFAULT_API_URL,
+                     cache_file=None, check_interval=CHECK_INTERVAL, timeout=REQUEST_TIMEOUT):
+    """Реліз, новіший за current_version, або None
+
+    Результат останньої перевірки кешується: поки він свіжий, мережа не
+    використовується, а при помилці мережі використовується останній відомий реліз.
+    """
+    if not repo:
+        return None
+
+    requests = lazy_imports.requests()
+    version = lazy_imports.packaging_version()
+
+    cached = _read_cached_check(cache_file) if cache_file else None
+    if cached and cached.get('repo') != repo:
+        cached = None
+
+    if cached and time.time() - cached.get('checked_at', 0) < check_interval:
+        release = cached.get('release')
+    else:
+        try:
+            release = fetch_latest_release(repo, token, api_url, timeout)
+            if cache_file:
+                _write_cached_check(cache_file, repo, release)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"Помилка перевірки оновлень: {e}")
+            release = cached.get('release') if cached else None
+
+    if not release:
+        return None
+
+    latest_version = release['tag_name'].replace('v', '')
+    if version.parse(latest_version) > version.parse(current_version):
+        return release
+    return None
+
+
+def _parse_checksum_text(text, asset_name):
+    """Пошук sha256 для файлу у тексті формату sha256sum або в описі релізу"""
+    lines = text.splitlines()
+    for line in lines:
+        match = SHA256_RE.search(line)
+        if match and asset_name in line:
+            return match.group(1).lower()
+    # Файл <asset>.sha256 може містити лише сам хеш
+    if len(lines) == 1:
+        match = SHA256_RE.search(lines[0])
+        if match:
+            return match.group(1).lower()
+    return None
+
+
+def find_expected_sha256(release, asset, timeout=REQUEST_TIMEOUT):
+    """Очікуваний sha256 файлу оновлення з метаданих релізу або None"""
+    requests = lazy_imports.requests()
+    digest = asset.get('digest') or ''
+    if digest.startswith('sha256:'):
+        return digest.split(':', 1)[1].lower()
+
+    for checksum_asset in release.get('assets', []):
+        name = checksum_asset['name']
+        if name == f"{asset['name']}.sha256" or name in CHECKSUM_ASSET_NAMES:
+            try:
+                response = http_client.get(checksum_asset['browser_download_url'], timeout=timeout)
+                if response.status_code == 200:
+                    expected = _parse_checksum_text(response.text, asset['name'])
+                    if expected:
+                        return expected
+            except requests.RequestException as e:
+                print(f"Помилка завантаження контрольної суми: {e}")
+
+    for line in (release.get('body') or '').splitlines():
+        if asset['name'] in line:
+            expected = _parse_checksum_text(line, asset['name'])
+            if expected:
+                return expected
+    return None
+
+
+def _part_file(dest_file, part_key):
+    if not part_key:
+        return dest_file + '.part'
+    slug = re.sub(r'[^0-9A-Za-z._-]+', '-', part_key).strip('-')
+    return f"{dest_file}.{slug}.part"
+
+
+def _remove_stale_parts(dest_file, part_file):
+    """Видалення часткових файлів інших версій оновлення"""
+    folder = os.path.dirname(os.path.abspath(dest_file))
+    prefix = os.path.basename(dest_file) + '.'
+    try:
+        names = os.listdir(folder)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(folder, name)
+        if (name.startswith(prefix) and name.endswith(('.part', '.part.meta'))
+                and path not in (os.path.abspath(part_file), os.path.abspath(part_file) + '.meta')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _read_validator(meta_file):
+    try:
+        with open(meta_file, encoding='utf-8') as f:
+            return json.load(f).get('validator')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _write_validator(meta_file, validator):
+    try:
+        with open(meta_file, 'w', encoding='utf-8') as f:
+            json.dump({'validator': validator}, f)
+    except OSError as e:
+        print(f"Помилка збереження даних докачування оновлення: {e}")
+
+
+def _discard_part(part_file):
+    for path in (part_file, part_file + '.meta'):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def download_update(download_url, dest_file, expected_sha256=None, progress_callback=None,
+                    is_cancelled=None, chunk_size=CHUNK_SIZE, timeout=REQUEST_TIMEOUT,
+                    expected_size=None, part_key=None):
+    """Завантаження файлу оновлення з докачуванням і перевіркою розміру та хешу
+
+    Дані пишуться в <dest_file>.<part_key>.part (part_key - версія і назва
+    файлу релізу), тож частковий файл іншої версії не продовжується. Поруч
+    зберігається ETag або Last-Modified відповіді: докачування з HTTP Range
+    йде лише з If-Range, і якщо файл на сервері змінився, сервер віддає його
+    повністю (200) і завантаження починається спочатку. Якщо задано
+    expected_size, розмір результату перевіряється перед перейменуванням.
+    progress_callback(downloaded, total, speed) викликається після кожного
+    блоку, is_cancelled() перевіряється там само.
+    """
+    part_file = _part_file(dest_file, part_key)
+    meta_file = part_file + '.meta'
+    _remove_stale_parts(dest_file, part_file)
+
+    validator = _read_validator(meta_file)
+    offset = os.path.getsize(part_file) if os.path.exists(part_file) else 0
+    if offset and not validator:
+        # Без ETag/Last-Modified не можна переконатися, що частковий файл з того самого файлу
+        offset = 0
+    if offset and expected_size and offset > expected_size:
+        offset = 0
+    sha256 = hashlib.sha256()
+
+    headers = {'Range': f'bytes={offset}-', 'If-Range': validator} if offset else {}
+    with http_client.get(download_url, headers=headers, stream=True, timeout=timeout) as response:
+        if response.status_code == 416 and (not expected_size or offset != expected_size):
+            _discard_part(part_file)
+            raise ValueError("Частковий файл оновлення не відповідає файлу на сервері, повторіть завантаження")
+        if response.status_code == 416:
+            # Частковий файл вже повний - залишилось перевірити хеш
+            total_size = offset
+        else:
+            response.raise_for_status()
+            if response.status_code != 206:
+                # Сервер не підтримує Range або файл змінився - починаємо спочатку
+                offset = 0
+            total_size = offset + int(response.headers.get('content-length', 0))
+            new_validator = response.headers.get('etag') or response.headers.get('last-modified')
+            if not offset:
+                _write_validator(meta_file, new_validator)
+
+            if offset:
+                with open(part_file, 'rb') as f:
+                    for data in iter(lambda: f.read(chunk_size), b''):
+                        sha256.update(data)
+
+            downloaded = offset
+            started = time.monotonic()
+            with open(part_file, 'ab' if offset else 'wb', buffering=chunk_size) as f:
+                for data in response.iter_content(chunk_size):
+                    if is_cancelled and is_cancelled():
+                        raise UpdateCancelled("Завантаження оновлення скасовано")
+                    f.write(data)
+                    sha256.update(data)
+                    downloaded += len(data)
+                    if progress_callback:
+                        elapsed = time.monotonic() - started
+                        speed = (downloaded - offset) / elapsed if elapsed > 0 else 0.0
+                        progress_callback(downloaded, total_size, speed)
+
+    if response.status_code == 416:
+        with open(part_file, 'rb') as f:
+            for data in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(data)
+
+    size = os.path.getsize(part_file)
+    if expected_size and size != expected_size:
+        _discard_part(part_file)
+        raise ValueError(f"Розмір оновлення не збігається: {size} замість {expected_size} байтів")
+
+    if expected_sha256 and sha256.hexdigest() != expected_sha256.lower():
+        _discard_part(part_file)
+        raise ValueError("Контрольна сума оновлення не збігається")
+
+    os.replace(part_file, dest_file)
+    _discard_part(part_file)
+    return dest_file
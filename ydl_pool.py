@@ -0,0 +1,146 @@
+"""Пул довгоживучих екземплярів YoutubeDL без залежності від Qt
+
+Створення YoutubeDL на кожне завдання щоразу заново налаштовує екстрактори,
+cookies і HTTP-клієнт, а відкриті з'єднання закриваються разом з екземпляром.
+Пул віддає завданню вже створений екземпляр з тими самими параметрами, тож
+cookies, стан екстракторів і з'єднання переходять до наступного завдання.
+Екземпляр належить одному потоку, поки його не повернуто в пул.
+"""
+import json
+import threading
+from contextlib import contextmanager
+
+# Хуки завдання: yt_dlp запам'ятовує їх при створенні, тому вони йдуть через диспетчер
+HOOK_PARAMS = ('progress_hooks', 'postprocessor_hooks')
+# Параметри, які yt_dlp читає під час завантаження і які можна замінити на місці
+SWAPPED_PARAMS = ('ratelimit', 'download_ranges', 'force_keyframes_at_cuts')
+# Параметри завдання, які не входять у ключ пулу
+JOB_PARAMS = HOOK_PARAMS + SWAPPED_PARAMS
+# Скільки вільних екземплярів тримати (приблизно по одному на потік завантаження)
+MAX_IDLE = 8
+
+
+class YdlPool:
+    """Вільні екземпляри YoutubeDL, згруповані за класом і параметрами
+
+    Хуки прогресу і постпроцесорів yt_dlp запам'ятовує при створенні, тому
+    екземпляр отримує по одному хуку-диспетчеру, який передає події хукам
+    поточного завдання.
+    """
+
+    def __init__(self, max_idle=MAX_IDLE):
+        self.max_idle = max_idle
+        self.lock = threading.Lock()
+        self.idle = []
+        self.created = 0
+        self.reused = 0
+
+    @staticmethod
+    def key(ydl_class, opts, variant=None):
+        static_opts = {name: value for name, value in opts.items() if name not in JOB_PARAMS}
+        return ydl_class, variant, json.dumps(static_opts, sort_keys=True, default=repr)
+
+    def acquire(self, ydl_class, opts, setup=None, variant=None):
+        """Екземпляр для завдання: (ключ, ydl)
+
+        setup(ydl, hooks) викликається лише для нового екземпляра (наприклад,
+        щоб додати постпроцесори); variant розрізняє екземпляри з різним setup.
+        """
+        key = self.key(ydl_class, opts, variant)
+        ydl = None
+        with self.lock:
+            for i in range(len(self.idle) - 1, -1, -1):
+                if self.idle[i][0] == key:
+                    ydl = self.idle.pop(i)[1]
+                    self.reused += 1
+                    break
+        if ydl is None:
+            ydl = self._create(ydl_class, opts, setup)
+
+        for name in HOOK_PARAMS:
+            ydl.job_hooks[name][:] = opts.get(name) or []
+        for name in SWAPPED_PARAMS:
+            if opts.get(name) is None:
+                ydl.params.pop(name, None)
+            else:
+                ydl.params[name] = opts[name]
+        return key, ydl
+
+    def _create(self, ydl_class, opts, setup):
+        job_hooks = {name: [] for name in HOOK_PARAMS}
+        dispatchers = {name: [_dispatcher(hooks)] for name, hooks in job_hooks.items()}
+        ydl = ydl_class(dict(opts, **dispatchers))
+        ydl.job_hooks = job_hooks
+        if setup:
+            setup(ydl, dispatchers['progress_hooks'])
+        with self.lock:
+            self.created += 1
+        return ydl
+
+    def release(self, key, ydl, reusable=True):
+        """Повернення екземпляра в пул (або закриття, якщо завдання впало)"""
+        for hooks in ydl.job_hooks.values():
+            hooks[:] = []
+        evicted = None
+        if reusable:
+            with self.lock:
+                self.idle.append((key, ydl))
+                if len(self.idle) > self.max_idle:
+                    evicted = self.idle.pop(0)[1]
+        else:
+            evicted = ydl
+        if evicted is not None:
+            self._close(evicted)
+
+    @contextmanager
+    def use(self, ydl_class, opts, setup=None, variant=None):
+        """Екземпляр з пулу на час блоку with
+
+        Після винятку (помилка, скасування) стан екземпляра не гарантовано
+        чистий, тому він закривається, а не повертається в пул.
+        """
+        key, ydl = self.acquire(ydl_class, opts, setup, variant)
+        reusable = False
+        try:
+            yield ydl
+            reusable = True
+        finally:
+            self.release(key, ydl, reusable)
+
+    def stats(self):
+        with self.lock:
+            return {'created': self.created, 'reused': self.reused, 'idle': len(self.idle)}
+
+    def close(self):
+        """Закриття всіх вільних екземплярів (збереження cookies, закриття з'єднань)"""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for _, ydl in idle:
+            self._close(ydl)
+
+    @staticmethod
+    def _close(ydl):
+        try:
+            ydl.close()
+        except Exception as e:
+            print(f"Помилка закриття YoutubeDL: {e}")
+
+
+def _dispatcher(hooks):
+    def dispatch(d):
+        for hook in list(hooks):
+            hook(d)
+    return dispatch
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Спільний пул екземплярів YoutubeDL"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = YdlPool()
+        return _pool